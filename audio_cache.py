@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio Segment Cache
+Cache trên đĩa các đoạn audio ngắn (một câu subtitle) để phát lại ngay, không cần mạng
+
+Mỗi đoạn được lưu theo khóa (video_id, start, end). index.json giữ các đoạn theo thứ tự
+dùng gần nhất (LRU). Đọc cache chỉ đổi thứ tự trong bộ nhớ; index được ghi khi thêm/xóa
+đoạn và khi close(), nên cache còn nguyên sau khi khởi động lại. Khi tổng dung lượng vượt
+max_bytes, đoạn lâu không dùng nhất bị xóa trước.
+"""
+
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from clip_export import CLIP_PADDING, cut_clip
+
+DEFAULT_CACHE_DIR = "audio_cache"
+DEFAULT_CACHE_BYTES = 200 * 1024 * 1024
+INDEX_FILE = "index.json"
+SEGMENT_FORMAT = "mp3"
+
+
+def segment_key(video_id: str, start: float, end: float) -> str:
+    """Khóa của đoạn, đồng thời là tên file (thời gian làm tròn tới mili giây)"""
+    return f"{video_id}_{int(round(start * 1000))}_{int(round(end * 1000))}"
+
+
+class SegmentCache:
+    """Cache LRU giới hạn dung lượng đĩa của các đoạn audio"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_BYTES,
+                 ffmpeg: Optional[str] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ffmpeg = ffmpeg or shutil.which('ffmpeg')
+        # key -> kích thước file, cũ nhất trước
+        self.entries: 'OrderedDict[str, int]' = OrderedDict()
+        self.total_bytes = 0
+        # Thứ tự LRU trong bộ nhớ đã đổi nhưng chưa ghi ra index.json
+        self._dirty = False
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{SEGMENT_FORMAT}")
+
+    def _load(self):
+        """Đọc index, bỏ các mục mất file và xóa file không có trong index (vd. .part bị bỏ dở)"""
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = []
+
+        for key, size in saved:
+            if os.path.exists(self._path(key)):
+                self.entries[key] = size
+                self.total_bytes += size
+
+        known = {os.path.basename(self._path(key)) for key in self.entries}
+        for name in os.listdir(self.directory):
+            if name.endswith((f".{SEGMENT_FORMAT}", ".part")) and name not in known:
+                os.remove(os.path.join(self.directory, name))
+
+    def _save(self):
+        """Ghi index ra file tạm rồi thay thế (không bao giờ để lại index ghi dở)"""
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(list(self.entries.items()), f)
+        os.replace(path + ".tmp", path)
+        self._dirty = False
+
+    @property
+    def enabled(self) -> bool:
+        """Cache chỉ được lấp đầy khi có ffmpeg (đọc cache thì không cần)"""
+        return self.ffmpeg is not None
+
+    def get(self, video_id: str, start: float, end: float) -> Optional[str]:
+        """Đường dẫn file của đoạn nếu đã có trong cache (đánh dấu là vừa dùng)"""
+        key = segment_key(video_id, start, end)
+        with self._lock:
+            if key not in self.entries:
+                return None
+            path = self._path(key)
+            if not os.path.exists(path):
+                self.total_bytes -= self.entries.pop(key)
+                self._dirty = True
+                return None
+            self.entries.move_to_end(key)
+            self._dirty = True
+            return path
+
+    def fill(self, video_id: str, start: float, end: float, media: str) -> Optional[str]:
+        """
+        Cắt đoạn từ media (file hoặc URL stream đã resolve) vào cache
+
+        Trả về đường dẫn file, hoặc None nếu không có ffmpeg hoặc cắt lỗi.
+        """
+        path = self.get(video_id, start, end)
+        if path or not self.enabled:
+            return path
+
+        key = segment_key(video_id, start, end)
+        path = self._path(key)
+        clip_start = max(0.0, start - CLIP_PADDING)
+        duration = max(0.1, end + CLIP_PADDING - clip_start)
+        # cut_clip ghi vào file .part rồi mới đổi tên: file trong cache luôn hoàn chỉnh
+        if cut_clip(self.ffmpeg, media, clip_start, duration, path, SEGMENT_FORMAT):
+            return None
+
+        with self._lock:
+            size = os.path.getsize(path)
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)
+            self.entries[key] = size
+            self.total_bytes += size
+            self._evict()
+            self._save()
+        return path if os.path.exists(path) else None
+
+    def _evict(self):
+        """Xóa các đoạn ít dùng gần đây nhất cho tới khi tổng dung lượng nằm trong giới hạn"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for key in self.entries:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self.entries.clear()
+            self.total_bytes = 0
+            self._save()
+
+    def close(self):
+        """Ghi thứ tự LRU của các lần đọc chưa được lưu"""
+        with self._lock:
+            if self._dirty:
+                self._save()
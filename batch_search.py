@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Vocabulary Search
+Tìm cả danh sách từ vựng (JLPT...) trong một lần quét database bằng Aho-Corasick
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """Automaton Aho-Corasick: tìm nhiều từ cùng lúc trong một lần duyệt text"""
+
+    def __init__(self, terms: List[str]):
+        self.terms = terms
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+
+        for term_index, term in enumerate(terms):
+            self._add_term(term.lower(), term_index)
+        self._build_failure_links()
+
+    def _add_term(self, term: str, term_index: int):
+        node = 0
+        for char in term:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = next_node
+        self.output[node].append(term_index)
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                # Gộp output của failure node để không phải đi theo chuỗi fail khi match
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[int]:
+        """Trả về term_index cho mỗi lần xuất hiện trong text"""
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                yield from output[node]
+
+
+# Automaton của từng worker process, được gửi một lần qua initializer
+_worker_automaton = None
+
+
+def _init_worker(automaton: AhoCorasick):
+    global _worker_automaton
+    _worker_automaton = automaton
+
+
+def _scan_id_range(db_name: str, first_id: int, last_id: int, top_k: int) -> Dict[int, Tuple[int, List]]:
+    """
+    Quét các subtitle có id trong [first_id, last_id] và giữ top-k kết quả cho mỗi từ
+
+    Điểm của một dòng = mật độ từ trong dòng (số lần xuất hiện * độ dài từ / độ dài dòng),
+    nên câu ngắn chứa từ được ưu tiên làm câu ví dụ.
+
+    Returns:
+        {term_index: (số dòng khớp, heap [(score, -id, row), ...])}
+    """
+    automaton = _worker_automaton
+    found: Dict[int, Tuple[int, List]] = {}
+
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, video_id, video_url, japanese_text, start_time, end_time,
+               duration, sequence_number
+        FROM subtitles
+        WHERE id BETWEEN ? AND ?
+    """, (first_id, last_id))
+
+    for row in cursor:
+        text = row[3]
+        counts: Dict[int, int] = {}
+        for term_index in automaton.iter_matches(text):
+            counts[term_index] = counts.get(term_index, 0) + 1
+
+        for term_index, count in counts.items():
+            score = count * len(automaton.terms[term_index]) / len(text)
+            line_count, heap = found.get(term_index, (0, []))
+            item = (score, -row[0], row)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            found[term_index] = (line_count + 1, heap)
+
+    conn.close()
+    return found
+
+
+class BatchSearcher:
+    """Tìm danh sách từ trong toàn bộ database bằng nhiều worker process"""
+
+    def __init__(self, db_name: str = "japanese_subtitles.db", workers: int = None):
+        self.db_name = db_name
+        self.workers = workers or os.cpu_count() or 2
+
+    def search(self, terms: List[str], top_k: int = 5) -> Dict[str, Dict]:
+        """
+        Quét database một lần cho tất cả các từ
+
+        Returns:
+            {term: {'count': số dòng khớp, 'hits': [row tuple (id, video_id, video_url,
+            japanese_text, start_time, end_time, duration, sequence_number), ...]}}
+        """
+        terms = [term for term in dict.fromkeys(terms) if term]
+        merged = {term: {'count': 0, 'hits': []} for term in terms}
+        if not terms:
+            return merged
+
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(id), MAX(id) FROM subtitles")
+        min_id, max_id = cursor.fetchone()
+        conn.close()
+
+        if min_id is None:
+            return merged
+
+        # Chia khoảng id thành nhiều phần nhỏ hơn số worker để cân bằng tải
+        chunk_count = self.workers * 4
+        chunk_size = max(1, (max_id - min_id + chunk_count) // chunk_count)
+        ranges = [(start, min(start + chunk_size - 1, max_id))
+                  for start in range(min_id, max_id + 1, chunk_size)]
+
+        automaton = AhoCorasick(terms)
+        heaps: Dict[int, List] = {}
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(automaton,)) as executor:
+            futures = [executor.submit(_scan_id_range, self.db_name, first, last, top_k)
+                       for first, last in ranges]
+
+            for future in futures:
+                for term_index, (line_count, heap) in future.result().items():
+                    merged[terms[term_index]]['count'] += line_count
+                    heaps.setdefault(term_index, []).extend(heap)
+
+        for term_index, items in heaps.items():
+            best = heapq.nlargest(top_k, items)
+            merged[terms[term_index]]['hits'] = [row for _, _, row in best]
+
+        return merged
+
+
+def load_terms(filename: str) -> List[str]:
+    """Đọc danh sách từ (mỗi dòng một từ, bỏ qua dòng trống và dòng bắt đầu bằng #)"""
+    terms = []
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                terms.append(line)
+    return terms
+
+
+def write_jsonl(results: Dict[str, Dict], output_file: str):
+    """Ghi kết quả ra file JSONL, mỗi dòng một từ"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for term, result in results.items():
+            record = {'term': term, 'count': result['count'], 'hits': result['hits']}
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
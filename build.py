@@ -10,7 +10,7 @@ import os
 
 def install_dependencies():
     """Cài dependencies"""
-    deps = ['pyinstaller', 'yt-dlp', 'python-vlc', 'pywebview']
+    deps = ['pyinstaller', 'yt-dlp', 'python-vlc', 'pywebview', 'pykakasi']
 
     for dep in deps:
         try:
@@ -45,6 +45,7 @@ def build_executable():
         '--add-data', 'requirements.txt:.',
         '--hidden-import', 'vlc',
         '--hidden-import', 'webview',
+        '--collect-data', 'pykakasi',
         '--hidden-import', 'tkinter',
         '--hidden-import', 'sqlite3',
         'main.py'
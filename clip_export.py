@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Clip Export
+Cắt audio clip cho kết quả tìm kiếm (sentence mining) bằng ffmpeg, kèm manifest CSV / Anki
+
+Media của mỗi video chỉ được resolve một lần (MediaSource), tối đa RESOLVE_WORKERS video
+cùng lúc; clip của một video được đưa vào thread pool ngay khi media của nó sẵn sàng, nên
+yt-dlp của video sau chạy trong lúc ffmpeg cắt clip của video trước. ffmpeg là process
+riêng, thread chỉ chờ nó (tối đa `workers` ffmpeg cùng lúc).
+"""
+
+import csv
+import glob
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_CLIP_DIR = "clips"
+# Thêm một chút trước / sau mỗi câu để không mất âm đầu, âm cuối
+CLIP_PADDING = 0.3
+FFMPEG_TIMEOUT = 120
+# Số video được resolve media cùng lúc (yt-dlp chủ yếu chờ mạng)
+RESOLVE_WORKERS = 2
+
+# Tham số encode theo định dạng clip
+AUDIO_CODECS = {
+    'mp3': ['-c:a', 'libmp3lame', '-q:a', '4'],
+    'ogg': ['-c:a', 'libvorbis', '-q:a', '4'],
+    'm4a': ['-c:a', 'aac', '-b:a', '96k'],
+}
+
+
+class MediaSource:
+    """Nguồn media của video: trả về đường dẫn hoặc URL mà ffmpeg đọc được"""
+
+    def resolve(self, video_id: str, video_url: str) -> str:
+        raise NotImplementedError
+
+
+class YtDlpMediaSource(MediaSource):
+    """URL stream audio của YouTube qua yt-dlp (ffmpeg tua bằng HTTP range, không tải cả video)"""
+
+    def __init__(self, audio_format: str = "bestaudio/best"):
+        self.audio_format = audio_format
+
+    def resolve(self, video_id: str, video_url: str) -> str:
+        cmd = ['yt-dlp', '--get-url', '--format', self.audio_format, video_url]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0 or not result.stdout.strip():
+            raise RuntimeError(f"yt-dlp không lấy được stream: {result.stderr.strip()[-200:]}")
+        return result.stdout.strip().splitlines()[0]
+
+
+class LocalMediaSource(MediaSource):
+    """File media có sẵn trong thư mục, đặt tên theo video_id (vd. media/abc123.m4a)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def resolve(self, video_id: str, video_url: str) -> str:
+        matches = sorted(glob.glob(os.path.join(glob.escape(self.directory), glob.escape(video_id) + ".*")))
+        if not matches:
+            raise FileNotFoundError(f"Không có file media cho {video_id} trong {self.directory}")
+        return matches[0]
+
+
+def clip_filename(result: Dict, audio_format: str) -> str:
+    """Tên file clip cố định theo video và thời điểm (chạy lại sẽ bỏ qua clip đã có)"""
+    return f"{result['video_id']}_{int(round(result['start_time'] * 1000))}.{audio_format}"
+
+
+def cut_clip(ffmpeg: str, media: str, start: float, duration: float,
+             output_path: str, audio_format: str) -> Optional[str]:
+    """Cắt một clip audio (chạy trong worker thread). Trả về thông báo lỗi hoặc None."""
+    tmp_path = output_path + ".part"
+    # -ss trước -i: tua trên input (nhanh, với URL chỉ đọc đoạn cần thiết)
+    cmd = [ffmpeg, '-nostdin', '-loglevel', 'error', '-y',
+           '-ss', f"{start:.3f}", '-t', f"{duration:.3f}", '-i', media,
+           '-vn', '-ac', '1'] + AUDIO_CODECS.get(audio_format, []) + ['-f', _muxer(audio_format), tmp_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return f"ffmpeg chạy quá {FFMPEG_TIMEOUT}s"
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return result.stderr.strip()[-200:] or f"ffmpeg exit code {result.returncode}"
+    os.replace(tmp_path, output_path)
+    return None
+
+
+def _muxer(audio_format: str) -> str:
+    return {'m4a': 'ipod'}.get(audio_format, audio_format)
+
+
+class ClipExporter:
+    """Xuất clip audio cho một danh sách kết quả (dict của search_word_in_subtitles)"""
+
+    def __init__(self, source: MediaSource, output_dir: str = DEFAULT_CLIP_DIR,
+                 workers: Optional[int] = None, padding: float = CLIP_PADDING,
+                 audio_format: str = "mp3", ffmpeg: Optional[str] = None):
+        self.source = source
+        self.output_dir = output_dir
+        self.workers = workers or min(4, os.cpu_count() or 2)
+        self.padding = padding
+        self.audio_format = audio_format
+        self.ffmpeg = ffmpeg or shutil.which('ffmpeg')
+        if not self.ffmpeg:
+            raise RuntimeError("Xuất clip cần ffmpeg (https://ffmpeg.org/download.html)")
+
+    def _clip_range(self, result: Dict) -> Tuple[float, float]:
+        """(start, duration) của clip đã thêm padding"""
+        start = max(0.0, result['start_time'] - self.padding)
+        end = result['end_time'] + self.padding
+        return start, max(0.1, end - start)
+
+    def export(self, results: List[Dict],
+               progress: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
+        """
+        Cắt clip cho mọi kết quả, gom theo video
+
+        Returns:
+            Các kết quả theo thứ tự đầu vào, thêm 'clip' (tên file trong output_dir,
+            None nếu lỗi) và 'error'
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        records = [dict(result, clip=None, error=None) for result in results]
+
+        by_video: Dict[str, List[Dict]] = {}
+        for record in records:
+            by_video.setdefault(record['video_id'], []).append(record)
+
+        total = len(records)
+        done = 0
+        pending = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                ThreadPoolExecutor(max_workers=RESOLVE_WORKERS) as resolver:
+            resolving = {}
+            for video_id, video_records in by_video.items():
+                todo = []
+                for record in video_records:
+                    filename = clip_filename(record, self.audio_format)
+                    if os.path.exists(os.path.join(self.output_dir, filename)):
+                        record['clip'] = filename  # Đã cắt ở lần chạy trước
+                        done += 1
+                    else:
+                        todo.append((record, filename))
+                if todo:
+                    future = resolver.submit(self.source.resolve, video_id, video_records[0]['video_url'])
+                    resolving[future] = todo
+
+            # Video nào resolve xong trước thì clip của nó được cắt trước
+            for resolved in as_completed(resolving):
+                todo = resolving[resolved]
+                try:
+                    media = resolved.result()
+                except Exception as e:
+                    for record, _ in todo:
+                        record['error'] = str(e)
+                    done += len(todo)
+                    continue
+
+                for record, filename in todo:
+                    start, duration = self._clip_range(record)
+                    future = executor.submit(cut_clip, self.ffmpeg, media, start, duration,
+                                             os.path.join(self.output_dir, filename), self.audio_format)
+                    pending.append((future, record, filename))
+
+            for future, record, filename in pending:
+                error = future.result()
+                if error:
+                    record['error'] = error
+                else:
+                    record['clip'] = filename
+                done += 1
+                if progress:
+                    progress(done, total)
+
+        return records
+
+
+def write_csv_manifest(records: List[Dict], path: str):
+    """Manifest CSV: một dòng cho mỗi clip đã cắt"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['clip', 'japanese_text', 'video_id', 'start_time', 'end_time', 'timestamp_url'])
+        for record in records:
+            if record['clip']:
+                writer.writerow([record['clip'], record['japanese_text'], record['video_id'],
+                                 f"{record['start_time']:.2f}", f"{record['end_time']:.2f}",
+                                 record.get('timestamp_url', '')])
+
+
+def write_anki_manifest(records: List[Dict], path: str):
+    """
+    File text cho File > Import của Anki (tách bằng tab): câu, [sound:clip], link nguồn
+
+    Các file clip cần được copy vào thư mục collection.media của Anki.
+    """
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write("#separator:tab\n#html:true\n#columns:Sentence\tAudio\tSource\n")
+        writer = csv.writer(f, delimiter='\t', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        for record in records:
+            if record['clip']:
+                source = f"<a href='{record.get('timestamp_url', '')}'>{record['video_id']}</a>"
+                writer.writerow([record['japanese_text'], f"[sound:{record['clip']}]", source])
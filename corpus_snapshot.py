@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Corpus Snapshot
+Bản chụp read-only của bảng subtitles dạng cột, memory-mapped, cho tìm substring nhanh
+
+Mỗi lần export ghi một phiên bản mới vào thư mục riêng rồi mới trỏ CURRENT sang nó
+(os.replace một file nhỏ). Process khác đang mmap phiên bản cũ không bị ảnh hưởng; các
+phiên bản cũ được xóa ở lần export sau nếu không còn bị giữ (Windows không cho xóa file
+đang mmap).
+
+    corpus_snapshot/
+        CURRENT           - tên thư mục phiên bản đang dùng
+        snapshot-<max_id>/
+
+Cấu trúc một phiên bản:
+    text.bin          - japanese_text UTF-8 nối liền, mỗi dòng kết thúc bằng byte \\0
+    search.bin        - như text.bin nhưng chữ ASCII viết thường (giống LIKE của SQLite)
+    offsets.npy       - int64[n + 1], byte offset bắt đầu của từng dòng
+    ids.npy           - int64[n], subtitles.id
+    video_index.npy   - int32[n], chỉ số vào videos.json
+    start_times.npy, end_times.npy, durations.npy - float64[n]
+    sequence_numbers.npy - int64[n]
+    groups.npy        - int64[n], nhóm gần trùng COALESCE(duplicate_group, id) để gộp kết quả
+    videos.json       - [[video_id, video_url], ...]
+    meta.json         - phiên bản, số dòng, id lớn nhất và bộ đếm corpus_changes lúc export
+"""
+
+import json
+import importlib.util
+import mmap
+import os
+import shutil
+import sqlite3
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from subtitle_db import change_version
+
+# NumPy chỉ được import lần đầu cần đến (chiếm phần lớn thời gian khởi động)
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+SNAPSHOT_VERSION = 3
+DEFAULT_SNAPSHOT_DIR = "corpus_snapshot"
+CURRENT_FILE = "CURRENT"
+VERSION_PREFIX = "snapshot-"
+# File của snapshot phiên bản 1 (ghi thẳng vào thư mục snapshot), được dọn khi export
+LEGACY_FILES = ["text.bin", "search.bin", "offsets.npy", "ids.npy", "video_index.npy",
+                "start_times.npy", "end_times.npy", "durations.npy", "sequence_numbers.npy",
+                "videos.json", "meta.json"]
+
+
+def corpus_state(conn: sqlite3.Connection) -> Tuple[int, Optional[int]]:
+    """(id lớn nhất, bộ đếm sửa / xóa) của subtitles: đủ để biết snapshot còn khớp không"""
+    max_id = conn.execute("SELECT MAX(id) FROM subtitles").fetchone()[0] or 0
+    return max_id, change_version(conn)
+
+
+def current_version(directory: str = DEFAULT_SNAPSHOT_DIR) -> Optional[str]:
+    """Tên thư mục phiên bản snapshot đang dùng, None nếu chưa export"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _replace_file(source: str, target: str, attempts: int = 20):
+    """os.replace, thử lại khi Windows báo file đích đang được process khác đọc"""
+    for attempt in range(attempts):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05)
+
+
+def remove_old_versions(directory: str, keep: str):
+    """Xóa các phiên bản (và thư mục tạm) khác keep; phiên bản còn bị mmap sẽ được xóa lần sau"""
+    for name in os.listdir(directory):
+        if name.startswith(VERSION_PREFIX) and name != keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    for name in LEGACY_FILES:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def export_snapshot(db_name: str = "japanese_subtitles.db",
+                    directory: str = DEFAULT_SNAPSHOT_DIR) -> Dict:
+    """
+    Export bảng subtitles ra một phiên bản snapshot mới rồi trỏ CURRENT sang nó
+
+    Không xóa hay ghi đè phiên bản đang dùng, nên an toàn khi player / daemon khác đang mở.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Snapshot cần NumPy: pip install numpy")
+    _load_numpy()
+    os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(db_name)
+    # Một transaction đọc: trạng thái và các dòng export thuộc cùng một thời điểm
+    conn.execute("BEGIN")
+    max_id, changes = corpus_state(conn)
+
+    # Export lại cùng max_id (dòng bị sửa / xóa) dùng tên mới: phiên bản cũ có thể đang được mở
+    version = f"{VERSION_PREFIX}{max_id}"
+    suffix = 1
+    while any(os.path.exists(os.path.join(directory, version + ext)) for ext in ("", ".tmp")):
+        suffix += 1
+        version = f"{VERSION_PREFIX}{max_id}.{suffix}"
+    tmp_dir = os.path.join(directory, version + ".tmp")
+    os.makedirs(tmp_dir)
+
+    offsets = array('q', [0])
+    ids = array('q')
+    video_index = array('i')
+    start_times = array('d')
+    end_times = array('d')
+    durations = array('d')
+    sequence_numbers = array('q')
+    groups = array('q')
+    videos: List[List[str]] = []
+    video_positions: Dict[str, int] = {}
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, video_id, video_url, japanese_text, start_time, end_time,
+               duration, sequence_number, COALESCE(duplicate_group, id)
+        FROM subtitles
+        WHERE id <= ?
+        ORDER BY video_id, start_time
+    """, (max_id,))
+
+    position = 0
+    with open(os.path.join(tmp_dir, "text.bin"), "wb") as text_file, \
+            open(os.path.join(tmp_dir, "search.bin"), "wb") as search_file:
+        for subtitle_id, video_id, video_url, text, start, end, duration, seq_num, group in cursor:
+            if video_id not in video_positions:
+                video_positions[video_id] = len(videos)
+                videos.append([video_id, video_url])
+
+            encoded = text.encode('utf-8') + b'\0'
+            text_file.write(encoded)
+            search_file.write(encoded.lower())  # bytes.lower() chỉ đổi chữ ASCII
+            position += len(encoded)
+
+            offsets.append(position)
+            ids.append(subtitle_id)
+            video_index.append(video_positions[video_id])
+            start_times.append(start)
+            end_times.append(end)
+            durations.append(duration)
+            sequence_numbers.append(seq_num if seq_num is not None else -1)
+            groups.append(group)
+
+    conn.close()
+
+    for name, values, dtype in [("offsets", offsets, np.int64), ("ids", ids, np.int64),
+                                ("video_index", video_index, np.int32),
+                                ("start_times", start_times, np.float64),
+                                ("end_times", end_times, np.float64),
+                                ("durations", durations, np.float64),
+                                ("sequence_numbers", sequence_numbers, np.int64),
+                                ("groups", groups, np.int64)]:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.frombuffer(values, dtype=dtype))
+
+    with open(os.path.join(tmp_dir, "videos.json"), "w", encoding="utf-8") as f:
+        json.dump(videos, f, ensure_ascii=False)
+
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'row_count': len(ids),
+        'max_id': max_id,
+        'changes': changes,
+        'created_at': time.time(),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    os.replace(tmp_dir, os.path.join(directory, version))
+    pointer = os.path.join(directory, CURRENT_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    _replace_file(pointer + ".tmp", pointer)
+    remove_old_versions(directory, keep=version)
+    return meta
+
+
+class CorpusSnapshot:
+    """Một phiên bản snapshot đã mở: text buffer và các mảng cột đều được memory-map"""
+
+    def __init__(self, directory: str, version: Optional[str] = None):
+        _load_numpy()
+        self.directory = directory
+        self.version = version
+
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot version {self.meta.get('version')} không được hỗ trợ")
+
+        with open(os.path.join(directory, "videos.json"), encoding="utf-8") as f:
+            self.videos = json.load(f)
+
+        self._files = []
+        self.text = self._map("text.bin")
+        self.search_buffer = self._map("search.bin")
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+
+        self.offsets = load("offsets")
+        self.ids = load("ids")
+        self.video_index = load("video_index")
+        self.start_times = load("start_times")
+        self.end_times = load("end_times")
+        self.durations = load("durations")
+        self.sequence_numbers = load("sequence_numbers")
+        self.groups = load("groups")
+
+    def _map(self, name: str):
+        f = open(os.path.join(self.directory, name), "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def open(cls, directory: str = DEFAULT_SNAPSHOT_DIR) -> Optional['CorpusSnapshot']:
+        """Mở phiên bản CURRENT nếu có NumPy và snapshot hợp lệ, ngược lại trả về None"""
+        version = current_version(directory) if NUMPY_AVAILABLE else None
+        if version is None:
+            return None
+        try:
+            return cls(os.path.join(directory, version), version)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Không mở được snapshot {directory}/{version}: {e}")
+            return None
+
+    def is_fresh(self, conn: sqlite3.Connection) -> bool:
+        """Snapshot còn khớp với database: không có subtitle mới, không có dòng bị sửa / xóa"""
+        return (self.meta['max_id'], self.meta['changes']) == corpus_state(conn)
+
+    def __len__(self) -> int:
+        return self.meta['row_count']
+
+    def row_at(self, byte_position: int) -> int:
+        """Chỉ số dòng chứa byte_position"""
+        return int(np.searchsorted(self.offsets, byte_position, side='right')) - 1
+
+    def find(self, word: str, limit: int = 20) -> List[int]:
+        """Chỉ số các dòng chứa word (không phân biệt hoa thường ASCII, như LIKE)"""
+        return list(self.iter_find(word, limit))
+
+    def iter_find(self, word: str, limit: int = 20) -> Iterator[int]:
+        """
+        Như find nhưng trả từng dòng ngay khi tìm thấy
+
+        Dùng mmap.find trên toàn buffer; sau mỗi lần khớp nhảy sang đầu dòng kế tiếp,
+        nên mỗi dòng chỉ được trả về một lần và không tạo object cho dòng không khớp.
+        """
+        needle = word.encode('utf-8').lower()
+        if not needle:
+            return
+
+        buffer, offsets = self.search_buffer, self.offsets
+        found = 0
+        position = buffer.find(needle)
+        while position != -1 and found < limit:
+            row = self.row_at(position)
+            yield row
+            found += 1
+            position = buffer.find(needle, int(offsets[row + 1]))
+
+    def text_at(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1]) - 1
+        return self.text[start:end].decode('utf-8')
+
+    def row(self, row: int) -> Tuple:
+        """(video_id, video_url, japanese_text, start_time, end_time, duration, sequence_number)"""
+        video_id, video_url = self.videos[int(self.video_index[row])]
+        seq_num = int(self.sequence_numbers[row])
+        return (video_id, video_url, self.text_at(row), float(self.start_times[row]),
+                float(self.end_times[row]), float(self.durations[row]),
+                seq_num if seq_num >= 0 else None)
+
+    def close(self):
+        for buffer in (self.text, self.search_buffer):
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+        for f in self._files:
+            f.close()
+        self._files = []
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fuzzy Subtitle Search
+Tìm gần đúng (edit distance) cho phụ đề tự động nhiều lỗi nhận dạng:
+lấy ứng viên theo số n-gram chung từ index, chỉ tính edit distance trên danh sách ngắn đó
+"""
+
+import sqlite3
+from typing import List, Tuple
+
+from ngram_index import NgramIndex
+
+# Số ứng viên tối đa lấy từ index để kiểm tra edit distance
+MAX_CANDIDATES = 5000
+
+
+def substring_edit_distance(pattern: str, text: str) -> int:
+    """
+    Edit distance nhỏ nhất giữa pattern và một đoạn con bất kỳ của text (thuật toán Sellers)
+
+    Giống Levenshtein nhưng hàng đầu bằng 0, nên pattern có thể bắt đầu ở bất kỳ vị trí nào.
+    """
+    m = len(pattern)
+    if m == 0:
+        return 0
+
+    # previous[i] = distance giữa pattern[:i] và đoạn con kết thúc tại ký tự hiện tại
+    previous = list(range(m + 1))
+    best = previous[m]
+    for char in text:
+        current = [0] * (m + 1)
+        for i in range(1, m + 1):
+            cost = 0 if pattern[i - 1] == char else 1
+            current[i] = min(previous[i - 1] + cost, previous[i] + 1, current[i - 1] + 1)
+        best = min(best, current[m])
+        previous = current
+    return best
+
+
+def fuzzy_search(db_name: str, word: str, max_distance: int = 1,
+                 index: NgramIndex = None) -> List[Tuple[int, Tuple]]:
+    """
+    Tìm các dòng chứa một đoạn cách word không quá max_distance phép sửa
+
+    Với bigram, mỗi phép sửa phá tối đa 2 bigram, nên một dòng khớp phải có chung ít nhất
+    (số bigram khác nhau của word - 2 * max_distance) bigram với word. Từ quá ngắn làm
+    ngưỡng này <= 0 thì dùng ngưỡng 1 (bỏ qua dòng không chung bigram nào).
+
+    Returns:
+        [(distance, row), ...] sắp xếp theo distance, row là (video_id, video_url,
+        japanese_text, start_time, end_time, duration, sequence_number)
+    """
+    index = index or NgramIndex(db_name)
+    needle = word.lower()
+    min_shared = len(index.ngrams(needle)) - index.n * max_distance
+
+    candidate_filter = index.overlap_filter(needle, min_shared, MAX_CANDIDATES)
+    if candidate_filter is None:
+        # Từ một ký tự: không có bigram, khớp gần đúng cũng vô nghĩa -> tìm chính xác
+        where, params = "japanese_text LIKE ?", [f'%{word}%']
+    else:
+        where, params = candidate_filter
+
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT video_id, video_url, japanese_text, start_time, end_time,
+               duration, sequence_number
+        FROM subtitles
+        WHERE {where}
+    """, params)
+
+    matches = []
+    for row in cursor:
+        distance = substring_edit_distance(needle, row[2].lower())
+        if distance <= max_distance:
+            matches.append((distance, row))
+    conn.close()
+
+    matches.sort(key=lambda match: (match[0], match[1][0], match[1][3]))
+    return matches
@@ -16,10 +16,20 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 from typing import List, Dict, Tuple
 
+# Search index modules are imported by update_search_indexes, only when a batch finishes
+from near_duplicates import DuplicateIndex, video_signature
+from japanese_reading import READING_VERSION, to_reading
+import startup
+from startup import forget_tool, tool_version
+from subtitle_db import ensure_schema, optimize_database, refresh_readings
+
 
 class YouTubeSubtitleDownloader:
-    def __init__(self, db_name: str = "japanese_subtitles.db"):
+    def __init__(self, db_name: str = "japanese_subtitles.db", skip_near_duplicates: bool = False):
         self.db_name = db_name
+        # Skip videos whose subtitles nearly match a stored video (reuploads)
+        self.skip_near_duplicates = skip_near_duplicates
+        self.duplicate_index = DuplicateIndex(db_name)
         self.setup_database()
 
     def setup_database(self):
@@ -50,6 +60,9 @@ class YouTubeSubtitleDownloader:
             CREATE INDEX IF NOT EXISTS idx_start_time ON subtitles(start_time);
         ''')
 
+        ensure_schema(conn)
+        self.duplicate_index.ensure_tables(conn)
+
         conn.commit()
         conn.close()
         print(f"Database '{self.db_name}' initialized successfully")
@@ -70,13 +83,8 @@ class YouTubeSubtitleDownloader:
         raise ValueError(f"Could not extract video ID from URL: {url}")
 
     def check_yt_dlp_installed(self) -> bool:
-        """Check if yt-dlp is installed"""
-        try:
-            result = subprocess.run(['yt-dlp', '--version'],
-                                    capture_output=True, text=True)
-            return result.returncode == 0
-        except FileNotFoundError:
-            return False
+        """Check if yt-dlp is installed (cached probe)"""
+        return tool_version('yt-dlp') is not None
 
     def install_yt_dlp(self):
         """Install yt-dlp if not present"""
@@ -85,6 +93,7 @@ class YouTubeSubtitleDownloader:
             subprocess.run([sys.executable, '-m', 'pip', 'install', 'yt-dlp'],
                            check=True)
             print("yt-dlp installed successfully")
+            forget_tool('yt-dlp')
         except subprocess.CalledProcessError:
             print("Failed to install yt-dlp. Please install manually: pip install yt-dlp")
             sys.exit(1)
@@ -135,10 +144,7 @@ class YouTubeSubtitleDownloader:
                         data = json.load(f)
 
                     events = data.get('events', [])
-                    inserted_count = 0
-
-                    conn = sqlite3.connect(self.db_name)
-                    cursor = conn.cursor()
+                    entries = []
 
                     for i, event in enumerate(events):
                         if 'segs' in event:
@@ -149,20 +155,39 @@ class YouTubeSubtitleDownloader:
                             if japanese_text:  # Only insert non-empty text
                                 start_time = event.get('tStartMs', 0) / 1000.0
                                 duration = event.get('dDurationMs', 0) / 1000.0
-                                end_time = start_time + duration
+                                entries.append((japanese_text, start_time, start_time + duration, duration, i))
+
+                    # Reuploads / compilations of a stored video are not ingested again
+                    if self.skip_near_duplicates and entries:
+                        signature = video_signature([entry[0] for entry in entries])
+                        duplicate = self.duplicate_index.find_duplicate_video(video_id, signature)
+                        if duplicate is not None:
+                            original, score = duplicate
+                            self.duplicate_index.record_skipped(video_id, signature, original, score)
+                            os.remove(subtitle_file)
+                            print(f"⏭ Skipped {video_id}: near-duplicate of {original} ({score:.0%} similar)")
+                            return 0
 
-                                try:
-                                    cursor.execute('''
-                                        INSERT OR IGNORE INTO subtitles 
-                                        (video_id, video_url, japanese_text, start_time, end_time, duration, sequence_number)
-                                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                                    ''', (video_id, video_url, japanese_text, start_time, end_time, duration, i))
+                    inserted_count = 0
 
-                                    if cursor.rowcount > 0:
-                                        inserted_count += 1
+                    conn = sqlite3.connect(self.db_name)
+                    cursor = conn.cursor()
+
+                    for japanese_text, start_time, end_time, duration, i in entries:
+                        try:
+                            cursor.execute('''
+                                INSERT OR IGNORE INTO subtitles 
+                                (video_id, video_url, japanese_text, start_time, end_time, duration, sequence_number,
+                                 reading, reading_version, char_length)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            ''', (video_id, video_url, japanese_text, start_time, end_time, duration, i,
+                                  to_reading(japanese_text), READING_VERSION, len(japanese_text)))
+
+                            if cursor.rowcount > 0:
+                                inserted_count += 1
 
-                                except sqlite3.Error as e:
-                                    print(f"Database error for {video_id}: {e}")
+                        except sqlite3.Error as e:
+                            print(f"Database error for {video_id}: {e}")
 
                     conn.commit()
                     conn.close()
@@ -194,6 +219,18 @@ class YouTubeSubtitleDownloader:
             existing_count = cursor.fetchone()[0]
             conn.close()
 
+            duplicate_of = self.duplicate_index.skipped_as_duplicate(video_id)
+            if duplicate_of is not None:
+                print(f"⚠ Video {video_id} already skipped as near-duplicate of {duplicate_of}")
+                return {
+                    'video_id': video_id,
+                    'url': video_url,
+                    'status': 'duplicate',
+                    'duplicate_of': duplicate_of,
+                    'subtitle_count': 0,
+                    'processing_time': time.time() - start_time
+                }
+
             if existing_count > 0:
                 print(f"⚠ Video {video_id} already processed ({existing_count} entries)")
                 return {
@@ -211,6 +248,18 @@ class YouTubeSubtitleDownloader:
                 # Parse and store in database
                 subtitle_count = self.parse_subtitle_file(returned_video_id, video_url)
 
+                if subtitle_count == 0 and self.skip_near_duplicates:
+                    duplicate_of = self.duplicate_index.skipped_as_duplicate(returned_video_id)
+                    if duplicate_of is not None:
+                        return {
+                            'video_id': returned_video_id,
+                            'url': video_url,
+                            'status': 'duplicate',
+                            'duplicate_of': duplicate_of,
+                            'subtitle_count': 0,
+                            'processing_time': time.time() - start_time
+                        }
+
                 return {
                     'video_id': returned_video_id,
                     'url': video_url,
@@ -246,6 +295,7 @@ class YouTubeSubtitleDownloader:
             'failed': 0,
             'skipped': 0,
             'no_subtitles': 0,
+            'duplicates': 0,
             'total_subtitles': 0,
             'details': []
         }
@@ -271,9 +321,59 @@ class YouTubeSubtitleDownloader:
                     results['total_subtitles'] += result['subtitle_count']
                 elif status == 'no_subtitles':
                     results['no_subtitles'] += 1
+                elif status == 'duplicate':
+                    results['duplicates'] += 1
 
+        self.update_search_indexes()
         return results
 
+    def update_search_indexes(self):
+        """Update the search indexes after a batch ingest (single-threaded, once all writes are done)"""
+        from corpus_snapshot import DEFAULT_SNAPSHOT_DIR, NUMPY_AVAILABLE, export_snapshot
+        from ngram_index import NgramIndex
+        from similar_search import DEFAULT_SIMILARITY_DIR, SCIPY_AVAILABLE, SimilarityIndex
+        from suffix_index import DEFAULT_INDEX_DIR, SuffixArrayIndex
+        from term_index import TermFrequencyIndex
+
+        indexed = NgramIndex(self.db_name).update()
+
+        # Term frequencies for search-as-you-type suggestions
+        TermFrequencyIndex(self.db_name).update()
+
+        # MinHash signatures: flag near-duplicate videos, group duplicated lines for search
+        registered = self.duplicate_index.update()
+        if registered:
+            print(f"🧬 Checked {registered} videos for near-duplicates")
+
+        # Kana readings (recomputed when the analyzer changed) and their own index for reading search
+        reading_index = NgramIndex(self.db_name, table="reading_ngrams", column="reading")
+        conn = sqlite3.connect(self.db_name)
+        refresh_readings(conn, reading_index)
+        conn.close()
+        reading_index.update()
+        if indexed:
+            print(f"🔎 Indexed {indexed} new subtitle entries for regex search")
+
+            # Fresh query planner statistics now that the table has grown
+            conn = sqlite3.connect(self.db_name)
+            optimize_database(conn)
+            conn.close()
+
+            # Each batch adds one suffix array segment for its new rows
+            if NUMPY_AVAILABLE:
+                index = SuffixArrayIndex(DEFAULT_INDEX_DIR)
+                index.update(self.db_name)
+                index.close()
+
+            # TF-IDF matrix for similar-sentence search (only the new rows' n-grams are counted)
+            if SCIPY_AVAILABLE:
+                SimilarityIndex(DEFAULT_SIMILARITY_DIR).update(self.db_name)
+
+            # A stale snapshot is never used once new rows exist, so export it again
+            if NUMPY_AVAILABLE and os.path.exists(DEFAULT_SNAPSHOT_DIR):
+                meta = export_snapshot(self.db_name, DEFAULT_SNAPSHOT_DIR)
+                print(f"📦 Refreshed corpus snapshot ({meta['row_count']} entries)")
+
     def load_video_urls_from_file(self, filename: str) -> List[str]:
         """Load video URLs from text file"""
         urls = []
@@ -338,11 +438,12 @@ class YouTubeSubtitleDownloader:
 
 def main():
     """Example usage"""
-    downloader = YouTubeSubtitleDownloader()
+    downloader = YouTubeSubtitleDownloader(skip_near_duplicates='--skip-duplicates' in sys.argv)
 
     # Check yt-dlp installation
     if not downloader.check_yt_dlp_installed():
         downloader.install_yt_dlp()
+    startup.report("downloader ready")
 
     print("YouTube Japanese Subtitle Batch Downloader")
     print("=" * 45)
@@ -382,6 +483,7 @@ def main():
     print(f"✗ Failed: {results['failed']}")
     print(f"⚠ No subtitles: {results['no_subtitles']}")
     print(f"⏭ Skipped (already processed): {results['skipped']}")
+    print(f"🧬 Skipped (near-duplicates): {results['duplicates']}")
     print(f"📝 Total subtitle entries: {results['total_subtitles']}")
 
     # Database statistics
@@ -13,27 +13,29 @@ import re
 from typing import List, Dict, Optional
 from datetime import datetime
 
+import startup
+from startup import forget_tool, tool_version
+
 
 class YouTubeSearchTool:
     def __init__(self, output_file: str = "video_urls.txt"):
         self.output_file = output_file
-        self.check_yt_dlp_installed()
+        # yt-dlp is checked on first use, not at construction
+        self._yt_dlp_checked = False
 
     def check_yt_dlp_installed(self) -> bool:
-        """Check if yt-dlp is installed"""
-        try:
-            result = subprocess.run(['yt-dlp', '--version'],
-                                    capture_output=True, text=True)
-            if result.returncode == 0:
-                return True
-        except FileNotFoundError:
-            pass
+        """Check if yt-dlp is installed (cached probe), installing it if missing"""
+        if self._yt_dlp_checked or tool_version('yt-dlp'):
+            self._yt_dlp_checked = True
+            return True
 
         print("yt-dlp not found. Installing...")
         try:
             subprocess.run([sys.executable, '-m', 'pip', 'install', 'yt-dlp'],
                            check=True)
             print("yt-dlp installed successfully")
+            forget_tool('yt-dlp')
+            self._yt_dlp_checked = True
             return True
         except subprocess.CalledProcessError:
             print("Failed to install yt-dlp. Please install manually: pip install yt-dlp")
@@ -77,6 +79,7 @@ class YouTubeSearchTool:
             elif upload_date == "this_year":
                 filters.append("CAISAhAE")
 
+        self.check_yt_dlp_installed()
         try:
             # Use yt-dlp to search and get video metadata
             cmd = [
@@ -133,6 +136,7 @@ class YouTubeSearchTool:
 
     def get_detailed_video_info(self, video_urls: List[str]) -> List[Dict]:
         """Get detailed information for specific video URLs"""
+        self.check_yt_dlp_installed()
         videos = []
 
         for url in video_urls:
@@ -416,6 +420,7 @@ class YouTubeSearchTool:
 def main():
     """Example usage"""
     search_tool = YouTubeSearchTool()
+    startup.report("search tool ready")
 
     if len(sys.argv) > 1:
         # Command line usage
@@ -13,15 +13,29 @@ import os
 import sys
 import subprocess
 import time
-
-# Import backend modules
-try:
-    from get_url import YouTubeSearchTool
-    from get_subtitle import YouTubeSubtitleDownloader
-    from subtitle_search_player import SubtitleSearchPlayer
-except ImportError as e:
-    print(f"❌ Import error: {e}")
-    sys.exit(1)
+from concurrent.futures import ThreadPoolExecutor
+
+import startup
+from query_control import CancelToken, SearchCancelled
+
+# A word search still scanning after this many seconds is stopped
+WORD_SEARCH_TIMEOUT = 30.0
+# Search-as-you-type: pause in typing before suggestions are fetched, and how many to show
+SUGGEST_DELAY_MS = 150
+SUGGESTION_LIMIT = 8
+# yt-dlp format of the stream played in the built-in player
+STREAM_FORMAT = 'best[height<=720]'
+# A cached stream URL that VLC cannot open within this time is resolved again (once)
+STREAM_START_TIMEOUT = 10.0
+STREAM_CHECK_MS = 500
+# Stream URLs of the first few distinct videos in new results are resolved ahead of a click
+PREFETCH_VIDEOS = 3
+PREFETCH_WORKERS = 2
+# Also cut the audio of those hits into the replay cache (plays as audio only)
+PREFETCH_SEGMENTS = False
+
+# Backend modules (get_url, get_subtitle, subtitle_search_player) are imported
+# on first use so the window appears without waiting for them
 
 # Check VLC availability
 try:
@@ -40,6 +54,12 @@ class BuiltInVideoPlayer:
         self.video_panel = None
         self.current_url = None
         self.is_playing = False
+        # Local audio segments for instant replay, created on first use
+        self._segment_cache = None
+        self._stream_cache = None
+        # Video whose stream is loaded in VLC: hits in it are reached by seeking
+        self.loaded_video_id = None
+        self.loaded_stream_url = None
 
         if VLC_AVAILABLE:
             self.setup_vlc_player()
@@ -123,31 +143,139 @@ class BuiltInVideoPlayer:
         thread.daemon = True
         thread.start()
 
-    def _load_video_thread(self, url):
-        """Get stream URL"""
-        try:
-            cmd = ['yt-dlp', '--get-url', '--format', 'best[height<=720]', url]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    @property
+    def stream_cache(self):
+        """Resolved stream URLs per video, reused until they expire (see stream_cache)"""
+        if self._stream_cache is None:
+            from stream_cache import StreamUrlCache
+            self._stream_cache = StreamUrlCache()
+        return self._stream_cache
+
+    @property
+    def segment_cache(self):
+        """Disk-bounded LRU cache of sentence audio (see audio_cache)"""
+        if self._segment_cache is None:
+            from audio_cache import SegmentCache
+            self._segment_cache = SegmentCache()
+        return self._segment_cache
+
+    def play_segment(self, result):
+        """Play a search hit: from the audio cache if present (no network), else stream it"""
+        self.current_url = result['timestamp_url']
+        if not VLC_AVAILABLE:
+            self.open_browser()
+            return
 
-            if result.returncode == 0:
-                stream_url = result.stdout.strip()
-                self.parent_frame.after(0, self._load_stream, stream_url)
-            else:
-                self.parent_frame.after(0, self._load_error, "Stream error")
+        if result['video_id'] == self.loaded_video_id and self.seek_to(result['start_time']):
+            return
+
+        path = self.segment_cache.get(result['video_id'], result['start_time'], result['end_time'])
+        if path:
+            self._load_stream(path)
+            self.status_var.set("Playing (cached)")
+            return
+
+        self.status_var.set("Loading...")
+        thread = threading.Thread(target=self._load_video_thread, args=(result['timestamp_url'], result))
+        thread.daemon = True
+        thread.start()
+
+    def _load_video_thread(self, url, segment=None):
+        """Get stream URL; for a search hit also cut its audio into the cache for replay"""
+        try:
+            from stream_cache import video_id_from_url
+            video_id = segment['video_id'] if segment is not None else video_id_from_url(url) or url
+            # Hits from the same video share one yt-dlp call until the URL expires
+            stream_url = self.stream_cache.get(video_id, url, STREAM_FORMAT)
+            start_time = segment['start_time'] if segment is not None else None
+            self.parent_frame.after(0, self._load_stream, stream_url, start_time, video_id, url)
+            if segment is not None:
+                self.segment_cache.fill(segment['video_id'], segment['start_time'],
+                                        segment['end_time'], stream_url)
         except Exception as e:
             self.parent_frame.after(0, self._load_error, str(e))
 
-    def _load_stream(self, stream_url):
-        """Load stream in VLC"""
+    def seek_to(self, start_time):
+        """Jump to start_time in the loaded video without new media; False if nothing to seek in"""
+        if not self.vlc_player or not self.loaded_stream_url:
+            return False
+
+        state = self.vlc_player.get_state()
+        if state in (vlc.State.Ended, vlc.State.Stopped, vlc.State.Error):
+            # Finished media cannot seek: reopen the stream URL if it has not expired (no yt-dlp call)
+            stream_url = self.stream_cache.peek(self.loaded_video_id, STREAM_FORMAT)
+            if not stream_url:
+                return False
+            self._load_stream(stream_url, start_time, self.loaded_video_id, self.current_url)
+            return True
+
+        self.vlc_player.set_time(int(start_time * 1000))
+        if not self.vlc_player.is_playing():
+            self.vlc_player.play()
+        self.is_playing = True
+        self.status_var.set("Playing...")
+        return True
+
+    def _load_stream(self, stream_url, start_time=None, video_id=None, video_url=None, retry=True):
+        """Load stream in VLC, starting at start_time (seconds) if given
+
+        A cached URL can be rejected before its expire time; with video_url given, a
+        stream that fails to start is dropped from the cache and resolved once more.
+        """
         try:
             media = self.vlc_instance.media_new(stream_url)
+            if start_time:
+                media.add_option(f"start-time={start_time:.2f}")
             self.vlc_player.set_media(media)
-            self.vlc_player.play()
+            # Cached audio files are not the video stream: later hits must not seek in them
+            self.loaded_video_id = video_id
+            self.loaded_stream_url = stream_url if video_id else None
+            if self.vlc_player.play() == -1:
+                raise RuntimeError("VLC could not open the stream")
             self.vlc_player.audio_set_volume(self.volume_var.get())
             self.is_playing = True
             self.status_var.set("Playing...")
         except Exception as e:
-            self._load_error(str(e))
+            if video_id and video_url and retry:
+                self._reload_stream(video_id, video_url, start_time)
+            else:
+                self._load_error(str(e))
+            return
+
+        if video_id and video_url and retry:
+            deadline = time.time() + STREAM_START_TIMEOUT
+            self.parent_frame.after(STREAM_CHECK_MS, self._check_stream,
+                                    stream_url, start_time, video_id, video_url, deadline)
+
+    def _check_stream(self, stream_url, start_time, video_id, video_url, deadline):
+        """Poll VLC until the stream plays; on an error state resolve the URL again"""
+        if self.loaded_stream_url != stream_url:
+            return  # Another video or stream was loaded meanwhile
+        state = self.vlc_player.get_state()
+        if state == vlc.State.Error:
+            self._reload_stream(video_id, video_url, start_time)
+        elif state not in (vlc.State.Playing, vlc.State.Ended) and time.time() < deadline:
+            self.parent_frame.after(STREAM_CHECK_MS, self._check_stream,
+                                    stream_url, start_time, video_id, video_url, deadline)
+
+    def _reload_stream(self, video_id, video_url, start_time):
+        """Drop the rejected stream URL from the cache and resolve it once more in the background"""
+        self.stream_cache.invalidate(video_id, STREAM_FORMAT)
+        self.loaded_video_id = None
+        self.loaded_stream_url = None
+        self.status_var.set("Stream expired, reloading...")
+
+        def reload():
+            try:
+                stream_url = self.stream_cache.get(video_id, video_url, STREAM_FORMAT)
+                self.parent_frame.after(0, self._load_stream, stream_url, start_time,
+                                        video_id, video_url, False)
+            except Exception as e:
+                self.parent_frame.after(0, self._load_error, str(e))
+
+        thread = threading.Thread(target=reload)
+        thread.daemon = True
+        thread.start()
 
     def _load_error(self, error):
         """Handle error"""
@@ -169,6 +297,11 @@ class BuiltInVideoPlayer:
             self.vlc_player.stop()
             self.is_playing = False
 
+    def close(self):
+        """Persist the audio cache's recency order (reads only reorder it in memory)"""
+        if self._segment_cache is not None:
+            self._segment_cache.close()
+
     def seek(self, seconds):
         if self.vlc_player:
             current = self.vlc_player.get_time()
@@ -203,24 +336,71 @@ class JapaneseAudioSearchGUI:
         self.root.title("🎌 Japanese Audio Search")
         self.root.geometry("1400x900")
 
-        # Backend instances
-        self.search_tool = YouTubeSearchTool()
-        self.downloader = YouTubeSubtitleDownloader()
-        self.player = SubtitleSearchPlayer()
+        # Backend instances, created on first use (see properties below)
+        self._search_tool = None
+        self._downloader = None
+        self._player = None
+        self._backend_lock = threading.Lock()
 
         # Threading
         self.task_queue = queue.Queue()
         self.result_queue = queue.Queue()
+        # Set while mainloop runs; before that, event_generate from a worker blocks then fails
+        self.loop_running = threading.Event()
 
         # Data
         self.current_video_url = None
         self.search_results = []
         self.word_results = []
+        self.word_query = None
+        self.word_cursor = None
+        # Token of the running word search; a new search cancels it
+        self.word_search_token = None
+        # Stream prefetch for the top hits, cancelled with the word search
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+        self.prefetch_futures = []
+        # Pending debounced suggestion lookup (root.after id) and the prefix last sent
+        self.suggest_job = None
+        self.suggest_prefix = None
 
         self.setup_ui()
-        self.check_queue()
+        # Workers wake the main loop with this event instead of it polling the queue
+        self.root.bind("<<ResultReady>>", lambda e: self.check_queue())
+        # Runs once mainloop is up: from then on workers send the event
+        self.root.after_idle(self._loop_started)
         self.refresh_stats()
 
+    @property
+    def search_tool(self):
+        """YouTube search backend"""
+        if self._search_tool is None:
+            with self._backend_lock:
+                if self._search_tool is None:
+                    from get_url import YouTubeSearchTool
+                    self._search_tool = YouTubeSearchTool()
+        return self._search_tool
+
+    @property
+    def downloader(self):
+        """Subtitle downloader backend"""
+        if self._downloader is None:
+            with self._backend_lock:
+                if self._downloader is None:
+                    from get_subtitle import YouTubeSubtitleDownloader
+                    self._downloader = YouTubeSubtitleDownloader()
+        return self._downloader
+
+    @property
+    def player(self):
+        """Subtitle search backend: the search daemon if running (python main.py serve), else local"""
+        if self._player is None:
+            with self._backend_lock:
+                if self._player is None:
+                    from search_client import connect_client
+                    from subtitle_search_player import SubtitleSearchPlayer
+                    self._player = connect_client() or SubtitleSearchPlayer()
+        return self._player
+
     def setup_ui(self):
         """Setup UI"""
         # Main container
@@ -271,8 +451,30 @@ class JapaneseAudioSearchGUI:
         self.word_entry = ttk.Entry(word_frame, width=30)
         self.word_entry.pack(fill="x", pady=(2, 5))
         self.word_entry.bind("<Return>", lambda e: self.search_word())
+        self.word_entry.bind("<KeyRelease>", self.on_word_typed)
+        self.word_entry.bind("<Down>", self.focus_suggestions)
+        self.word_entry.bind("<Escape>", lambda e: self.hide_suggestions())
+
+        # Search-as-you-type suggestions, packed under the entry only when there are any
+        self.suggestion_listbox = tk.Listbox(word_frame, height=SUGGESTION_LIMIT)
+        self.suggestion_listbox.bind("<Return>", self.pick_suggestion)
+        self.suggestion_listbox.bind("<Double-Button-1>", self.pick_suggestion)
+        self.suggestion_listbox.bind("<Escape>", lambda e: (self.hide_suggestions(), self.word_entry.focus_set()))
+        self.suggestion_terms = []
+
+        mode_frame = ttk.Frame(word_frame)
+        mode_frame.pack(fill="x", pady=(0, 5))
+        self.mode_frame = mode_frame
+        ttk.Label(mode_frame, text="Mode:").pack(side="left")
+        self.search_mode = tk.StringVar(value="contains")
+        ttk.Combobox(mode_frame, textvariable=self.search_mode, state="readonly", width=12,
+                     values=["contains", "ranked", "reading", "regex", "fuzzy", "kwic"]).pack(side="left", padx=(5, 0))
 
         ttk.Button(word_frame, text="Search Word", command=self.search_word).pack(fill="x")
+        self.more_button = ttk.Button(word_frame, text="More Results", command=self.search_word_more,
+                                      state="disabled")
+        self.more_button.pack(fill="x", pady=(3, 0))
+        ttk.Button(word_frame, text="More Like This", command=self.search_similar).pack(fill="x", pady=(3, 0))
 
         # Stats
         stats_frame = ttk.LabelFrame(left_frame, text="📊 Database", padding="5")
@@ -357,9 +559,9 @@ class JapaneseAudioSearchGUI:
         """Background video search"""
         try:
             videos = self.search_tool.search_youtube_videos(query, max_results=10)
-            self.result_queue.put(("search_complete", videos))
+            self.post_result(("search_complete", videos))
         except Exception as e:
-            self.result_queue.put(("search_error", str(e)))
+            self.post_result(("search_error", str(e)))
 
     def download_subtitles(self):
         """Download subtitles"""
@@ -379,12 +581,83 @@ class JapaneseAudioSearchGUI:
         try:
             urls = self.downloader.load_video_urls_from_file("video_urls.txt")
             results = self.downloader.process_video_list(urls, max_workers=2)
-            self.result_queue.put(("download_complete", results))
+            self.post_result(("download_complete", results))
         except Exception as e:
-            self.result_queue.put(("download_error", str(e)))
+            self.post_result(("download_error", str(e)))
+
+    def on_word_typed(self, event):
+        """Debounce keystrokes: look up suggestions once typing pauses for SUGGEST_DELAY_MS"""
+        if event.keysym in ("Return", "Escape", "Down", "Up"):
+            return
+        if self.suggest_job is not None:
+            self.root.after_cancel(self.suggest_job)
+        self.suggest_job = self.root.after(SUGGEST_DELAY_MS, self.request_suggestions)
+
+    def request_suggestions(self):
+        """Fetch prefix suggestions for the current entry text in the background"""
+        self.suggest_job = None
+        prefix = self.word_entry.get().strip()
+        # Suggestions are whole terms, only meaningful for substring-style modes
+        if not prefix or self.search_mode.get() not in ("contains", "ranked"):
+            self.hide_suggestions()
+            return
+
+        self.suggest_prefix = prefix
+        thread = threading.Thread(target=self._suggest_thread, args=(prefix,))
+        thread.daemon = True
+        thread.start()
+
+    def _suggest_thread(self, prefix):
+        """Background suggestion lookup (term frequency table, no subtitle scan)"""
+        try:
+            suggestions = self.player.suggest(prefix, limit=SUGGESTION_LIMIT)
+        except Exception:
+            suggestions = []  # Suggestions are best-effort, never interrupt typing
+        self.post_result(("suggestions", prefix, suggestions))
+
+    def show_suggestions(self, suggestions):
+        """Fill the suggestion list and pack it under the entry"""
+        self.suggestion_terms = [term for term, _ in suggestions]
+        self.suggestion_listbox.delete(0, tk.END)
+        for term, frequency in suggestions:
+            self.suggestion_listbox.insert(tk.END, f"{term}  ({frequency:,})")
+        self.suggestion_listbox.config(height=len(suggestions))
+        if not self.suggestion_listbox.winfo_ismapped():
+            self.suggestion_listbox.pack(fill="x", pady=(0, 5), before=self.mode_frame)
+
+    def hide_suggestions(self):
+        """Remove the suggestion list"""
+        if self.suggest_job is not None:
+            self.root.after_cancel(self.suggest_job)
+            self.suggest_job = None
+        self.suggest_prefix = None
+        self.suggestion_terms = []
+        self.suggestion_listbox.pack_forget()
+
+    def focus_suggestions(self, event):
+        """Down arrow in the entry moves into the suggestion list"""
+        if self.suggestion_terms:
+            self.suggestion_listbox.focus_set()
+            self.suggestion_listbox.selection_clear(0, tk.END)
+            self.suggestion_listbox.selection_set(0)
+            self.suggestion_listbox.activate(0)
+        return "break"
+
+    def pick_suggestion(self, event):
+        """Put the chosen suggestion in the entry and search it"""
+        selection = self.suggestion_listbox.curselection()
+        if not selection:
+            return
+        term = self.suggestion_terms[selection[0]]
+        self.hide_suggestions()
+        self.word_entry.delete(0, tk.END)
+        self.word_entry.insert(0, term)
+        self.word_entry.focus_set()
+        self.search_word()
 
     def search_word(self):
         """Search word"""
+        self.hide_suggestions()
         word = self.word_entry.get().strip()
         if not word:
             messagebox.showwarning("Warning", "Enter Japanese word")
@@ -392,26 +665,146 @@ class JapaneseAudioSearchGUI:
 
         self.status_var.set(f"Searching: {word}")
 
-        thread = threading.Thread(target=self._search_word_thread, args=(word,))
+        mode = self.search_mode.get()
+        token = self.start_word_search()
+        if mode in ("contains", "reading"):
+            # Streamed: clear now, batches are appended as they arrive
+            self.word_query = word
+            self.word_cursor = None
+            self.word_results = []
+            self.word_listbox.delete(0, tk.END)
+            self.word_listbox.config(font="TkDefaultFont")
+            self.more_button.config(state="disabled")
+            target = self._stream_word_thread
+        else:
+            target = self._search_word_thread
+
+        thread = threading.Thread(target=target, args=(word, mode, token))
         thread.daemon = True
         thread.start()
 
-    def _search_word_thread(self, word):
+    def start_word_search(self):
+        """Cancel the running word search (its SQLite scan stops at once) and return a new token"""
+        if self.word_search_token is not None:
+            self.word_search_token.cancel()
+        for future in self.prefetch_futures:
+            future.cancel()  # Queued prefetches only; a running yt-dlp still fills the cache
+        self.prefetch_futures = []
+        self.word_search_token = CancelToken(timeout=WORD_SEARCH_TIMEOUT)
+        return self.word_search_token
+
+    def _stream_word_thread(self, word, mode, token):
+        """Background word search posting each batch of hits as soon as it is found"""
+        try:
+            with self.player.cancellable(token):
+                total = 0
+                # Near-duplicate lines from other videos are collapsed, as in ranked mode
+                for batch in self.player.iter_search_word(word, limit=1000, by_reading=mode == "reading",
+                                                          collapse_duplicates=mode == "contains"):
+                    total += len(batch)
+                    self.post_result(("word_batch", token, batch, False))
+                self.post_result(("word_batch", token, [], True))
+
+                if mode == "contains" and total:
+                    self.post_result(("word_count", token, word, self.player.count_occurrences(word)))
+        except SearchCancelled:
+            pass  # Superseded by a newer search
+        except Exception as e:
+            self.post_result(("word_error", str(e)))
+
+    def _search_word_thread(self, word, mode, token):
         """Background word search"""
         try:
-            results = self.player.search_word_in_subtitles(word, limit=20)
-            self.result_queue.put(("word_complete", word, results))
+            with self.player.cancellable(token):
+                if mode == "regex":
+                    results, cursor = self.player.search_regex(word, limit=50), None
+                elif mode == "fuzzy":
+                    results, cursor = self.player.search_fuzzy(word, limit=50), None
+                elif mode == "kwic":
+                    results, cursor = self.player.kwic(word, limit=1000), None
+                else:
+                    results, cursor = self.player.search_ranked(word, limit=20, collapse_duplicates=True)
+                self.player.attach_contexts(results)
+                token.check()
+                self.post_result(("word_complete", token, word, results, cursor))
+
+                if mode == "ranked":
+                    self.post_result(("word_count", token, word, self.player.count_occurrences(word)))
+        except SearchCancelled:
+            pass
+        except Exception as e:
+            self.post_result(("word_error", str(e)))
+
+    def search_word_more(self):
+        """Load next page of word results"""
+        if not self.word_query or self.word_cursor is None:
+            return
+
+        self.more_button.config(state="disabled")
+        self.status_var.set(f"Loading more: {self.word_query}")
+
+        thread = threading.Thread(target=self._search_word_more_thread,
+                                  args=(self.word_query, self.word_cursor, self.start_word_search()))
+        thread.daemon = True
+        thread.start()
+
+    def _search_word_more_thread(self, word, cursor, token):
+        """Background next-page fetch using keyset cursor"""
+        try:
+            with self.player.cancellable(token):
+                results, next_cursor = self.player.search_ranked(word, limit=20, after=cursor,
+                                                                 collapse_duplicates=True)
+                self.player.attach_contexts(results)
+                token.check()
+            self.post_result(("word_more", token, word, results, next_cursor))
+        except SearchCancelled:
+            pass
+        except Exception as e:
+            self.post_result(("word_error", str(e)))
+
+    def search_similar(self):
+        """Find lines similar to the selected word result"""
+        selection = self.word_listbox.curselection()
+        if not selection or not self.word_results:
+            messagebox.showwarning("Warning", "Select a word result first")
+            return
+
+        selected = self.word_results[selection[0]]
+        text = selected['japanese_text']
+        self.status_var.set(f"Finding lines similar to: {text[:30]}")
+
+        thread = threading.Thread(target=self._search_similar_thread,
+                                  args=(text, selected.get('id'), self.start_word_search()))
+        thread.daemon = True
+        thread.start()
+
+    def _search_similar_thread(self, text, subtitle_id, token):
+        """Background similar-line search"""
+        try:
+            with self.player.cancellable(token):
+                results = self.player.more_like_this(text, limit=20, subtitle_id=subtitle_id)
+                self.player.attach_contexts(results)
+                token.check()
+            self.post_result(("word_complete", token, text, results, None))
+        except SearchCancelled:
+            pass
         except Exception as e:
-            self.result_queue.put(("word_error", str(e)))
+            self.post_result(("word_error", str(e)))
 
     def refresh_stats(self):
         """Refresh stats"""
+        thread = threading.Thread(target=self._refresh_stats_thread)
+        thread.daemon = True
+        thread.start()
+
+    def _refresh_stats_thread(self):
+        """Background stats query (also warms up the downloader backend)"""
         try:
             stats = self.downloader.get_database_stats()
             text = f"📝 Entries: {stats['total_subtitle_entries']:,}\n🎥 Videos: {stats['unique_videos']}\n⏱️ Duration: {stats['total_duration_hours']:.1f}h"
-            self.stats_text.config(text=text)
         except Exception as e:
-            self.stats_text.config(text=f"Error: {e}")
+            text = f"Error: {e}"
+        self.post_result(("stats_complete", text))
 
     def on_video_select(self, event):
         """Video selected"""
@@ -426,29 +819,88 @@ class JapaneseAudioSearchGUI:
         selection = self.word_listbox.curselection()
         if selection and self.word_results:
             result = self.word_results[selection[0]]
-            self.video_player.load_video(result['timestamp_url'])
+            self.video_player.play_segment(result)
+            self.status_var.set(f"Found: {result['japanese_text']} | "
+                                f"Time: {self.player.format_time(result['start_time'])}")
 
-            # Show context
-            try:
-                context = self.player.get_video_context(result['video_id'], result['start_time'])
-                context_info = f"Found: {result['japanese_text']}\nTime: {self.player.format_time(result['start_time'])}\n"
-                self.status_var.set(context_info.replace('\n', ' | '))
-            except:
-                pass
+    def prefetch_streams(self, results, token):
+        """Resolve stream URLs of the first PREFETCH_VIDEOS distinct videos in the background"""
+        if not VLC_AVAILABLE or token is None:
+            return
+        seen = set()
+        for res in results:
+            if len(seen) >= PREFETCH_VIDEOS:
+                break
+            if res.get('video_url') and res['video_id'] not in seen:
+                seen.add(res['video_id'])
+                self.prefetch_futures.append(self.prefetch_pool.submit(self._prefetch_stream, res, token))
+
+    def _prefetch_stream(self, result, token):
+        """Prefetch job: warm the stream URL cache (and optionally the audio cache) for one hit"""
+        if token.cancelled:
+            return
+        try:
+            stream_url = self.video_player.stream_cache.get(result['video_id'], result['video_url'], STREAM_FORMAT)
+            if PREFETCH_SEGMENTS and not token.cancelled:
+                self.video_player.segment_cache.fill(result['video_id'], result['start_time'],
+                                                     result['end_time'], stream_url)
+        except Exception:
+            pass  # Best-effort: a click resolves the stream again and reports the error
+
+    def insert_word_results(self, results):
+        """Append result lines to word_listbox"""
+        for res in results:
+            if 'keyword' in res:
+                self.word_listbox.insert(tk.END, self.player.format_kwic_line(res, highlight=False))
+                continue
+            text = res['japanese_text'][:40] + "..." if len(res['japanese_text']) > 40 else res['japanese_text']
+            time_str = self.player.format_time(res['start_time'])
+            # Near-duplicate lines from other videos are collapsed into this hit
+            duplicates = f" (×{res['duplicate_count']})" if res.get('duplicate_count', 1) > 1 else ""
+            self.word_listbox.insert(tk.END, f"[{time_str}] {text}{duplicates}")
+
+    def post_result(self, result):
+        """Queue a background result and wake the Tk loop to handle it (safe from any thread)"""
+        self.result_queue.put(result)
+        if not self.loop_running.is_set():
+            return  # Drained by _loop_started (or never needed after exit)
+        try:
+            self.root.event_generate("<<ResultReady>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            pass  # Main loop exiting: the result stays queued
+
+    def _loop_started(self):
+        """Allow workers to send events, then handle what they queued before mainloop started"""
+        # Set before draining: a worker that saw the flag unset queued its result before this
+        self.loop_running.set()
+        self.check_queue()
 
     def check_queue(self):
-        """Check background results"""
+        """Handle all queued background results"""
         try:
             while True:
                 result = self.result_queue.get_nowait()
                 self.handle_result(result)
         except queue.Empty:
             pass
-        finally:
-            self.root.after(100, self.check_queue)
 
     def handle_result(self, result):
         """Handle background results"""
+        if result[0] == "stats_complete":
+            self.stats_text.config(text=result[1])
+            return
+
+        if result[0] == "suggestions":
+            prefix, suggestions = result[1], result[2]
+            # Ignore answers for text that has since been edited or searched
+            if prefix != self.suggest_prefix or self.suggest_job is not None:
+                return
+            if suggestions and self.root.focus_get() in (self.word_entry, self.suggestion_listbox):
+                self.show_suggestions(suggestions)
+            else:
+                self.hide_suggestions()
+            return
+
         self.progress.stop()
 
         if result[0] == "search_complete":
@@ -466,17 +918,48 @@ class JapaneseAudioSearchGUI:
             if videos:
                 self.search_tool.add_urls_to_file(videos)
 
-        elif result[0] == "word_complete":
-            word, results = result[1], result[2]
-            self.word_results = results
-
-            self.word_listbox.delete(0, tk.END)
-            for res in results:
-                text = res['japanese_text'][:40] + "..." if len(res['japanese_text']) > 40 else res['japanese_text']
-                time_str = self.player.format_time(res['start_time'])
-                self.word_listbox.insert(tk.END, f"[{time_str}] {text}")
+        elif result[0] in ("word_complete", "word_more"):
+            token, word, results, cursor = result[1], result[2], result[3], result[4]
+            if token is not self.word_search_token:
+                return  # Results of a superseded search
+
+            if result[0] == "word_complete":
+                self.word_results = []
+                self.word_listbox.delete(0, tk.END)
+
+            self.word_query = word
+            self.word_cursor = cursor
+            self.word_results.extend(results)
+
+            # Concordance lines need a monospace font so the context columns line up
+            is_kwic = bool(results) and 'keyword' in results[0]
+            self.word_listbox.config(font="TkFixedFont" if is_kwic else "TkDefaultFont")
+            self.insert_word_results(results)
+
+            self.more_button.config(state="normal" if cursor is not None else "disabled")
+            if result[0] == "word_complete":
+                self.prefetch_streams(results, token)
+            self.status_var.set(f"Showing {len(self.word_results)} occurrences"
+                                + (" (more available)" if cursor is not None else ""))
+
+        elif result[0] == "word_batch":
+            token, results, done = result[1], result[2], result[3]
+            if token is not self.word_search_token:
+                return  # Batch from a superseded search
+
+            if not self.word_results:
+                self.prefetch_streams(results, token)
+            self.word_results.extend(results)
+            self.insert_word_results(results)
+            if done:
+                self.status_var.set(f"Found {len(self.word_results)} occurrences")
+            else:
+                self.status_var.set(f"Searching: {self.word_query} ({len(self.word_results)} so far)")
 
-            self.status_var.set(f"Found {len(results)} occurrences")
+        elif result[0] == "word_count":
+            token, total = result[1], result[3]
+            if token is self.word_search_token:
+                self.status_var.set(f"Showing {len(self.word_results)} of {total:,} occurrences in corpus")
 
         elif result[0] == "download_complete":
             results = result[1]
@@ -493,11 +976,16 @@ def main():
     """Main function"""
     root = tk.Tk()
     app = JapaneseAudioSearchGUI(root)
+    root.after_idle(startup.report, "window shown")
 
     try:
         root.mainloop()
     except KeyboardInterrupt:
         print("GUI closed")
+    finally:
+        app.loop_running.clear()
+        app.prefetch_pool.shutdown(wait=False, cancel_futures=True)
+        app.video_player.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
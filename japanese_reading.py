@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Japanese Reading Conversion
+Chuyển subtitle sang cách đọc hiragana (lúc ingest) và romaji sang hiragana (lúc tìm kiếm)
+"""
+
+import re
+
+try:
+    import pykakasi
+
+    PYKAKASI_AVAILABLE = True
+except ImportError:
+    PYKAKASI_AVAILABLE = False
+
+_kakasi = None
+_missing_analyzer_warned = False
+
+# Phiên bản bộ phân tích cách đọc, lưu trong subtitles.reading_version: dòng có phiên bản
+# cũ hơn được tính lại (vd. sau khi cài pykakasi, kanji mới có cách đọc)
+#   1 - chỉ đổi katakana -> hiragana
+#   2 - pykakasi
+READING_VERSION = 2 if PYKAKASI_AVAILABLE else 1
+
+ROMAJI_TABLE = {
+    'a': 'あ', 'i': 'い', 'u': 'う', 'e': 'え', 'o': 'お',
+    'ka': 'か', 'ki': 'き', 'ku': 'く', 'ke': 'け', 'ko': 'こ',
+    'sa': 'さ', 'si': 'し', 'shi': 'し', 'su': 'す', 'se': 'せ', 'so': 'そ',
+    'ta': 'た', 'ti': 'ち', 'chi': 'ち', 'tu': 'つ', 'tsu': 'つ', 'te': 'て', 'to': 'と',
+    'na': 'な', 'ni': 'に', 'nu': 'ぬ', 'ne': 'ね', 'no': 'の',
+    'ha': 'は', 'hi': 'ひ', 'hu': 'ふ', 'fu': 'ふ', 'he': 'へ', 'ho': 'ほ',
+    'ma': 'ま', 'mi': 'み', 'mu': 'む', 'me': 'め', 'mo': 'も',
+    'ya': 'や', 'yu': 'ゆ', 'yo': 'よ',
+    'ra': 'ら', 'ri': 'り', 'ru': 'る', 're': 'れ', 'ro': 'ろ',
+    'wa': 'わ', 'wi': 'ゐ', 'we': 'ゑ', 'wo': 'を',
+    'ga': 'が', 'gi': 'ぎ', 'gu': 'ぐ', 'ge': 'げ', 'go': 'ご',
+    'za': 'ざ', 'zi': 'じ', 'ji': 'じ', 'zu': 'ず', 'ze': 'ぜ', 'zo': 'ぞ',
+    'da': 'だ', 'di': 'ぢ', 'du': 'づ', 'dzu': 'づ', 'de': 'で', 'do': 'ど',
+    'ba': 'ば', 'bi': 'び', 'bu': 'ぶ', 'be': 'べ', 'bo': 'ぼ',
+    'pa': 'ぱ', 'pi': 'ぴ', 'pu': 'ぷ', 'pe': 'ぺ', 'po': 'ぽ',
+    'kya': 'きゃ', 'kyu': 'きゅ', 'kyo': 'きょ',
+    'sha': 'しゃ', 'shu': 'しゅ', 'she': 'しぇ', 'sho': 'しょ',
+    'sya': 'しゃ', 'syu': 'しゅ', 'syo': 'しょ',
+    'cha': 'ちゃ', 'chu': 'ちゅ', 'che': 'ちぇ', 'cho': 'ちょ',
+    'tya': 'ちゃ', 'tyu': 'ちゅ', 'tyo': 'ちょ',
+    'nya': 'にゃ', 'nyu': 'にゅ', 'nyo': 'にょ',
+    'hya': 'ひゃ', 'hyu': 'ひゅ', 'hyo': 'ひょ',
+    'mya': 'みゃ', 'myu': 'みゅ', 'myo': 'みょ',
+    'rya': 'りゃ', 'ryu': 'りゅ', 'ryo': 'りょ',
+    'gya': 'ぎゃ', 'gyu': 'ぎゅ', 'gyo': 'ぎょ',
+    'ja': 'じゃ', 'ju': 'じゅ', 'je': 'じぇ', 'jo': 'じょ',
+    'jya': 'じゃ', 'jyu': 'じゅ', 'jyo': 'じょ', 'zya': 'じゃ', 'zyu': 'じゅ', 'zyo': 'じょ',
+    'bya': 'びゃ', 'byu': 'びゅ', 'byo': 'びょ',
+    'pya': 'ぴゃ', 'pyu': 'ぴゅ', 'pyo': 'ぴょ',
+    'fa': 'ふぁ', 'fi': 'ふぃ', 'fe': 'ふぇ', 'fo': 'ふぉ',
+    'thi': 'てぃ', 'dhi': 'でぃ', 'va': 'ゔぁ', 'vi': 'ゔぃ', 'vu': 'ゔ',
+    'xa': 'ぁ', 'xi': 'ぃ', 'xu': 'ぅ', 'xe': 'ぇ', 'xo': 'ぉ', 'xtsu': 'っ', 'xtu': 'っ',
+    'xya': 'ゃ', 'xyu': 'ゅ', 'xyo': 'ょ',
+    'nn': 'ん', "n'": 'ん', '-': 'ー',
+}
+_MAX_ROMAJI_LENGTH = max(len(key) for key in ROMAJI_TABLE)
+_VOWELS = set('aiueo')
+
+
+def katakana_to_hiragana(text: str) -> str:
+    """Đổi katakana (ァ-ヶ) sang hiragana, giữ nguyên ký tự khác"""
+    return ''.join(chr(ord(char) - 0x60) if 'ァ' <= char <= 'ヶ' else char for char in text)
+
+
+def to_reading(text: str) -> str:
+    """
+    Cách đọc hiragana của một dòng subtitle (dùng lúc ingest)
+
+    Dùng pykakasi (thuần Python, có từ điển kanji) nếu đã cài; nếu không chỉ
+    chuẩn hóa katakana -> hiragana, kanji được giữ nguyên.
+    """
+    global _kakasi
+    if not text:
+        return ''
+
+    if PYKAKASI_AVAILABLE:
+        if _kakasi is None:
+            _kakasi = pykakasi.kakasi()
+        text = ''.join(item['hira'] for item in _kakasi.convert(text))
+
+    return katakana_to_hiragana(text).lower()
+
+
+def warn_missing_analyzer():
+    """Cảnh báo (một lần mỗi process) khi tìm theo cách đọc mà chưa cài pykakasi"""
+    global _missing_analyzer_warned
+    if PYKAKASI_AVAILABLE or _missing_analyzer_warned:
+        return
+    _missing_analyzer_warned = True
+    print("⚠ Chưa cài pykakasi: tìm theo cách đọc chỉ khớp kana, dòng có kanji (vd. 食べる) "
+          "sẽ không khớp. Cài bằng: pip install pykakasi")
+
+
+def romaji_to_hiragana(text: str) -> str:
+    """Chuyển romaji (Hepburn/Kunrei) sang hiragana, ký tự không nhận ra được giữ nguyên"""
+    text = text.lower()
+    result = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+
+        # Phụ âm đôi -> っ (vd. kitte -> きって, Hepburn matcha -> まっちゃ), trừ nn
+        if 'a' <= char <= 'z' and char not in _VOWELS and char != 'n' and \
+                (text[i + 1:i + 2] == char or (char == 't' and text[i + 1:i + 3] == 'ch')):
+            result.append('っ')
+            i += 1
+            continue
+
+        # n đứng trước phụ âm hoặc cuối chuỗi -> ん; "nn" + nguyên âm là ん + な.. (konnichiha)
+        if char == 'n' and (i + 1 == len(text) or
+                            (text[i + 1] not in _VOWELS and text[i + 1] not in "y'n") or
+                            (text[i + 1] == 'n' and i + 2 < len(text) and text[i + 2] in _VOWELS | {'y'})):
+            result.append('ん')
+            i += 1
+            continue
+
+        for length in range(_MAX_ROMAJI_LENGTH, 0, -1):
+            kana = ROMAJI_TABLE.get(text[i:i + length])
+            if kana:
+                result.append(kana)
+                i += length
+                break
+        else:
+            result.append(char)
+            i += 1
+
+    return ''.join(result)
+
+
+def normalize_reading_query(query: str) -> str:
+    """Chuẩn hóa từ khóa tìm theo cách đọc: romaji -> hiragana, katakana -> hiragana"""
+    query = query.strip()
+    if re.search(r'[A-Za-z]', query):
+        query = romaji_to_hiragana(query)
+    return katakana_to_hiragana(query)
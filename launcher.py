@@ -4,6 +4,7 @@ Launcher - mở GUI mặc định khi double-click
 """
 import sys
 import os
+import multiprocessing
 
 # Add current directory to path
 if hasattr(sys, '_MEIPASS'):
@@ -16,6 +17,9 @@ else:
 from main import main
 
 if __name__ == "__main__":
+    # Worker process (regex/batch search) trong bản exe PyInstaller
+    multiprocessing.freeze_support()
+
     # Nếu không có arguments, mở GUI
     if len(sys.argv) == 1:
         sys.argv.append("gui")
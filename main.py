@@ -5,17 +5,26 @@ Japanese Audio Search - Main CLI
 Gộp 3 tools thành 1 command duy nhất - KHÔNG thay đổi code gốc
 """
 
+import startup  # Import đầu tiên: mốc 0 của báo cáo --timing
+
 import sys
 import os
+import importlib
+
+
+MISSING_FILES_MESSAGE = ("❌ Không tìm thấy files gốc. Hãy chạy từ thư mục chứa "
+                         "get_url.py, get_subtitle.py, subtitle_search_player.py")
 
-# Import các modules gốc - KHÔNG SỬA GÌ
-try:
-    from get_url import main as search_main
-    from get_subtitle import main as download_main
-    from subtitle_search_player import main as player_main
-except ImportError:
-    print("❌ Không tìm thấy files gốc. Hãy chạy từ thư mục chứa get_url.py, get_subtitle.py, subtitle_search_player.py")
-    sys.exit(1)
+
+def load_command(module_name: str, missing_message: str = MISSING_FILES_MESSAGE):
+    """Import module gốc chỉ khi lệnh của nó được chạy - KHÔNG SỬA GÌ"""
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        print(missing_message)
+        sys.exit(1)
+    startup.mark(f"import {module_name}")
+    return module.main
 
 
 def show_help():
@@ -26,7 +35,23 @@ def show_help():
     print("  python main.py gui                - Mở GUI (khuyên dùng)")
     print("  python main.py search [query]     - Tìm video YouTube")
     print("  python main.py download           - Tải subtitle")
+    print("  python main.py download --skip-duplicates - Bỏ qua video gần trùng với video đã có")
     print("  python main.py play [word]        - Tìm từ và phát")
+    print("  python main.py play --batch words.txt [--top-k N] [--output out.jsonl]")
+    print("                                    - Tìm cả danh sách từ, ghi kết quả JSONL")
+    print("  python main.py play --export-clips word [--limit N] [--output clips/] [--anki] [--media-dir DIR]")
+    print("                                    - Cắt audio clip cho kết quả (cần ffmpeg), ghi manifest CSV / Anki")
+    print("  python main.py play --export-snapshot - Tạo snapshot memory-mapped (cần numpy)")
+    print("  python main.py play --count [word] - Đếm số lần xuất hiện trong corpus")
+    print("  python main.py play --build-index - Cập nhật schema và build index tìm kiếm: n-gram (regex, ~gần đúng),")
+    print("                                    suffix array (--count, concordance), câu tương tự (--similar)")
+    print("  python main.py play --kwic [word] [--output kwic.jsonl] - Concordance (KWIC)")
+    print("  python main.py play --suggest [tiền tố] - Gợi ý từ theo tiền tố (bảng tần suất)")
+    print("  python main.py play --similar [câu] - Tìm câu tương tự (cần numpy, scipy)")
+    print("  python main.py play --duplicates  - Liệt kê video gần trùng (reupload, compilation)")
+    print("  python main.py play --explain [word] - EXPLAIN QUERY PLAN của từng chế độ tìm kiếm")
+    print("  python main.py serve [--port N]   - Chạy search daemon (CLI/GUI tự dùng khi đang chạy)")
+    print("  python main.py --timing [command] - In thời gian khởi động")
     print("")
     print("Ví dụ:")
     print("  python main.py gui")
@@ -43,8 +68,13 @@ def show_help():
 
 def main():
     """Main function - chỉ routing, không sửa logic gốc"""
+    if '--timing' in sys.argv:
+        sys.argv.remove('--timing')
+        startup.enable_timing()
+
     if len(sys.argv) < 2:
         show_help()
+        startup.report("help")
         return
 
     command = sys.argv[1].lower()
@@ -56,22 +86,22 @@ def main():
     try:
         if command in ['gui', 'g']:
             print("🖥️ Starting GUI...")
-            try:
-                from gui import main as gui_main
-                gui_main()
-            except ImportError:
-                print("❌ GUI not available. Make sure gui.py exists.")
+            load_command("gui", "❌ GUI not available. Make sure gui.py exists.")()
         elif command in ['search', 's']:
             print("🔍 Starting YouTube Search...")
-            search_main()
+            load_command("get_url")()
         elif command in ['download', 'd', 'dl']:
             print("📥 Starting Subtitle Download...")
-            download_main()
+            load_command("get_subtitle")()
         elif command in ['play', 'p', 'player']:
             print("🎯 Starting Subtitle Search & Player...")
-            player_main()
+            load_command("subtitle_search_player")()
+        elif command in ['serve', 'server']:
+            print("🌐 Starting Search Daemon...")
+            load_command("search_server")()
         elif command in ['help', 'h', '--help', '-h']:
             show_help()
+            startup.report("help")
         else:
             print(f"❌ Unknown command: {command}")
             show_help()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Near-Duplicate Detection
+MinHash + LSH để phát hiện video và đoạn subtitle gần trùng giữa các video
+(reupload, compilation, intro của kênh)
+
+Mỗi dòng có một MinHash signature trên tập 3-gram ký tự (đã chuẩn hóa). Vì MinHash
+của hợp các tập bằng min từng vị trí của các signature, signature của một cửa sổ
+WINDOW_SIZE dòng liên tiếp và của cả video được ghép từ signature các dòng mà không
+phải băm lại. Signature được chia thành BANDS band; hai video / cửa sổ chung ít nhất
+một bucket là ứng viên, độ giống được ước lượng bằng tỉ lệ vị trí trùng nhau.
+
+Dòng thuộc một cửa sổ gần trùng với cửa sổ của video khác được gán
+subtitles.duplicate_group = id của dòng xuất hiện đầu tiên, để tìm kiếm gộp các bản trùng.
+"""
+
+import importlib.util
+import operator
+import random
+import sqlite3
+import struct
+import unicodedata
+import zlib
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# NumPy (tùy chọn) chỉ dùng để tính signature nhanh hơn, import khi cần
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+NUM_PERM = 64
+# 16 band x 4 hàng: cặp có độ giống ~0.5 trở lên gần như chắc chắn chung một bucket
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+WINDOW_SIZE = 5
+WINDOW_STEP = 2
+
+VIDEO_THRESHOLD = 0.8   # Đánh dấu video gần trùng
+SKIP_THRESHOLD = 0.9    # Bỏ qua khi ingest (skip_near_duplicates)
+WINDOW_THRESHOLD = 0.7  # Cửa sổ dòng gần trùng
+LINE_THRESHOLD = 0.6    # Ghép từng dòng trong hai cửa sổ gần trùng (Jaccard 3-gram)
+
+_PRIME = (1 << 31) - 1
+_rng = random.Random(20240611)  # Cố định: signature đã lưu phải so được với signature mới
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+# Signature của dòng rỗng: phần tử trung hòa của phép min
+EMPTY_SIGNATURE = [_PRIME] * NUM_PERM
+_SIGNATURE_FORMAT = f"<{NUM_PERM}I"
+
+
+def normalize_line(text: str) -> str:
+    """NFKC, lowercase, chỉ giữ chữ và số (bỏ dấu câu, khoảng trắng, ký hiệu ♪...)"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] in 'LN')
+
+
+def shingles(text: str) -> Set[str]:
+    """Tập 3-gram ký tự của dòng đã chuẩn hóa (dòng ngắn hơn: cả dòng)"""
+    text = normalize_line(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def line_signature(text: str) -> List[int]:
+    """MinHash signature của một dòng"""
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)]
+    if not hashes:
+        return EMPTY_SIGNATURE
+    return [min((a * x + b) % _PRIME for x in hashes) for a, b in _PERMUTATIONS]
+
+
+def line_signatures(texts: Sequence[str]) -> List[List[int]]:
+    """
+    Signature của từng dòng (cùng kết quả với line_signature)
+
+    Có NumPy: băm mọi shingle của cả video trong một phép tính ma trận
+    (NUM_PERM x số shingle) rồi lấy min theo từng đoạn của mỗi dòng.
+    """
+    if not NUMPY_AVAILABLE:
+        return [line_signature(text) for text in texts]
+    _load_numpy()
+
+    hashes, starts, non_empty = [], [], []
+    for line, text in enumerate(texts):
+        line_hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)]
+        if line_hashes:
+            starts.append(len(hashes))
+            non_empty.append(line)
+            hashes.extend(line_hashes)
+
+    signatures = [EMPTY_SIGNATURE] * len(texts)
+    if not hashes:
+        return signatures
+
+    # a < 2^31, x < 2^32: a * x + b vẫn nằm trong uint64
+    a = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+    b = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+    values = (a * np.array(hashes, dtype=np.uint64) + b) % np.uint64(_PRIME)
+    minimums = np.minimum.reduceat(values, starts, axis=1).T.tolist()
+    for line, signature in zip(non_empty, minimums):
+        signatures[line] = signature
+    return signatures
+
+
+def combine(signatures: Sequence[List[int]]) -> List[int]:
+    """Signature của hợp các tập = min từng vị trí"""
+    if not signatures:
+        return EMPTY_SIGNATURE
+    return [min(values) for values in zip(*signatures)]
+
+
+def video_signature(texts: Sequence[str]) -> List[int]:
+    """Signature của cả video từ các dòng subtitle"""
+    return combine(line_signatures(texts))
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Ước lượng độ giống Jaccard từ hai signature"""
+    return sum(map(operator.eq, a, b)) / NUM_PERM
+
+
+def lsh_keys(signature: Sequence[int]) -> List[int]:
+    """Khóa bucket của từng band (band ở 8 bit cao, băm của band ở 32 bit thấp)"""
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys.append((band << 32) | zlib.crc32(struct.pack(f"<{ROWS_PER_BAND}I", *values)))
+    return keys
+
+
+def _missing_table(error: sqlite3.OperationalError) -> bool:
+    """Bảng chưa được tạo (database chưa qua downloader phiên bản này): coi như chưa có dữ liệu"""
+    return 'no such table' in str(error)
+
+
+def pack_signature(signature: Sequence[int]) -> bytes:
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def unpack_signature(blob: bytes) -> Tuple[int, ...]:
+    return struct.unpack(_SIGNATURE_FORMAT, blob)
+
+
+class DuplicateIndex:
+    """Signature + bảng LSH của video và cửa sổ dòng, cập nhật tăng dần theo subtitles.id"""
+
+    STATE_NAME = "near_duplicates"
+
+    def __init__(self, db_name: str = "japanese_subtitles.db"):
+        self.db_name = db_name
+
+    def ensure_tables(self, conn: sqlite3.Connection):
+        """Tạo bảng signature / bucket nếu chưa có (lúc tạo database và khi cập nhật, không khi đọc)"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS video_signatures (
+                video_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                duplicate_of TEXT,
+                similarity REAL,
+                skipped INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS video_lsh (
+                bucket INTEGER NOT NULL,
+                video_id TEXT NOT NULL,
+                PRIMARY KEY (bucket, video_id)
+            ) WITHOUT ROWID
+        ''')
+        # Cửa sổ được xác định bằng id của dòng đầu tiên
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS window_signatures (
+                start_id INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                signature BLOB NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_window_signatures_video ON window_signatures(video_id)
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS window_lsh (
+                bucket INTEGER NOT NULL,
+                start_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, start_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_index_state (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL
+            )
+        ''')
+
+    # ---------- Video ----------
+
+    def _best_video_match(self, conn: sqlite3.Connection, signature: List[int],
+                          video_id: str) -> Tuple[Optional[str], float]:
+        """Video đã lưu (khác video_id) giống signature nhất và độ giống ước lượng"""
+        keys = lsh_keys(signature)
+        placeholders = ','.join('?' for _ in keys)
+        rows = conn.execute(f'''
+            SELECT v.video_id, v.signature
+            FROM video_signatures v
+            WHERE v.skipped = 0 AND v.video_id != ? AND v.video_id IN (
+                SELECT video_id FROM video_lsh WHERE bucket IN ({placeholders})
+            )
+        ''', [video_id] + keys).fetchall()
+
+        best, best_similarity = None, 0.0
+        for candidate, blob in rows:
+            score = similarity(signature, unpack_signature(blob))
+            if score > best_similarity:
+                best, best_similarity = candidate, score
+        return best, best_similarity
+
+    def find_duplicate_video(self, video_id: str, signature: List[int],
+                             threshold: float = SKIP_THRESHOLD) -> Optional[Tuple[str, float]]:
+        """
+        (video đã lưu, độ giống) nếu video có signature (video_signature) gần trùng
+        hoàn toàn với một video đã có trong database, ngược lại None. Chỉ đọc, gọi
+        trước khi ghi subtitle.
+        """
+        conn = sqlite3.connect(self.db_name)
+        try:
+            match, score = self._best_video_match(conn, signature, video_id)
+        except sqlite3.OperationalError as e:
+            if not _missing_table(e):
+                raise
+            match, score = None, 0.0
+        finally:
+            conn.close()
+        return (match, score) if match is not None and score >= threshold else None
+
+    def record_skipped(self, video_id: str, signature: List[int], duplicate_of: str, score: float):
+        """Ghi nhận video bị bỏ qua vì gần trùng (để không tải lại ở lần chạy sau)"""
+        conn = sqlite3.connect(self.db_name)
+        self.ensure_tables(conn)
+        conn.execute('''
+            INSERT OR REPLACE INTO video_signatures (video_id, signature, duplicate_of, similarity, skipped)
+            VALUES (?, ?, ?, ?, 1)
+        ''', (video_id, pack_signature(signature), duplicate_of, score))
+        conn.commit()
+        conn.close()
+
+    def skipped_as_duplicate(self, video_id: str) -> Optional[str]:
+        """Video gốc nếu video_id đã bị bỏ qua khi ingest vì gần trùng, ngược lại None"""
+        conn = sqlite3.connect(self.db_name)
+        try:
+            row = conn.execute("SELECT duplicate_of FROM video_signatures WHERE video_id = ? AND skipped = 1",
+                               (video_id,)).fetchone()
+        except sqlite3.OperationalError as e:
+            if not _missing_table(e):
+                raise
+            row = None
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def near_duplicate_videos(self) -> List[Tuple[str, str, float, bool]]:
+        """[(video_id, video gốc, độ giống, đã bỏ qua khi ingest), ...]"""
+        conn = sqlite3.connect(self.db_name)
+        try:
+            rows = conn.execute('''
+                SELECT video_id, duplicate_of, similarity, skipped FROM video_signatures
+                WHERE duplicate_of IS NOT NULL
+                ORDER BY similarity DESC
+            ''').fetchall()
+        except sqlite3.OperationalError as e:
+            if not _missing_table(e):
+                raise
+            rows = []
+        finally:
+            conn.close()
+        return [(video_id, original, score, bool(skipped)) for video_id, original, score, skipped in rows]
+
+    # ---------- Cập nhật ----------
+
+    def update(self) -> int:
+        """Đăng ký các video có subtitle mới (id lớn hơn lần trước). Trả về số video đã xử lý."""
+        conn = sqlite3.connect(self.db_name)
+        self.ensure_tables(conn)
+
+        row = conn.execute("SELECT last_id FROM search_index_state WHERE name = ?",
+                           (self.STATE_NAME,)).fetchone()
+        last_id = row[0] if row else 0
+        max_id = conn.execute("SELECT MAX(id) FROM subtitles").fetchone()[0] or 0
+
+        # Theo thứ tự ingest: video có trước là bản gốc của các bản trùng sau nó
+        video_ids = [video_id for video_id, in conn.execute('''
+            SELECT video_id FROM subtitles
+            WHERE id > ? AND id <= ?
+            GROUP BY video_id
+            ORDER BY MIN(id)
+        ''', (last_id, max_id))]
+
+        for video_id in video_ids:
+            self._register_video(conn, video_id)
+            conn.commit()
+
+        conn.execute("INSERT OR REPLACE INTO search_index_state (name, last_id) VALUES (?, ?)",
+                     (self.STATE_NAME, max_id))
+        conn.commit()
+        conn.close()
+        return len(video_ids)
+
+    def _register_video(self, conn: sqlite3.Connection, video_id: str):
+        """Tính signature của video và các cửa sổ, ghép dòng trùng với video đã có"""
+        rows = conn.execute('''
+            SELECT id, japanese_text FROM subtitles
+            WHERE video_id = ?
+            ORDER BY start_time
+        ''', (video_id,)).fetchall()
+        signatures = line_signatures([text for _, text in rows])
+
+        # Video có thêm dòng sau lần đăng ký trước: đăng ký lại từ đầu
+        conn.execute("DELETE FROM video_lsh WHERE video_id = ?", (video_id,))
+        conn.execute('''
+            DELETE FROM window_lsh WHERE start_id IN (
+                SELECT start_id FROM window_signatures WHERE video_id = ?
+            )
+        ''', (video_id,))
+        conn.execute("DELETE FROM window_signatures WHERE video_id = ?", (video_id,))
+
+        signature = combine(signatures)
+        original, score = self._best_video_match(conn, signature, video_id)
+        if score < VIDEO_THRESHOLD:
+            original, score = None, None
+        conn.execute('''
+            INSERT OR REPLACE INTO video_signatures (video_id, signature, duplicate_of, similarity, skipped)
+            VALUES (?, ?, ?, ?, 0)
+        ''', (video_id, pack_signature(signature), original, score))
+        conn.executemany("INSERT OR IGNORE INTO video_lsh (bucket, video_id) VALUES (?, ?)",
+                         [(key, video_id) for key in lsh_keys(signature)])
+
+        for start in range(0, max(1, len(rows) - WINDOW_SIZE + 1), WINDOW_STEP):
+            window = rows[start:start + WINDOW_SIZE]
+            window_signature = combine(signatures[start:start + WINDOW_SIZE])
+            if window_signature == EMPTY_SIGNATURE:
+                continue
+
+            match = self._best_window_match(conn, window_signature, video_id)
+            if match is not None:
+                self._link_lines(conn, window, match)
+
+            start_id = window[0][0]
+            conn.execute("INSERT OR REPLACE INTO window_signatures (start_id, video_id, signature) VALUES (?, ?, ?)",
+                         (start_id, video_id, pack_signature(window_signature)))
+            conn.executemany("INSERT OR IGNORE INTO window_lsh (bucket, start_id) VALUES (?, ?)",
+                             [(key, start_id) for key in lsh_keys(window_signature)])
+
+    def _best_window_match(self, conn: sqlite3.Connection, signature: List[int],
+                           video_id: str) -> Optional[int]:
+        """start_id của cửa sổ (ở video khác) giống nhất nếu đạt WINDOW_THRESHOLD"""
+        keys = lsh_keys(signature)
+        placeholders = ','.join('?' for _ in keys)
+        rows = conn.execute(f'''
+            SELECT w.start_id, w.signature
+            FROM window_signatures w
+            WHERE w.video_id != ? AND w.start_id IN (
+                SELECT start_id FROM window_lsh WHERE bucket IN ({placeholders})
+            )
+        ''', [video_id] + keys).fetchall()
+
+        best, best_similarity = None, WINDOW_THRESHOLD
+        for start_id, blob in rows:
+            score = similarity(signature, unpack_signature(blob))
+            if score >= best_similarity:
+                best, best_similarity = start_id, score
+        return best
+
+    def _link_lines(self, conn: sqlite3.Connection, window: List[Tuple[int, str]], match_start_id: int):
+        """Gán duplicate_group cho từng dòng của window giống một dòng trong cửa sổ match_start_id"""
+        matched = conn.execute('''
+            SELECT s.id, s.japanese_text, s.duplicate_group
+            FROM subtitles s, subtitles first
+            WHERE first.id = ? AND s.video_id = first.video_id AND s.start_time >= first.start_time
+            ORDER BY s.start_time
+            LIMIT ?
+        ''', (match_start_id, WINDOW_SIZE)).fetchall()
+        matched_shingles = [(subtitle_id, shingles(text), group) for subtitle_id, text, group in matched]
+
+        updates: Dict[int, int] = {}
+        for subtitle_id, text in window:
+            line_shingles = shingles(text)
+            best_group, best_score = None, LINE_THRESHOLD
+            for original_id, original_shingles, group in matched_shingles:
+                score = jaccard(line_shingles, original_shingles)
+                if score >= best_score:
+                    best_group, best_score = group or original_id, score
+            if best_group is not None:
+                updates[subtitle_id] = best_group
+
+        # Dòng đã được ghép ở cửa sổ chồng lấn trước đó giữ nhóm cũ
+        conn.executemany("UPDATE subtitles SET duplicate_group = ? WHERE id = ? AND duplicate_group IS NULL",
+                         [(group, subtitle_id) for subtitle_id, group in updates.items()])
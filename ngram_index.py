@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Character N-gram Index
+Bảng posting (gram -> subtitle id) để lọc ứng viên cho tìm kiếm regex / gần đúng
+"""
+
+import sqlite3
+from typing import List, Optional, Set, Tuple
+
+
+class NgramIndex:
+    """Index bigram ký tự của một cột trong bảng subtitles, cập nhật tăng dần theo id"""
+
+    def __init__(self, db_name: str = "japanese_subtitles.db", table: str = "subtitle_ngrams",
+                 column: str = "japanese_text", n: int = 2):
+        self.db_name = db_name
+        self.table = table
+        self.column = column
+        self.n = n
+
+    def ensure_tables(self, conn: sqlite3.Connection):
+        """Tạo bảng posting và bảng trạng thái nếu chưa có"""
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                gram TEXT NOT NULL,
+                subtitle_id INTEGER NOT NULL,
+                PRIMARY KEY (gram, subtitle_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_index_state (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL
+            )
+        ''')
+
+    def last_indexed_id(self, conn: sqlite3.Connection) -> Optional[int]:
+        """id lớn nhất đã được index, None nếu index chưa từng được build (chỉ đọc)"""
+        try:
+            row = conn.execute("SELECT last_id FROM search_index_state WHERE name = ?",
+                               (self.table,)).fetchone()
+        except sqlite3.OperationalError:  # Database cũ: chưa có bảng trạng thái
+            return None
+        return row[0] if row else None
+
+    def ngrams(self, text: str) -> Set[str]:
+        """Tập n-gram (đã lowercase) của text"""
+        text = (text or '').lower()
+        n = self.n
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def update(self, batch_size: int = 5000) -> int:
+        """Index các subtitle mới (id lớn hơn id đã index lần trước). Trả về số dòng đã index."""
+        conn = sqlite3.connect(self.db_name)
+        self.ensure_tables(conn)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT last_id FROM search_index_state WHERE name = ?", (self.table,))
+        row = cursor.fetchone()
+        last_id = row[0] if row else 0
+        indexed = 0
+
+        while True:
+            cursor.execute(f'''
+                SELECT id, {self.column} FROM subtitles
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} (gram, subtitle_id) VALUES (?, ?)",
+                ((gram, subtitle_id) for subtitle_id, text in rows for gram in self.ngrams(text))
+            )
+            last_id = rows[-1][0]
+            conn.execute("INSERT OR REPLACE INTO search_index_state (name, last_id) VALUES (?, ?)",
+                         (self.table, last_id))
+            conn.commit()
+            indexed += len(rows)
+
+        conn.close()
+        return indexed
+
+    def replace_postings(self, conn: sqlite3.Connection, changes: List[Tuple[int, Optional[str], str]]):
+        """
+        Sửa posting của các dòng có giá trị cột thay đổi: [(subtitle_id, giá trị cũ, giá trị mới), ...]
+
+        Chỉ các dòng đã được index (id <= last_id) mới cần sửa; dòng sau đó sẽ được update() index.
+        Chưa commit (thuộc transaction của người gọi).
+        """
+        self.ensure_tables(conn)
+        row = conn.execute("SELECT last_id FROM search_index_state WHERE name = ?", (self.table,)).fetchone()
+        last_id = row[0] if row else 0
+
+        removed, added = [], []
+        for subtitle_id, old_value, new_value in changes:
+            if subtitle_id > last_id:
+                continue
+            old_grams, new_grams = self.ngrams(old_value), self.ngrams(new_value)
+            removed.extend((gram, subtitle_id) for gram in old_grams - new_grams)
+            added.extend((gram, subtitle_id) for gram in new_grams - old_grams)
+
+        conn.executemany(f"DELETE FROM {self.table} WHERE gram = ? AND subtitle_id = ?", removed)
+        conn.executemany(f"INSERT OR IGNORE INTO {self.table} (gram, subtitle_id) VALUES (?, ?)", added)
+
+    def literal_filter(self, literal: str) -> Optional[Tuple[str, List]]:
+        """
+        Điều kiện SQL (trên subtitles.id) chọn các dòng chứa đủ mọi n-gram của literal
+
+        Trả về None nếu literal ngắn hơn n (không dùng được index).
+        """
+        grams = sorted(self.ngrams(literal))
+        if not grams:
+            return None
+
+        placeholders = ','.join('?' for _ in grams)
+        sql = f'''id IN (
+            SELECT subtitle_id FROM {self.table}
+            WHERE gram IN ({placeholders})
+            GROUP BY subtitle_id
+            HAVING COUNT(*) = ?
+        )'''
+        return sql, grams + [len(grams)]
+
+    def overlap_filter(self, text: str, min_shared: int, limit: int) -> Optional[Tuple[str, List]]:
+        """
+        Điều kiện SQL chọn tối đa limit dòng có chung ít nhất min_shared n-gram với text,
+        ưu tiên dòng có nhiều n-gram chung hơn. None nếu text ngắn hơn n.
+        """
+        grams = sorted(self.ngrams(text))
+        if not grams:
+            return None
+
+        placeholders = ','.join('?' for _ in grams)
+        sql = f'''id IN (
+            SELECT subtitle_id FROM {self.table}
+            WHERE gram IN ({placeholders})
+            GROUP BY subtitle_id
+            HAVING COUNT(*) >= ?
+            ORDER BY COUNT(*) DESC
+            LIMIT ?
+        )'''
+        return sql, grams + [max(1, min_shared), limit]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Control
+Hủy và giới hạn thời gian truy vấn SQLite đang chạy (tìm kiếm bị thay thế bởi tìm kiếm mới)
+
+CancelToken được gắn vào mọi connection mở trong lúc nó còn hiệu lực:
+- cancel() gọi Connection.interrupt() nên truy vấn đang quét dừng ngay, kể cả
+  khi được gọi từ thread khác (vd. thread giao diện)
+- progress handler kiểm tra hạn chót sau mỗi PROGRESS_STEPS lệnh VM của SQLite
+Truy vấn bị dừng báo sqlite3.OperationalError('interrupted'), được đổi thành
+SearchCancelled hoặc TimeoutError bởi token.translate().
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+# Số lệnh VM giữa hai lần kiểm tra hạn chót (~vài trăm micro giây)
+PROGRESS_STEPS = 10000
+
+
+class SearchCancelled(Exception):
+    """Tìm kiếm bị hủy (đã có tìm kiếm mới thay thế)"""
+
+
+class CancelToken:
+    """Cờ hủy + hạn chót cho một lần tìm kiếm"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._cancelled = threading.Event()
+        self._connections = []
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def cancel(self):
+        """Hủy token: dừng ngay các truy vấn đang chạy trên connection đã gắn"""
+        self._cancelled.set()
+        with self._lock:
+            connections = list(self._connections)
+            callbacks, self._callbacks = self._callbacks, []
+        for conn in connections:
+            try:
+                conn.interrupt()
+            except sqlite3.ProgrammingError:
+                pass  # Connection đã đóng
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Gọi callback khi token bị hủy (ngay lập tức nếu đã bị hủy), vd. hủy request đang chờ daemon"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        """Báo lỗi nếu token đã bị hủy hoặc quá hạn (dùng giữa các bước không phải SQL)"""
+        if self.cancelled:
+            raise SearchCancelled()
+        if self.expired:
+            raise TimeoutError(f"Truy vấn chạy quá {self.timeout}s")
+
+    def _should_abort(self) -> int:
+        return 1 if self.cancelled or self.expired else 0
+
+    def attach(self, conn: sqlite3.Connection):
+        """Gắn token vào connection (progress handler + danh sách để interrupt)"""
+        conn.set_progress_handler(self._should_abort, PROGRESS_STEPS)
+        with self._lock:
+            self._connections.append(conn)
+        if self.cancelled:
+            conn.interrupt()
+
+    def release(self):
+        """Gỡ progress handler khỏi các connection (connection được giữ lại giữa các lần gọi)
+        và bỏ các callback hủy"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._callbacks = []
+        for conn in connections:
+            try:
+                conn.set_progress_handler(None, 0)
+            except sqlite3.ProgrammingError:
+                pass
+
+    def translate(self, error: sqlite3.OperationalError) -> Exception:
+        """Lỗi tương ứng cho một truy vấn bị dừng giữa chừng"""
+        if self.cancelled:
+            return SearchCancelled()
+        if self.expired:
+            return TimeoutError(f"Truy vấn chạy quá {self.timeout}s")
+        return error
+
+
+def is_interrupted(error: sqlite3.OperationalError) -> bool:
+    return 'interrupt' in str(error)
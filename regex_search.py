@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regex Subtitle Search
+Tìm mẫu ngữ pháp bằng regex: lọc ứng viên bằng literal bắt buộc (qua n-gram index),
+chỉ chạy regex trên ứng viên, trong process riêng có giới hạn thời gian
+"""
+
+import multiprocessing
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from ngram_index import NgramIndex
+from query_control import CancelToken
+
+# Số tổ hợp literal tối đa khi ghép chuỗi (vd. (a|b)(c|d) -> ac, ad, bc, bd)
+MAX_LITERAL_ALTERNATIVES = 16
+# Khoảng chờ (giây) giữa hai lần kiểm tra CancelToken khi đợi worker
+POLL_INTERVAL = 0.05
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+
+
+def _combine(prefixes: Set[str], suffixes: Set[str]) -> Optional[Set[str]]:
+    if len(prefixes) * len(suffixes) > MAX_LITERAL_ALTERNATIVES:
+        return None
+    return {p + s for p in prefixes for s in suffixes}
+
+
+def _best_clause(exact: Optional[Set[str]], clauses: List[Set[str]]) -> Optional[Set[str]]:
+    """Chọn một điều kiện OR đại diện (chuỗi ngắn nhất dài nhất) cho một nhánh"""
+    candidates = list(clauses)
+    if exact:
+        candidates.append(exact)
+    candidates = [c for c in candidates if '' not in c]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: min(len(s) for s in c))
+
+
+def _analyze(items) -> Tuple[Optional[Set[str]], List[Set[str]]]:
+    """
+    Phân tích một dãy node của sre_parse
+
+    Returns:
+        (exact, clauses): exact là tập chuỗi chính xác mà dãy này khớp (None nếu
+        không hữu hạn), clauses là danh sách điều kiện bắt buộc dạng AND của OR.
+    """
+    clauses: List[Set[str]] = []
+    current: Optional[Set[str]] = {''}
+    all_exact = True
+
+    def flush():
+        if current and '' not in current:
+            clauses.append(set(current))
+
+    for op, av in items:
+        exact, sub_clauses = _analyze_node(op, av)
+        clauses.extend(sub_clauses)
+
+        if exact is None:
+            all_exact = False
+            flush()
+            current = {''}
+            continue
+
+        combined = _combine(current, exact)
+        if combined is None:
+            all_exact = False
+            flush()
+            current = set(exact)
+        else:
+            current = combined
+
+    flush()
+    return (current if all_exact else None), clauses
+
+
+def _analyze_node(op, av) -> Tuple[Optional[Set[str]], List[Set[str]]]:
+    if op is sre_parse.LITERAL:
+        return {chr(av)}, []
+
+    if op is sre_parse.AT:
+        return {''}, []
+
+    if op is sre_parse.IN:
+        if all(item_op is sre_parse.LITERAL for item_op, _ in av) and \
+                len(av) <= MAX_LITERAL_ALTERNATIVES:
+            return {chr(item_av) for _, item_av in av}, []
+        return None, []
+
+    if op is sre_parse.SUBPATTERN:
+        return _analyze(av[-1])
+
+    if op is sre_parse.BRANCH:
+        results = [_analyze(alternative) for alternative in av[1]]
+        if all(exact is not None for exact, _ in results):
+            union = set().union(*(exact for exact, _ in results))
+            if len(union) <= MAX_LITERAL_ALTERNATIVES:
+                return union, []
+
+        # Mỗi nhánh phải đóng góp một điều kiện, nếu không thì cả BRANCH không bắt buộc gì
+        branch_clause: Set[str] = set()
+        for exact, clauses in results:
+            best = _best_clause(exact, clauses)
+            if best is None:
+                return None, []
+            branch_clause |= best
+        return None, [branch_clause]
+
+    if op in _REPEATS:
+        min_count, max_count, sub_items = av
+        if min_count == 0:
+            return None, []
+        exact, clauses = _analyze(sub_items)
+        if min_count == max_count == 1:
+            return exact, clauses
+        if exact and '' not in exact:
+            clauses = clauses + [exact]
+        return None, clauses
+
+    return None, []
+
+
+def extract_required_literals(pattern: str, flags: int = 0) -> List[Set[str]]:
+    """
+    Trích các literal bắt buộc của regex
+
+    Returns:
+        Danh sách điều kiện, mỗi điều kiện là tập literal (dòng phải chứa ít nhất
+        một literal của mỗi điều kiện). Danh sách rỗng nghĩa là không lọc được.
+
+    Ví dụ: 'ても(いい|良い)' -> [{'てもいい', 'ても良い'}]
+    """
+    parsed = sre_parse.parse(pattern, flags)
+    _, clauses = _analyze(list(parsed))
+
+    unique = []
+    for clause in clauses:
+        if clause not in unique:
+            unique.append(clause)
+    return unique
+
+
+def build_candidate_filter(clauses: List[Set[str]], index: NgramIndex) -> Tuple[str, List]:
+    """Chuyển các điều kiện literal thành mệnh đề WHERE (dùng n-gram index khi literal đủ dài)"""
+    conditions = []
+    params: List = []
+
+    for clause in clauses:
+        parts = []
+        for literal in sorted(clause):
+            indexed = index.literal_filter(literal)
+            if indexed is not None:
+                sql, literal_params = indexed
+                parts.append(sql)
+                params.extend(literal_params)
+            else:
+                parts.append("japanese_text LIKE ?")
+                params.append(f'%{literal}%')
+        conditions.append("(" + " OR ".join(parts) + ")")
+
+    return (" AND ".join(conditions) if conditions else "1"), params
+
+
+def run_regex_search(db_name: str, pattern: str, flags: int, limit: int) -> List[Tuple]:
+    """
+    Lấy ứng viên từ index rồi chạy regex đã compile trên từng ứng viên
+
+    Chạy trong worker process của RegexSearcher để có thể dừng khi quá thời gian.
+    """
+    compiled = re.compile(pattern, flags)
+    where, params = build_candidate_filter(extract_required_literals(pattern, flags),
+                                           NgramIndex(db_name))
+
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT video_id, video_url, japanese_text, start_time, end_time,
+               duration, sequence_number
+        FROM subtitles
+        WHERE {where}
+        ORDER BY video_id, start_time
+    """, params)
+
+    matches = []
+    for row in cursor:
+        if compiled.search(row[2]):
+            matches.append(row)
+            if len(matches) >= limit:
+                break
+
+    conn.close()
+    return matches
+
+
+class RegexSearcher:
+    """Chạy regex search trong process riêng; process bị dừng nếu quá timeout hoặc bị hủy"""
+
+    def __init__(self, db_name: str = "japanese_subtitles.db", timeout: float = 3.0):
+        self.db_name = db_name
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: không fork tiến trình GUI đang có nhiều thread
+            self._pool = multiprocessing.get_context('spawn').Pool(1)
+        return self._pool
+
+    def search(self, pattern: str, flags: int = 0, limit: int = 20,
+               timeout: Optional[float] = None, token: Optional[CancelToken] = None) -> List[Tuple]:
+        """
+        Worker chỉ chạy một tìm kiếm mỗi lúc. Trong lúc chờ (worker bận, hoặc đang chạy
+        tìm kiếm này), token được kiểm tra sau mỗi POLL_INTERVAL giây: tìm kiếm bị hủy
+        dừng process worker ngay, nên tìm kiếm mới không phải đợi nó hết timeout.
+
+        Raises:
+            re.error: pattern không hợp lệ
+            TimeoutError: regex chạy quá timeout giây (process worker bị dừng)
+            SearchCancelled: token bị hủy
+        """
+        re.compile(pattern, flags)  # Báo lỗi cú pháp ngay, không cần worker
+        timeout = timeout or self.timeout
+
+        while not self._lock.acquire(timeout=POLL_INTERVAL):
+            if token is not None:
+                token.check()
+        try:
+            pool = self._get_pool()
+            async_result = pool.apply_async(run_regex_search,
+                                            (self.db_name, pattern, flags, limit))
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    if token is not None:
+                        token.check()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Regex '{pattern}' chạy quá {timeout}s")
+                    return async_result.get(min(POLL_INTERVAL, remaining))
+                except multiprocessing.TimeoutError:
+                    continue
+                except Exception:
+                    if not async_result.ready():
+                        # Hủy / quá hạn khi worker còn chạy: dừng process, lần sau tạo lại
+                        pool.terminate()
+                        self._pool = None
+                    raise
+        finally:
+            self._lock.release()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool = None
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search Daemon Client
+Thin client cho search daemon (search_server.py), dùng bởi CLI và GUI khi daemon đang chạy
+
+Chỉ dùng thư viện chuẩn, query_control và search_frontend: khởi động client không phải
+import SQLite, NumPy hay các module index.
+"""
+
+import http.client
+import json
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from query_control import CancelToken, SearchCancelled
+from search_frontend import SearchFrontend
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_SERVER_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+
+class RemoteSearchPlayer(SearchFrontend):
+    """
+    Thin client cho search daemon, cùng interface truy vấn với SubtitleSearchPlayer
+
+    Các hàm truy vấn dữ liệu được gửi tới daemon; hiển thị, mở video và
+    giao diện tương tác dùng chung SearchFrontend với SubtitleSearchPlayer.
+    """
+
+    def __init__(self, url: str = DEFAULT_SERVER_URL, timeout: float = 30.0):
+        # http.client trực tiếp: nhẹ hơn urllib.request và không đi qua proxy hệ thống
+        location = urlsplit(url)
+        self.host = location.hostname or DEFAULT_HOST
+        self.port = location.port or DEFAULT_PORT
+        self.timeout = timeout
+        self._local = threading.local()
+        self.db_name = self._send('/health')['db_name']
+
+    def _request(self, path: str, params: Optional[Dict] = None, body: Optional[Dict] = None) -> Dict:
+        """
+        Gửi request; trong khối cancellable(), request mang id và thời gian còn lại của token
+
+        Daemon dừng truy vấn khi hết thời gian đó, và token.cancel() gửi /cancel để
+        daemon dừng ngay thay vì giữ worker tới REQUEST_TIMEOUT.
+        """
+        token = getattr(self._local, 'token', None)
+        if token is None:
+            return self._send(path, params, body)
+
+        token.check()
+        request_id = uuid.uuid4().hex
+        params = dict(params or {}, request=request_id)
+        timeout = self.timeout
+        if token.deadline is not None:
+            remaining = max(0.0, token.deadline - time.monotonic())
+            params['time_limit'] = f"{remaining:.3f}"
+            timeout = min(timeout, remaining + 1.0)
+        token.on_cancel(lambda: threading.Thread(target=self._send_cancel, args=(request_id,),
+                                                 daemon=True).start())
+        return self._send(path, params, body, timeout)
+
+    def _send_cancel(self, request_id: str):
+        try:
+            self._send('/cancel', {'request': request_id}, timeout=2.0)
+        except (OSError, ValueError, RuntimeError):
+            pass  # Daemon đã trả lời hoặc đã dừng
+
+    def _send(self, path: str, params: Optional[Dict] = None, body: Optional[Dict] = None,
+              timeout: Optional[float] = None) -> Dict:
+        if params:
+            path += '?' + urlencode({key: value for key, value in params.items() if value is not None})
+
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout or self.timeout)
+        try:
+            if body is None:
+                conn.request('GET', path)
+            else:
+                conn.request('POST', path, json.dumps(body, ensure_ascii=False).encode('utf-8'),
+                             {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            payload = json.loads(response.read().decode('utf-8') or '{}')
+        finally:
+            conn.close()
+
+        if response.status != 200:
+            message = payload.get('error', f"HTTP {response.status}")
+            if payload.get('type') == 'regex':
+                raise re.error(message)
+            if payload.get('type') == 'timeout':
+                raise TimeoutError(message)
+            if payload.get('type') == 'cancelled':
+                raise SearchCancelled()
+            raise RuntimeError(message)
+        return payload
+
+    @contextmanager
+    def cancellable(self, token: CancelToken):
+        """Các request gửi trong khối này (trên thread hiện tại) bị daemon dừng khi token bị hủy / quá hạn"""
+        previous = getattr(self._local, 'token', None)
+        self._local.token = token
+        try:
+            yield token
+        finally:
+            self._local.token = previous
+            token.release()
+        # Kết quả về sau khi token bị hủy (daemon trả lời trước khi nhận /cancel): bỏ đi
+        if token.cancelled:
+            raise SearchCancelled()
+
+    def search_word_in_subtitles(self, search_word: str, exact_match: bool = False,
+                                 limit: int = 20, max_per_video: Optional[int] = None,
+                                 by_reading: bool = False, collapse_duplicates: bool = False) -> List[Dict]:
+        mode = 'reading' if by_reading else 'exact' if exact_match else 'contains'
+        return self._request('/search', {'q': search_word, 'mode': mode, 'limit': limit,
+                                         'max_per_video': max_per_video,
+                                         'collapse': 1 if collapse_duplicates else None})['results']
+
+    def iter_search_word(self, search_word: str, exact_match: bool = False, limit: int = 1000,
+                         by_reading: bool = False, batch_size: int = 100,
+                         collapse_duplicates: bool = False) -> Iterator[List[Dict]]:
+        # Daemon trả cả danh sách trong một response (thường đã có trong cache)
+        results = self.search_word_in_subtitles(search_word, exact_match=exact_match, limit=limit,
+                                                by_reading=by_reading, collapse_duplicates=collapse_duplicates)
+        if results:
+            yield results
+
+    def search_ranked(self, search_word: str, limit: int = 20,
+                      after: Optional[Tuple[float, int]] = None,
+                      collapse_duplicates: bool = False) -> Tuple[List[Dict], Optional[Tuple[float, int]]]:
+        payload = self._request('/search', {'q': search_word, 'mode': 'ranked', 'limit': limit,
+                                            'after': f"{after[0]!r},{after[1]}" if after else None,
+                                            'collapse': 1 if collapse_duplicates else None})
+        next_cursor = payload['next_cursor']
+        return payload['results'], tuple(next_cursor) if next_cursor else None
+
+    def search_regex(self, pattern: str, limit: int = 20,
+                     timeout: Optional[float] = None) -> List[Dict]:
+        return self._request('/search', {'q': pattern, 'mode': 'regex', 'limit': limit,
+                                         'timeout': timeout})['results']
+
+    def search_fuzzy(self, search_word: str, max_distance: int = 1,
+                     limit: int = 20) -> List[Dict]:
+        return self._request('/search', {'q': search_word, 'mode': 'fuzzy', 'limit': limit,
+                                         'max_distance': max_distance})['results']
+
+    def advanced_search(self, search_term: str, filters: Dict = None) -> List[Dict]:
+        return self._request('/search', body={'q': search_term, 'mode': 'advanced',
+                                              'filters': filters})['results']
+
+    def count_occurrences(self, word: str) -> int:
+        return self._request('/count', {'q': word})['count']
+
+    def locate_occurrences(self, word: str, limit: int = 100) -> List[Tuple[int, int]]:
+        return [tuple(position) for position in
+                self._request('/locate', {'q': word, 'limit': limit})['positions']]
+
+    def kwic(self, word: str, limit: int = 1000, width: int = 15) -> List[Dict]:
+        return self._request('/kwic', {'q': word, 'limit': limit, 'width': width})['results']
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Tuple[str, int]]:
+        return [tuple(item) for item in self._request('/suggest', {'q': prefix, 'limit': limit})['suggestions']]
+
+    def more_like_this(self, text: str, limit: int = 10,
+                       subtitle_id: Optional[int] = None) -> List[Dict]:
+        return self._request('/similar', {'q': text, 'limit': limit, 'exclude': subtitle_id})['results']
+
+    def get_contexts(self, targets: List[Tuple[str, float]],
+                     context_seconds: int = 10) -> List[List[Dict]]:
+        if not targets:
+            return []
+        return self._request('/context', body={'targets': [list(target) for target in targets],
+                                               'seconds': context_seconds})['contexts']
+
+    def database_stats(self) -> Dict:
+        return self._request('/stats')
+
+    def close(self):
+        """Không có gì để đóng: mỗi request dùng một connection HTTP riêng"""
+
+
+def connect_client(url: str = DEFAULT_SERVER_URL, timeout: float = 0.3) -> Optional[RemoteSearchPlayer]:
+    """RemoteSearchPlayer nếu daemon đang chạy tại url, ngược lại None"""
+    try:
+        client = RemoteSearchPlayer(url, timeout=timeout)
+    except (OSError, ValueError, RuntimeError):
+        return None
+    client.timeout = 30.0
+    return client
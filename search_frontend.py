@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search Frontend
+Hiển thị kết quả và giao diện tìm kiếm tương tác, dùng chung cho SubtitleSearchPlayer
+(database local) và RemoteSearchPlayer (search daemon)
+
+Chỉ dùng thư viện chuẩn: các hàm ở đây gọi hàm truy vấn của lớp con (search_ranked,
+get_contexts, database_stats...), nên thin client không phải import SQLite / index.
+"""
+
+import json
+import re
+import unicodedata
+import webbrowser
+from typing import Dict, List, Optional, Tuple
+
+from query_control import CancelToken
+
+
+class SearchFrontend:
+    """Định dạng, hiển thị kết quả và giao diện tương tác trên các hàm truy vấn của lớp con"""
+
+    # Hạn chót mặc định (giây) cho một lần tìm kiếm trong giao diện tương tác
+    QUERY_TIMEOUT = 30.0
+
+    def create_timestamp_url(self, video_url: str, start_time: float) -> str:
+        """Tạo URL YouTube với timestamp"""
+        # Chuyển đổi thời gian từ giây sang định dạng YouTube
+        start_seconds = int(start_time)
+
+        # Nếu URL đã có timestamp, thay thế nó
+        if 't=' in video_url or '#t=' in video_url:
+            # Loại bỏ timestamp cũ
+            video_url = re.sub(r'[&#]t=\d+', '', video_url)
+            video_url = re.sub(r'[&#]start=\d+', '', video_url)
+
+        # Thêm timestamp mới
+        separator = '&' if '?' in video_url else '?'
+        return f"{video_url}{separator}t={start_seconds}s"
+
+    def format_time(self, seconds: float) -> str:
+        """Chuyển đổi giây thành định dạng mm:ss hoặc hh:mm:ss"""
+        total_seconds = int(seconds)
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        secs = total_seconds % 60
+
+        if hours > 0:
+            return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+        else:
+            return f"{minutes:02d}:{secs:02d}"
+
+    def highlight_search_term(self, text: str, search_term: str) -> str:
+        """Highlight từ tìm kiếm trong text (cho terminal)"""
+        if not search_term:
+            return text
+
+        # Sử dụng ANSI color codes để highlight
+        highlighted = re.sub(
+            f'({re.escape(search_term)})',
+            r'\033[93m\1\033[0m',  # Yellow highlight
+            text,
+            flags=re.IGNORECASE
+        )
+        return highlighted
+
+    def display_search_results(self, results: List[Dict], search_term: str = "",
+                               start_index: int = 1):
+        """Hiển thị kết quả tìm kiếm (start_index: số thứ tự của kết quả đầu tiên)"""
+        if not results:
+            print(f"❌ Không tìm thấy kết quả cho '{search_term}'")
+            return
+
+        print(f"\n🔍 Tìm thấy {len(results)} kết quả cho '{search_term}':")
+        print("=" * 80)
+
+        for i, result in enumerate(results, start_index):
+            # Highlight search term
+            highlighted_text = self.highlight_search_term(result['japanese_text'], search_term)
+
+            print(f"{i:2d}. {highlighted_text}")
+            print(f"    ⏰ Thời gian: {self.format_time(result['start_time'])} - {self.format_time(result['end_time'])}")
+            print(f"    🎥 Video ID: {result['video_id']}")
+            if result.get('duplicate_count', 1) > 1:
+                print(f"    🧬 +{result['duplicate_count'] - 1} bản gần trùng ở video khác (reupload / compilation)")
+            print(f"    🔗 URL: {result['timestamp_url']}")
+            print()
+
+    def get_video_context(self, video_id: str, target_time: float,
+                          context_seconds: int = 10) -> List[Dict]:
+        """
+        Lấy ngữ cảnh xung quanh thời điểm tìm thấy (subtitle trước và sau)
+
+        Args:
+            video_id: ID của video
+            target_time: Thời gian của subtitle tìm thấy
+            context_seconds: Số giây trước và sau để lấy ngữ cảnh
+        """
+        return self.get_contexts([(video_id, target_time)], context_seconds)[0]
+
+    def attach_contexts(self, results: List[Dict], context_seconds: int = 10) -> List[Dict]:
+        """Lấy ngữ cảnh cho cả trang kết quả (một truy vấn) và gắn vào result['context']"""
+        contexts = self.get_contexts([(r['video_id'], r['start_time']) for r in results],
+                                     context_seconds)
+        for result, context in zip(results, contexts):
+            result['context'] = context
+        return results
+
+    def show_context(self, video_id: str, target_time: float, search_term: str = "",
+                     context: Optional[List[Dict]] = None):
+        """Hiển thị ngữ cảnh xung quanh subtitle tìm thấy (context: ngữ cảnh đã lấy sẵn)"""
+        if context is None:
+            context = self.get_video_context(video_id, target_time, context_seconds=15)
+
+        if not context:
+            return
+
+        print(f"\n📖 Ngữ cảnh xung quanh (Video: {video_id}):")
+        print("-" * 60)
+
+        for item in context:
+            time_str = self.format_time(item['start_time'])
+
+            if item['is_target']:
+                # Highlight subtitle chính
+                text = self.highlight_search_term(item['text'], search_term)
+                print(f"👉 [{time_str}] {text}")
+            else:
+                print(f"   [{time_str}] {item['text']}")
+
+        print("-" * 60)
+
+    def open_youtube_video(self, url: str, show_confirmation: bool = True):
+        """Mở video YouTube trong browser"""
+        try:
+            if show_confirmation:
+                confirm = input(f"\n🎬 Mở video YouTube? (y/n): ").strip().lower()
+                if confirm not in ['y', 'yes', 'có', 'c']:
+                    print("❌ Đã hủy.")
+                    return False
+
+            print(f"🚀 Đang mở: {url}")
+            webbrowser.open(url)
+            return True
+
+        except Exception as e:
+            print(f"❌ Lỗi khi mở browser: {e}")
+            return False
+
+    def format_kwic_line(self, entry: Dict, width: int = 15, highlight: bool = True) -> str:
+        """Một dòng KWIC căn lề: ngữ cảnh trái căn phải theo độ rộng hiển thị (chữ Nhật = 2 cột)"""
+        left = entry['left'].replace('\n', ' ')
+        right = entry['right'].replace('\n', ' ')
+        padding = max(0, width * 2 - self._display_width(left))
+        keyword = f"\033[93m{entry['keyword']}\033[0m" if highlight else f"【{entry['keyword']}】"
+        return f"[{self.format_time(entry['start_time'])}] {' ' * padding}{left} {keyword} {right}"
+
+    def _display_width(self, text: str) -> int:
+        return sum(2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1 for char in text)
+
+    def display_kwic(self, entries: List[Dict], word: str, width: int = 15):
+        """In concordance ra terminal"""
+        if not entries:
+            print(f"❌ Không tìm thấy '{word}'")
+            return
+
+        print(f"\n📚 Concordance '{word}' ({len(entries)} kết quả):")
+        print("=" * 80)
+        for entry in entries:
+            print(self.format_kwic_line(entry, width))
+
+    def export_kwic_jsonl(self, entries: List[Dict], output_file: str):
+        """Ghi concordance ra JSONL, mỗi dòng một lần xuất hiện"""
+        fields = ['id', 'video_id', 'start_time', 'end_time', 'left', 'keyword', 'right',
+                  'offset', 'timestamp_url']
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps({field: entry[field] for field in fields}, ensure_ascii=False) + '\n')
+        print(f"📄 Đã ghi {len(entries)} dòng concordance vào {output_file}")
+
+    def interactive_search(self):
+        """Giao diện tìm kiếm tương tác"""
+        print("🎌 Japanese Subtitle Search & Player")
+        print("=" * 40)
+        print("Tìm kiếm từ trong database subtitle và tự động mở YouTube")
+        print("Gõ 're:<pattern>' để tìm theo regex, '~<từ>' để tìm gần đúng,")
+        print("'yomi:<cách đọc>' để tìm theo phát âm (kana hoặc romaji), 'quit' để thoát\n")
+
+        while True:
+            search_term = input("🔍 Nhập từ cần tìm: ").strip()
+
+            if search_term.lower() in ['quit', 'exit', 'q', 'thoát']:
+                print("👋 Tạm biệt!")
+                break
+
+            if not search_term:
+                print("❌ Vui lòng nhập từ cần tìm.")
+                continue
+
+            # Tìm kiếm (Ctrl+C hoặc quá QUERY_TIMEOUT giây sẽ dừng truy vấn đang chạy)
+            print(f"\n🔄 Đang tìm kiếm '{search_term}'...")
+            try:
+                with self.cancellable(CancelToken(timeout=self.QUERY_TIMEOUT)):
+                    results, next_cursor, search_term = self._interactive_query(search_term)
+            except re.error as e:
+                print(f"❌ Regex lỗi: {e}")
+                continue
+            except (TimeoutError, RuntimeError) as e:
+                print(f"❌ {e}")
+                continue
+            except KeyboardInterrupt:
+                print("\n⏹ Đã hủy tìm kiếm.")
+                continue
+
+            if not results:
+                print(f"❌ Không tìm thấy '{search_term}' trong database.")
+                continue
+
+            # Ngữ cảnh cho cả trang được lấy trong một truy vấn
+            self.attach_contexts(results, context_seconds=15)
+
+            # Hiển thị kết quả
+            self.display_search_results(results, search_term)
+
+            while True:
+                try:
+                    action = input(
+                        "\n🎯 Chọn hành động: (số) mở video, (c)ontext, (m)ore, (n)ew search, (q)uit: ").strip().lower()
+
+                    if action in ['q', 'quit', 'thoát']:
+                        return
+                    elif action in ['n', 'new', 'mới']:
+                        break
+                    elif action in ['m', 'more', 'thêm']:
+                        # Trang tiếp theo theo con trỏ keyset
+                        if next_cursor is None:
+                            print("ℹ️ Đã hết kết quả.")
+                            continue
+                        page, next_cursor = self.search_ranked(search_term, limit=15, after=next_cursor,
+                                                               collapse_duplicates=True)
+                        self.attach_contexts(page, context_seconds=15)
+                        self.display_search_results(page, search_term, start_index=len(results) + 1)
+                        results.extend(page)
+                    elif action in ['c', 'context', 'ngữ cảnh']:
+                        # Hiển thị ngữ cảnh cho kết quả đầu tiên
+                        if results:
+                            self.show_context(results[0]['video_id'],
+                                              results[0]['start_time'],
+                                              search_term,
+                                              context=results[0].get('context'))
+                    elif action.isdigit():
+                        choice = int(action)
+                        if 1 <= choice <= len(results):
+                            selected = results[choice - 1]
+
+                            # Hiển thị ngữ cảnh
+                            self.show_context(selected['video_id'],
+                                              selected['start_time'],
+                                              search_term,
+                                              context=selected.get('context'))
+
+                            # Mở video
+                            self.open_youtube_video(selected['timestamp_url'])
+                            break
+                        else:
+                            print(f"❌ Vui lòng chọn số từ 1 đến {len(results)}")
+                    else:
+                        print("❌ Lựa chọn không hợp lệ.")
+
+                except ValueError:
+                    print("❌ Vui lòng nhập số hoặc lệnh hợp lệ.")
+                except KeyboardInterrupt:
+                    print("\n👋 Đã dừng.")
+                    return
+
+    def _interactive_query(self, search_term: str) -> Tuple[List[Dict], Optional[Tuple[float, int]], str]:
+        """Chạy tìm kiếm theo tiền tố của interactive_search: (kết quả, con trỏ trang sau, từ để highlight)"""
+        if search_term.startswith('re:'):
+            # Không highlight literal cho regex
+            return self.search_regex(search_term[3:], limit=15), None, ""
+        if search_term.startswith('yomi:'):
+            search_term = search_term[5:]
+            return self.search_word_in_subtitles(search_term, limit=15, by_reading=True), None, search_term
+        if search_term.startswith('~'):
+            search_term = search_term[1:]
+            return self.search_fuzzy(search_term, limit=15), None, search_term
+
+        results, next_cursor = self.search_ranked(search_term, limit=15, collapse_duplicates=True)
+        return results, next_cursor, search_term
+
+    def quick_search_and_play(self, search_term: str, auto_play: bool = False):
+        """Tìm kiếm nhanh và mở video đầu tiên"""
+        print(f"🔍 Tìm kiếm: '{search_term}'")
+
+        results = self.search_word_in_subtitles(search_term, limit=5)
+
+        if not results:
+            print(f"❌ Không tìm thấy '{search_term}'")
+            return
+
+        # Hiển thị kết quả ngắn gọn
+        print(f"✅ Tìm thấy {len(results)} kết quả:")
+        for i, result in enumerate(results[:3], 1):
+            print(f"{i}. {result['japanese_text'][:50]}... [{self.format_time(result['start_time'])}]")
+
+        # Lấy kết quả đầu tiên
+        first_result = results[0]
+
+        # Hiển thị ngữ cảnh
+        self.show_context(first_result['video_id'],
+                          first_result['start_time'],
+                          search_term)
+
+        # Mở video
+        self.open_youtube_video(first_result['timestamp_url'],
+                                show_confirmation=not auto_play)
+
+    def get_database_stats(self):
+        """Hiển thị thống kê database"""
+        stats = self.database_stats()
+
+        print(f"\n📊 Thống kê Database:")
+        print(f"📝 Tổng subtitle entries: {stats['total_entries']:,}")
+        print(f"🎥 Số video: {stats['unique_videos']}")
+        print(f"🧬 Video gần trùng: {stats['near_duplicate_videos']}, dòng trùng: {stats['duplicate_lines']:,}")
+        print(f"📈 Top 5 video nhiều subtitle nhất:")
+        for video_id, count in stats['top_videos']:
+            print(f"   {video_id}: {count} entries")
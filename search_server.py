@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search Daemon
+Server asyncio giữ database, index và cache luôn sẵn sàng, trả kết quả dạng JSON qua HTTP (localhost)
+
+API (GET, tham số trên query string; POST nhận thêm tham số dạng JSON body):
+    /health                             - trạng thái daemon
+    /stats                              - thống kê database
+    /search?q=...&mode=ranked&limit=20  - mode: ranked, contains, exact, reading, regex, fuzzy, advanced
+                                          (ranked: after=score,id cho trang tiếp theo;
+                                           collapse=1 gộp các dòng gần trùng giữa các video)
+    /count?q=...                        - số lần xuất hiện trong corpus
+    /locate?q=...&limit=100             - vị trí xuất hiện [[subtitle id, vị trí ký tự], ...]
+    /kwic?q=...&limit=1000&width=15     - concordance
+    /similar?q=...&limit=10&exclude=id  - câu tương tự (TF-IDF n-gram ký tự)
+    /suggest?q=...&limit=8              - gợi ý từ theo tiền tố (bảng tần suất)
+    /context?video_id=...&time=...      - ngữ cảnh một kết quả; POST {"targets": [[video_id, time], ...]}
+    /cancel?request=id                  - dừng request đang chạy (xử lý ngay, không qua thread pool)
+
+Mọi request có thể kèm request=id (để hủy bằng /cancel) và time_limit=giây (tối đa REQUEST_TIMEOUT).
+
+Thin client cho CLI và GUI nằm trong search_client.py (không import asyncio).
+"""
+
+import asyncio
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import startup
+from corpus_snapshot import corpus_state
+from query_control import CancelToken, SearchCancelled
+from search_client import DEFAULT_HOST, DEFAULT_PORT
+from subtitle_search_player import SubtitleSearchPlayer
+
+# Số kết quả truy vấn được giữ trong cache (bị xóa khi database có subtitle mới hoặc bị sửa)
+RESULT_CACHE_SIZE = 256
+# Truy vấn SQLite chạy quá lâu bị dừng, trả lỗi 'timeout' và trả thread về pool
+REQUEST_TIMEOUT = 30.0
+
+# Số id /cancel tới trước request của nó được nhớ lại
+EARLY_CANCEL_SIZE = 256
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class SearchServer:
+    """HTTP JSON server; truy vấn chạy trên thread pool, mỗi thread một connection SQLite giữ mở"""
+
+    def __init__(self, db_name: str = "japanese_subtitles.db", host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT, workers: int = 4):
+        self.host = host
+        self.port = port
+        self.player = SubtitleSearchPlayer(db_name, persistent_connections=True)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.started_at = time.time()
+
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cache_state = None
+        self._cache_lock = threading.Lock()
+        # request id -> CancelToken của request đang chạy (chỉ dùng trên event loop)
+        self._running: Dict[str, CancelToken] = {}
+        self._early_cancels = deque(maxlen=EARLY_CANCEL_SIZE)
+
+        self.routes = {
+            '/health': self.handle_health,
+            '/stats': self.handle_stats,
+            '/search': self.handle_search,
+            '/count': self.handle_count,
+            '/locate': self.handle_locate,
+            '/kwic': self.handle_kwic,
+            '/similar': self.handle_similar,
+            '/suggest': self.handle_suggest,
+            '/context': self.handle_context,
+        }
+        # Các route có kết quả chỉ phụ thuộc vào tham số và dữ liệu
+        self.cached_routes = {'/stats', '/search', '/count', '/locate', '/kwic', '/similar', '/suggest'}
+
+    # ---------- Handlers (chạy trên thread pool) ----------
+
+    def handle_health(self, params: Dict) -> Dict:
+        return {
+            'status': 'ok',
+            'db_name': self.player.db_name,
+            'uptime': time.time() - self.started_at,
+        }
+
+    def handle_stats(self, params: Dict) -> Dict:
+        return self.player.database_stats()
+
+    def handle_search(self, params: Dict) -> Dict:
+        query = params['q']
+        mode = params.get('mode', 'ranked')
+        limit = int(params.get('limit', 20))
+        max_per_video = int(params['max_per_video']) if params.get('max_per_video') else None
+        collapse = str(params.get('collapse', '')).lower() in ('1', 'true')
+        next_cursor = None
+
+        if mode == 'ranked':
+            after = params.get('after')
+            if isinstance(after, str):
+                after = after.split(',')
+            if after:
+                after = (float(after[0]), int(after[1]))
+            results, next_cursor = self.player.search_ranked(query, limit=limit, after=after or None,
+                                                             collapse_duplicates=collapse)
+        elif mode in ('contains', 'exact', 'reading'):
+            results = self.player.search_word_in_subtitles(query, exact_match=mode == 'exact', limit=limit,
+                                                           max_per_video=max_per_video,
+                                                           by_reading=mode == 'reading',
+                                                           collapse_duplicates=collapse)
+        elif mode == 'regex':
+            timeout = float(params['timeout']) if params.get('timeout') else None
+            results = self.player.search_regex(query, limit=limit, timeout=timeout)
+        elif mode == 'fuzzy':
+            results = self.player.search_fuzzy(query, max_distance=int(params.get('max_distance', 1)),
+                                               limit=limit)
+        elif mode == 'advanced':
+            results = self.player.advanced_search(query, params.get('filters'))
+        else:
+            raise ValueError(f"mode không hợp lệ: {mode}")
+
+        # Lấy luôn ngữ cảnh trong cùng request nếu được yêu cầu
+        if params.get('context'):
+            self.player.attach_contexts(results, int(params['context']))
+
+        return {'results': results, 'next_cursor': list(next_cursor) if next_cursor else None}
+
+    def handle_count(self, params: Dict) -> Dict:
+        return {'count': self.player.count_occurrences(params['q'])}
+
+    def handle_locate(self, params: Dict) -> Dict:
+        return {'positions': self.player.locate_occurrences(params['q'], limit=int(params.get('limit', 100)))}
+
+    def handle_kwic(self, params: Dict) -> Dict:
+        entries = self.player.kwic(params['q'], limit=int(params.get('limit', 1000)),
+                                   width=int(params.get('width', 15)))
+        return {'results': entries}
+
+    def handle_similar(self, params: Dict) -> Dict:
+        exclude = int(params['exclude']) if params.get('exclude') else None
+        return {'results': self.player.more_like_this(params['q'], limit=int(params.get('limit', 10)),
+                                                      subtitle_id=exclude)}
+
+    def handle_suggest(self, params: Dict) -> Dict:
+        return {'suggestions': self.player.suggest(params['q'], limit=int(params.get('limit', 8)))}
+
+    def handle_context(self, params: Dict) -> Dict:
+        seconds = int(params.get('seconds', 10))
+        if 'targets' in params:
+            targets = [(video_id, float(target_time)) for video_id, target_time in params['targets']]
+            return {'contexts': self.player.get_contexts(targets, seconds)}
+        return {'context': self.player.get_video_context(params['video_id'], float(params['time']), seconds)}
+
+    # ---------- Cache ----------
+
+    def _call(self, path: str, params: Dict, token: CancelToken) -> Dict:
+        """Gọi handler; token dừng các truy vấn SQLite khi bị hủy hoặc quá hạn"""
+        with self.player.cancellable(token):
+            return self.routes[path](params)
+
+    def _cached_call(self, path: str, params: Dict, token: CancelToken) -> Dict:
+        """Gọi handler, dùng lại kết quả cũ nếu database chưa có subtitle mới / bị sửa"""
+        if path not in self.cached_routes:
+            return self._call(path, params, token)
+
+        # Connection giữ mở của thread này: không mở connection mới cho mỗi request
+        state = corpus_state(self.player._connect())
+        key = path + json.dumps(params, sort_keys=True, ensure_ascii=False)
+        with self._cache_lock:
+            if state != self._cache_state:
+                self._cache.clear()
+                self._cache_state = state
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        payload = self._call(path, params, token)
+        with self._cache_lock:
+            self._cache[key] = payload
+            if len(self._cache) > RESULT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return payload
+
+    # ---------- HTTP ----------
+
+    def _cancel_request(self, request_id: str) -> Dict:
+        """/cancel: dừng request đang chạy, hoặc nhớ id nếu request chưa tới"""
+        token = self._running.get(request_id)
+        if token is None:
+            self._early_cancels.append(request_id)
+        else:
+            token.cancel()
+        return {'cancelled': token is not None}
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict]:
+        url = urlsplit(target)
+        if url.path == '/cancel':
+            return 200, self._cancel_request(dict(parse_qsl(url.query)).get('request', ''))
+        if url.path not in self.routes:
+            return 404, {'error': f"Không có endpoint {url.path}", 'type': 'not_found'}
+        if method not in ('GET', 'POST'):
+            return 400, {'error': f"Method {method} không được hỗ trợ", 'type': 'bad_request'}
+
+        params = dict(parse_qsl(url.query))
+        if body:
+            params.update(json.loads(body.decode('utf-8')))
+
+        # Tham số điều khiển, không thuộc truy vấn (và không thuộc khóa cache)
+        request_id = params.pop('request', None)
+        timeout = min(REQUEST_TIMEOUT, float(params.pop('time_limit', None) or REQUEST_TIMEOUT))
+        token = CancelToken(timeout=timeout)
+        if request_id is not None:
+            if request_id in self._early_cancels:
+                token.cancel()
+            self._running[request_id] = token
+
+        loop = asyncio.get_running_loop()
+        try:
+            payload = await loop.run_in_executor(self.executor, self._cached_call, url.path, params, token)
+        except SearchCancelled:
+            return 400, {'error': "Request đã bị hủy", 'type': 'cancelled'}
+        except re.error as e:
+            return 400, {'error': str(e), 'type': 'regex'}
+        except TimeoutError as e:
+            return 400, {'error': str(e), 'type': 'timeout'}
+        except KeyError as e:
+            return 400, {'error': f"Thiếu tham số {e}", 'type': 'bad_request'}
+        except ValueError as e:
+            return 400, {'error': str(e), 'type': 'bad_request'}
+        except Exception as e:
+            return 500, {'error': str(e), 'type': 'internal'}
+        finally:
+            if request_id is not None:
+                self._running.pop(request_id, None)
+        return 200, payload
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+
+            try:
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self._dispatch(method, target, body)
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                status, payload = 400, {'error': f"Request không hợp lệ: {e}", 'type': 'bad_request'}
+
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            writer.write((f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                          f"Content-Type: application/json; charset=utf-8\r\n"
+                          f"Content-Length: {len(data)}\r\n"
+                          f"Connection: close\r\n\r\n").encode('latin-1') + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        print(f"🌐 Search daemon đang chạy tại http://{self.host}:{self.port} (Ctrl+C để dừng)")
+        startup.report("server listening")
+        async with server:
+            await server.serve_forever()
+
+    def serve_forever(self):
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.executor.shutdown(wait=False)
+            self.player.close()
+
+
+def main():
+    """python main.py serve [--host H] [--port N] [--workers N] [--db file.db]"""
+    args = sys.argv[1:]
+    host = args[args.index('--host') + 1] if '--host' in args else DEFAULT_HOST
+    port = int(args[args.index('--port') + 1]) if '--port' in args else DEFAULT_PORT
+    workers = int(args[args.index('--workers') + 1]) if '--workers' in args else 4
+    db_name = args[args.index('--db') + 1] if '--db' in args else "japanese_subtitles.db"
+
+    SearchServer(db_name, host=host, port=port, workers=workers).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Similar Sentence Search
+Ma trận TF-IDF thưa của n-gram ký tự trên mọi dòng subtitle, cho tìm câu tương tự ("more like this")
+
+Cấu trúc thư mục index:
+    counts.npz    - số lần xuất hiện n-gram (dòng x n-gram), dùng khi thêm dữ liệu mới
+    tfidf_t.npz   - ma trận TF-IDF đã chuẩn hóa L2, lưu dạng chuyển vị (n-gram x dòng)
+                    để truy vấn chỉ đọc các hàng của n-gram có trong câu hỏi
+    idf.npy       - idf của từng n-gram
+    ids.npy       - subtitles.id của từng dòng
+    vocab.json    - danh sách n-gram theo thứ tự cột
+    meta.json     - phiên bản, số dòng, id lớn nhất đã index
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# NumPy / SciPy chỉ được import khi dùng index (xem corpus_snapshot)
+SCIPY_AVAILABLE = (importlib.util.find_spec("numpy") is not None
+                   and importlib.util.find_spec("scipy") is not None)
+np = None
+sparse = None
+
+
+def _load_scipy():
+    global np, sparse
+    if sparse is None:
+        import numpy
+        import scipy.sparse
+        np, sparse = numpy, scipy.sparse
+
+
+INDEX_VERSION = 1
+DEFAULT_SIMILARITY_DIR = "similarity_index"
+# Unigram + bigram ký tự: unigram giữ từ một chữ kanji, bigram giữ thứ tự
+NGRAM_SIZES = (1, 2)
+BATCH_SIZE = 20000
+
+
+def char_ngrams(text: str) -> Dict[str, int]:
+    """Đếm n-gram ký tự (đã lowercase, bỏ khoảng trắng) của text"""
+    text = ''.join((text or '').lower().split())
+    counts: Dict[str, int] = {}
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def stored_max_id(directory: str = DEFAULT_SIMILARITY_DIR) -> Optional[int]:
+    """id lớn nhất đã index theo meta.json trên đĩa (None nếu chưa có index hoặc đang được ghi lại)"""
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta.get('max_id') if meta.get('version') == INDEX_VERSION else None
+
+
+class SimilarityIndex:
+    """Index TF-IDF n-gram ký tự, cập nhật tăng dần theo subtitles.id"""
+
+    def __init__(self, directory: str = DEFAULT_SIMILARITY_DIR):
+        _load_scipy()
+        self.directory = directory
+        self.meta = {'version': INDEX_VERSION, 'row_count': 0, 'max_id': 0}
+        self.vocab: List[str] = []
+        self.columns: Dict[str, int] = {}
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.tfidf_t = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        if not os.path.exists(self._path("meta.json")):
+            return
+        with open(self._path("meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION:
+            print(f"⚠ Similarity index version {meta.get('version')} không được hỗ trợ, sẽ build lại")
+            return
+
+        with open(self._path("vocab.json"), encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self.columns = {gram: column for column, gram in enumerate(self.vocab)}
+        self.ids = np.load(self._path("ids.npy"))
+        self.idf = np.load(self._path("idf.npy"))
+        self.counts = sparse.load_npz(self._path("counts.npz")).tocsr()
+        self.tfidf_t = sparse.load_npz(self._path("tfidf_t.npz")).tocsr()
+        self.meta = meta
+
+    def _save(self):
+        """Ghi vào thư mục tạm rồi thay thế thư mục cũ"""
+        # Thư mục tạm riêng cho mỗi process / thread: downloader và --build-index không ghi đè nhau
+        tmp_dir = f"{self.directory}.tmp{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        sparse.save_npz(os.path.join(tmp_dir, "counts.npz"), self.counts)
+        sparse.save_npz(os.path.join(tmp_dir, "tfidf_t.npz"), self.tfidf_t)
+        np.save(os.path.join(tmp_dir, "idf.npy"), self.idf)
+        np.save(os.path.join(tmp_dir, "ids.npy"), self.ids)
+        with open(os.path.join(tmp_dir, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(tmp_dir, self.directory)
+
+    def _count_batch(self, rows: List[Tuple[int, str]]) -> 'sparse.csr_matrix':
+        """Ma trận đếm n-gram cho một batch dòng (id, text); thêm n-gram mới vào vocab"""
+        indptr = [0]
+        indices: List[int] = []
+        data: List[int] = []
+        for _, text in rows:
+            for gram, count in char_ngrams(text).items():
+                column = self.columns.get(gram)
+                if column is None:
+                    column = self.columns[gram] = len(self.vocab)
+                    self.vocab.append(gram)
+                indices.append(column)
+                data.append(count)
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix((np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32),
+                                  np.array(indptr, dtype=np.int64)), shape=(len(rows), len(self.vocab)))
+
+    def update(self, db_name: str) -> int:
+        """Thêm các subtitle mới (id lớn hơn lần trước) và tính lại trọng số. Trả về số dòng mới."""
+        conn = sqlite3.connect(db_name)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, japanese_text FROM subtitles WHERE id > ? ORDER BY id",
+                       (self.meta['max_id'],))
+
+        batches = []
+        new_ids = []
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            batches.append(self._count_batch(rows))
+            new_ids.extend(subtitle_id for subtitle_id, _ in rows)
+        conn.close()
+
+        if not batches:
+            return 0
+
+        # Các batch trước có ít cột hơn (vocab tăng dần): mở rộng số cột rồi ghép theo hàng
+        width = len(self.vocab)
+        blocks = [self.counts] + batches
+        for i, block in enumerate(blocks):
+            block.resize((block.shape[0], width))
+            blocks[i] = block
+        self.counts = sparse.vstack(blocks, format='csr')
+        self.ids = np.concatenate([self.ids, np.array(new_ids, dtype=np.int64)])
+
+        self._reweight()
+        self.meta.update(row_count=int(self.counts.shape[0]), max_id=int(self.ids[-1]))
+        self._save()
+        return len(new_ids)
+
+    def _reweight(self):
+        """TF-IDF (tf = 1 + log(count), idf làm mịn) và chuẩn hóa L2 từng dòng, không vòng lặp Python"""
+        n_rows = self.counts.shape[0]
+        document_frequency = np.bincount(self.counts.indices, minlength=self.counts.shape[1])
+        self.idf = (np.log((1 + n_rows) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        weights = self.counts.copy()
+        weights.data = (1 + np.log(weights.data)) * self.idf[weights.indices]
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        weights = sparse.diags(1 / norms).dot(weights)
+        self.tfidf_t = weights.T.tocsr().astype(np.float32)
+
+    def query_vector(self, text: str) -> Tuple['np.ndarray', 'np.ndarray']:
+        """(cột, trọng số) của vector TF-IDF chuẩn hóa cho text; bỏ n-gram không có trong vocab"""
+        columns, weights = [], []
+        for gram, count in char_ngrams(text).items():
+            column = self.columns.get(gram)
+            if column is not None:
+                columns.append(column)
+                weights.append((1 + np.log(count)) * self.idf[column])
+
+        columns = np.array(columns, dtype=np.int64)
+        weights = np.array(weights, dtype=np.float32)
+        norm = np.sqrt((weights * weights).sum())
+        return columns, (weights / norm if norm else weights)
+
+    def most_similar(self, text: str, limit: int = 10,
+                     exclude_ids: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Các dòng giống text nhất theo cosine: [(subtitle_id, similarity), ...]
+
+        Điểm = tích ma trận thưa của các hàng n-gram trong câu hỏi với trọng số
+        câu hỏi, nên chỉ các dòng có chung ít nhất một n-gram được chạm tới.
+        """
+        columns, weights = self.query_vector(text)
+        if not len(columns):
+            return []
+
+        scores = np.asarray(self.tfidf_t[columns].T.dot(weights)).ravel()
+        if exclude_ids:
+            scores[np.isin(self.ids, exclude_ids)] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(self.ids[row]), float(scores[row])) for row in candidates]
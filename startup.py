@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup Helpers
+Đo thời gian khởi động (main.py --timing) và kiểm tra công cụ ngoài (yt-dlp) có cache
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Mốc 0 của báo cáo: lúc module này được import (dòng đầu của main.py)
+_START = time.perf_counter()
+_marks: List[Tuple[str, float]] = []
+_timing_enabled = False
+_reported = False
+
+# Version của tool, lưu theo (đường dẫn, mtime, size) của file thực thi
+TOOL_CACHE_FILE = ".tool_cache.json"
+_tool_versions: Dict[str, Optional[str]] = {}
+
+
+def enable_timing():
+    global _timing_enabled
+    _timing_enabled = True
+
+
+def mark(label: str):
+    """Ghi lại một mốc thời gian (không làm gì nếu không bật --timing)"""
+    if _timing_enabled:
+        _marks.append((label, time.perf_counter()))
+
+
+def report(label: str = "ready"):
+    """Ghi mốc cuối và in báo cáo thời gian khởi động (chỉ một lần)"""
+    global _reported
+    if not _timing_enabled or _reported:
+        return
+    _reported = True
+    mark(label)
+
+    print("\n⏱️ Startup timing:")
+    previous = _START
+    for name, moment in _marks:
+        print(f"   {name:<28} +{(moment - previous) * 1000:7.1f} ms  ({(moment - _START) * 1000:7.1f} ms)")
+        previous = moment
+
+
+def _load_tool_cache() -> Dict:
+    try:
+        with open(TOOL_CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_tool_cache(cache: Dict):
+    try:
+        with open(TOOL_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    except OSError:
+        pass
+
+
+def tool_version(name: str) -> Optional[str]:
+    """
+    Version của tool dòng lệnh (vd. 'yt-dlp'), None nếu chưa cài
+
+    '<tool> --version' chỉ chạy khi file thực thi thay đổi so với lần kiểm tra
+    trước (kết quả lưu trong TOOL_CACHE_FILE); trong cùng process chỉ kiểm tra một lần.
+    """
+    if name in _tool_versions:
+        return _tool_versions[name]
+
+    path = shutil.which(name)
+    version = None
+    if path:
+        stat = os.stat(path)
+        key = [path, stat.st_mtime, stat.st_size]
+        cache = _load_tool_cache()
+        entry = cache.get(name)
+
+        if entry and entry.get('key') == key:
+            version = entry['version']
+        else:
+            try:
+                result = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=30)
+                if result.returncode == 0:
+                    version = result.stdout.strip()
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            if version:
+                cache[name] = {'key': key, 'version': version}
+                _save_tool_cache(cache)
+
+    _tool_versions[name] = version
+    return version
+
+
+def forget_tool(name: str):
+    """Bỏ kết quả kiểm tra trong process (vd. sau khi vừa cài tool)"""
+    _tool_versions.pop(name, None)
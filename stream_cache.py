@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stream URL Cache
+Cache URL stream (yt-dlp --get-url) theo (video_id, format), hết hạn theo tham số `expire`
+của googlevideo
+
+URL stream của YouTube có chữ ký hết hạn sau vài giờ: thời điểm hết hạn nằm trong
+`expire=<unix time>` (query) hoặc `/expire/<unix time>/` (path). URL được dùng lại tới
+trước thời điểm đó EXPIRY_MARGIN giây. Nhiều thread cùng hỏi một video chưa có trong
+cache chỉ gây ra một lần chạy yt-dlp; các thread còn lại chờ kết quả của lần đó.
+"""
+
+import re
+import subprocess
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Dùng lại URL tới trước lúc hết hạn bấy nhiêu giây (một lần phát cũng cần thời gian)
+EXPIRY_MARGIN = 300
+# Thời gian sống khi URL không có tham số expire (vd. file, nguồn không phải googlevideo)
+DEFAULT_TTL = 1800
+RESOLVE_TIMEOUT = 30
+
+_VIDEO_ID = re.compile(r'(?:v=|youtu\.be/|embed/|shorts/)([0-9A-Za-z_-]{11})')
+
+
+def video_id_from_url(url: str) -> Optional[str]:
+    """video_id của URL YouTube (watch?v=, youtu.be/, embed/), None nếu không nhận ra"""
+    match = _VIDEO_ID.search(url or '')
+    return match.group(1) if match else None
+
+
+def stream_expiry(stream_url: str) -> Optional[float]:
+    """Thời điểm hết hạn (unix time) ghi trong URL stream, None nếu không có"""
+    parsed = urlparse(stream_url)
+    values = parse_qs(parsed.query).get('expire')
+    if values and values[0].isdigit():
+        return float(values[0])
+    match = re.search(r'/expire/(\d+)', parsed.path)
+    return float(match.group(1)) if match else None
+
+
+class _Resolution:
+    """Một lần resolve đang chạy, các thread khác chờ trên event"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.url: Optional[str] = None
+        self.error: Optional[Exception] = None
+
+
+class StreamUrlCache:
+    """Cache URL stream trong bộ nhớ, an toàn khi gọi từ nhiều thread"""
+
+    def __init__(self, margin: float = EXPIRY_MARGIN, default_ttl: float = DEFAULT_TTL):
+        self.margin = margin
+        self.default_ttl = default_ttl
+        # (video_id, format) -> (URL stream, dùng được tới lúc)
+        self._entries: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._pending: Dict[Tuple[str, str], _Resolution] = {}
+        self._lock = threading.Lock()
+        self.resolves = 0  # Số lần thực sự chạy yt-dlp
+
+    def get(self, video_id: str, video_url: str, stream_format: str) -> str:
+        """URL stream của video: từ cache nếu còn hạn, nếu không thì resolve (hoặc chờ lần resolve đang chạy)"""
+        key = (video_id, stream_format)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.time():
+                return entry[0]
+            resolution = self._pending.get(key)
+            owner = resolution is None
+            if owner:
+                resolution = self._pending[key] = _Resolution()
+
+        if not owner:
+            resolution.done.wait()
+            if resolution.error is not None:
+                raise resolution.error
+            return resolution.url
+
+        try:
+            stream_url = self.resolve(video_url, stream_format)
+            expiry = stream_expiry(stream_url)
+            valid_until = expiry - self.margin if expiry else time.time() + self.default_ttl
+            resolution.url = stream_url
+            with self._lock:
+                self._entries[key] = (stream_url, valid_until)
+            return stream_url
+        except Exception as e:
+            resolution.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            resolution.done.set()
+
+    def peek(self, video_id: str, stream_format: str) -> Optional[str]:
+        """URL stream còn hạn trong cache, None nếu không có (không resolve)"""
+        with self._lock:
+            entry = self._entries.get((video_id, stream_format))
+        return entry[0] if entry and entry[1] > time.time() else None
+
+    def resolve(self, video_url: str, stream_format: str) -> str:
+        """Chạy yt-dlp --get-url (không qua cache)"""
+        self.resolves += 1
+        cmd = ['yt-dlp', '--get-url', '--format', stream_format, video_url]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=RESOLVE_TIMEOUT)
+        if result.returncode != 0 or not result.stdout.strip():
+            raise RuntimeError(f"Stream error: {result.stderr.strip()[-200:]}")
+        return result.stdout.strip().splitlines()[0]
+
+    def invalidate(self, video_id: str, stream_format: str):
+        """Bỏ URL đã cache (vd. server trả 403 trước thời điểm expire)"""
+        with self._lock:
+            self._entries.pop((video_id, stream_format), None)
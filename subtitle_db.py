@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Subtitle Database Schema
+Các cột và index dùng chung cho downloader (tạo database) và search player (database cũ)
+"""
+
+import sqlite3
+from typing import List, Optional
+
+from japanese_reading import READING_VERSION, to_reading
+
+# Cột được thêm sau phiên bản đầu tiên: (tên, kiểu)
+EXTRA_COLUMNS = [
+    ('reading', 'TEXT'),  # Cách đọc hiragana, tính lúc ingest (refresh_readings)
+    # READING_VERSION của bộ phân tích đã tính reading (0: chưa tính)
+    ('reading_version', 'INTEGER NOT NULL DEFAULT 0'),
+    # Số ký tự của japanese_text, để lọc theo độ dài mà không phải tính LENGTH() từng dòng
+    ('char_length', 'INTEGER'),
+    # id của dòng gốc nếu dòng nằm trong đoạn gần trùng với video khác (near_duplicates)
+    ('duplicate_group', 'INTEGER'),
+]
+
+# Bộ đếm các lần sửa / xóa subtitle (dòng mới thì nhận ra qua MAX(id)): snapshot và các
+# index ngoài database so bộ đếm này để biết dữ liệu đã export còn khớp không
+CHANGES_TABLE = '''CREATE TABLE IF NOT EXISTS corpus_changes (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+)'''
+
+# (tên, câu lệnh tạo, câu lệnh điền giá trị cho dữ liệu đã có khi trigger được tạo hoặc None)
+SCHEMA_TRIGGERS = [
+    # Dòng được ghi không kèm char_length (công cụ khác, phiên bản cũ) vẫn có giá trị đúng
+    ('trg_subtitles_char_length',
+     """CREATE TRIGGER IF NOT EXISTS trg_subtitles_char_length
+        AFTER INSERT ON subtitles WHEN NEW.char_length IS NULL
+        BEGIN
+            UPDATE subtitles SET char_length = LENGTH(NEW.japanese_text) WHERE id = NEW.id;
+        END""",
+     "UPDATE subtitles SET char_length = LENGTH(japanese_text) WHERE char_length IS NULL"),
+    ('trg_subtitles_delete_changes',
+     """CREATE TRIGGER IF NOT EXISTS trg_subtitles_delete_changes
+        AFTER DELETE ON subtitles
+        BEGIN
+            UPDATE corpus_changes SET version = version + 1;
+        END""",
+     None),
+    # Chỉ các cột được export (reading, char_length được tính lại thì không tính là thay đổi)
+    ('trg_subtitles_update_changes',
+     """CREATE TRIGGER IF NOT EXISTS trg_subtitles_update_changes
+        AFTER UPDATE OF video_id, video_url, japanese_text, start_time, end_time, duration,
+                        sequence_number, duplicate_group ON subtitles
+        BEGIN
+            UPDATE corpus_changes SET version = version + 1;
+        END""",
+     None),
+]
+
+SEARCH_INDEXES = [
+    # Index cho các truy vấn sắp theo (video_id, start_time): truy vấn ngữ cảnh tìm theo
+    # video_id + khoảng start_time; advanced_search lọc duration, char_length trên index.
+    # Không chứa japanese_text: index sẽ lớn gần bằng cả bảng
+    '''CREATE INDEX IF NOT EXISTS idx_video_start_filter
+       ON subtitles(video_id, start_time, end_time, sequence_number, duration, char_length)''',
+    # refresh_readings chỉ đọc các dòng có reading_version cũ, không quét cả bảng
+    '''CREATE INDEX IF NOT EXISTS idx_reading_version ON subtitles(reading_version)''',
+    # Đếm các dòng cùng nhóm gần trùng khi gộp kết quả đang stream (chỉ chứa dòng có nhóm)
+    '''CREATE INDEX IF NOT EXISTS idx_duplicate_group ON subtitles(duplicate_group)
+       WHERE duplicate_group IS NOT NULL''',
+    # advanced_search với khoảng min_duration / max_duration hẹp
+    '''CREATE INDEX IF NOT EXISTS idx_duration_length ON subtitles(duration, char_length)''',
+]
+
+# Index cũ đã được thay bằng các index ở trên
+OBSOLETE_INDEXES = ['idx_video_start_cover', 'idx_video_start_filter_cover']
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """Thêm các cột và index tìm kiếm còn thiếu; cập nhật thống kê planner nếu schema thay đổi"""
+    existing_columns = {row[1] for row in conn.execute("PRAGMA table_info(subtitles)")}
+    existing = {(row[0], row[1]) for row in conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE tbl_name = 'subtitles'")}
+    existing_indexes = {name for kind, name in existing if kind == 'index'}
+    changed = False
+
+    for name, column_type in EXTRA_COLUMNS:
+        if name not in existing_columns:
+            conn.execute(f"ALTER TABLE subtitles ADD COLUMN {name} {column_type}")
+            changed = True
+
+    conn.execute(CHANGES_TABLE)
+    conn.execute("INSERT OR IGNORE INTO corpus_changes (id, version) VALUES (0, 0)")
+
+    for name, statement, backfill in SCHEMA_TRIGGERS:
+        if ('trigger', name) not in existing:
+            conn.execute(statement)
+            if backfill:
+                conn.execute(backfill)
+            changed = True
+
+    for name in OBSOLETE_INDEXES:
+        if name in existing_indexes:
+            conn.execute(f"DROP INDEX {name}")
+
+    for statement in SEARCH_INDEXES:
+        name = _index_name(statement)
+        if name not in existing_indexes:
+            conn.execute(statement)
+            changed = True
+    conn.commit()
+
+    if changed:
+        optimize_database(conn)
+
+
+def missing_schema(conn: sqlite3.Connection) -> List[str]:
+    """Tên các cột, bảng, trigger, index mà ensure_schema sẽ tạo (chỉ đọc, không sửa database)"""
+    existing_columns = {row[1] for row in conn.execute("PRAGMA table_info(subtitles)")}
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    missing = [name for name, _ in EXTRA_COLUMNS if name not in existing_columns]
+    if 'corpus_changes' not in existing:
+        missing.append('corpus_changes')
+    missing.extend(name for name, _, _ in SCHEMA_TRIGGERS if name not in existing)
+    missing.extend(name for name in map(_index_name, SEARCH_INDEXES) if name not in existing)
+    return missing
+
+
+def _index_name(statement: str) -> str:
+    return statement.split('EXISTS', 1)[1].split()[0]
+
+
+def change_version(conn: sqlite3.Connection) -> Optional[int]:
+    """Giá trị bộ đếm corpus_changes (None nếu database chưa được migrate)"""
+    try:
+        row = conn.execute("SELECT version FROM corpus_changes").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def optimize_database(conn: sqlite3.Connection):
+    """
+    Cập nhật thống kê cho query planner (sau khi đổi schema và sau mỗi batch ingest)
+
+    analysis_limit cho ANALYZE chỉ lấy mẫu một phần mỗi index, nên vẫn nhanh
+    trên database lớn.
+    """
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+
+
+def refresh_readings(conn: sqlite3.Connection, reading_index=None, batch_size: int = 2000) -> int:
+    """
+    Tính lại cột reading cho các dòng có reading_version cũ hơn READING_VERSION
+    (dữ liệu từ phiên bản cũ, hoặc tính khi chưa cài pykakasi). Trả về số dòng đã tính.
+
+    reading_index (NgramIndex của cột reading) được sửa theo cách đọc mới của các dòng đã index.
+    """
+    refreshed = 0
+    while True:
+        # Dòng đã tính xong không còn khớp điều kiện, nên mỗi vòng lấy batch tiếp theo từ đầu
+        rows = conn.execute("""
+            SELECT id, japanese_text, reading FROM subtitles
+            WHERE reading_version < ?
+            LIMIT ?
+        """, (READING_VERSION, batch_size)).fetchall()
+        if not rows:
+            break
+
+        changes = [(subtitle_id, old_reading, to_reading(text)) for subtitle_id, text, old_reading in rows]
+        conn.executemany("UPDATE subtitles SET reading = ?, reading_version = ? WHERE id = ?",
+                         [(reading, READING_VERSION, subtitle_id) for subtitle_id, _, reading in changes])
+        if reading_index is not None:
+            reading_index.replace_postings(conn, changes)
+        conn.commit()
+        refreshed += len(rows)
+    return refreshed
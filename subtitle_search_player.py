@@ -5,21 +5,125 @@ Japanese Subtitle Search & Auto Player
 Tìm kiếm từ trong database subtitle và tự động mở YouTube tại timestamp chính xác
 """
 
+import bisect
 import sqlite3
-import webbrowser
 import re
 import sys
 import os
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Tuple, Optional
 from urllib.parse import urlencode
 import time
-
-
-class SubtitleSearchPlayer:
-    def __init__(self, db_name: str = "japanese_subtitles.db"):
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import startup
+# batch_search, regex_search (multiprocessing), fuzzy_search, clip_export được import khi dùng lần đầu
+from corpus_snapshot import (CorpusSnapshot, DEFAULT_SNAPSHOT_DIR, export_snapshot,
+                             current_version as current_snapshot_version)
+from ngram_index import NgramIndex
+from japanese_reading import normalize_reading_query, warn_missing_analyzer
+from near_duplicates import DuplicateIndex
+from query_control import CancelToken, is_interrupted
+from search_frontend import SearchFrontend
+from similar_search import DEFAULT_SIMILARITY_DIR, SCIPY_AVAILABLE
+from subtitle_db import ensure_schema, missing_schema, refresh_readings
+from suffix_index import DEFAULT_INDEX_DIR, NUMPY_AVAILABLE, SuffixArrayIndex, count_overlapping
+from term_index import TermFrequencyIndex
+
+
+class _PersistentConnection(sqlite3.Connection):
+    """Connection được giữ lại giữa các lần gọi (chế độ daemon): close() không đóng thật"""
+
+    def close(self):
+        pass
+
+
+class SubtitleSearchPlayer(SearchFrontend):
+    # Tham số BM25 cho tìm kiếm xếp hạng
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    # Số tập kết quả xếp hạng (đã sắp) được giữ lại để phân trang
+    RANKED_CACHE_SIZE = 32
+
+    def __init__(self, db_name: str = "japanese_subtitles.db",
+                 snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+                 suffix_index_dir: str = DEFAULT_INDEX_DIR,
+                 similarity_dir: str = DEFAULT_SIMILARITY_DIR,
+                 persistent_connections: bool = False):
         self.db_name = db_name
+        # Daemon giữ mỗi thread một connection mở (page cache của SQLite còn "nóng")
+        self.persistent_connections = persistent_connections
+        self._local = threading.local()
+        self.snapshot_dir = snapshot_dir
+        self.suffix_index_dir = suffix_index_dir
+        self._snapshot = None
+        self._suffix_index = None
+        self.similarity_dir = similarity_dir
+        self._similarity_index = None
+        self._similarity_lock = threading.Lock()
+        self._avg_text_length = None
+        self._ranked_cache: "OrderedDict[Tuple[str, bool], Tuple]" = OrderedDict()
+        self._ranked_lock = threading.Lock()
+        self.ngram_index = NgramIndex(db_name)
+        self.reading_index = NgramIndex(db_name, table="reading_ngrams", column="reading")
+        self.term_index = TermFrequencyIndex(db_name)
+        self._terms_updated = False
+        self._readings_refreshed = False
+        self._regex_searcher = None
         self.check_database()
 
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Connection tới database: mở mới, hoặc connection của thread hiện tại nếu persistent
+
+        Trong khối cancellable(), connection được gắn CancelToken của thread này.
+        """
+        if not self.persistent_connections:
+            conn = sqlite3.connect(self.db_name)
+        else:
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = sqlite3.connect(self.db_name, factory=_PersistentConnection)
+
+        token = getattr(self._local, 'token', None)
+        if token is not None:
+            token.attach(conn)
+        return conn
+
+    @contextmanager
+    def cancellable(self, token: CancelToken):
+        """
+        Các truy vấn chạy trong khối này (trên thread hiện tại) dừng khi token bị hủy
+        hoặc quá hạn
+
+            token = CancelToken(timeout=5)
+            with player.cancellable(token):
+                results = player.search_word_in_subtitles("先生")
+            # token.cancel() từ thread khác -> SearchCancelled, quá hạn -> TimeoutError
+
+        Ctrl+C trong lúc SQLite đang quét cũng dừng truy vấn (KeyboardInterrupt).
+        """
+        previous = getattr(self._local, 'token', None)
+        self._local.token = token
+        try:
+            yield token
+        except sqlite3.OperationalError as e:
+            if not is_interrupted(e):
+                raise
+            error = token.translate(e)
+            # Không bị hủy, không quá hạn: progress handler bị dừng bởi Ctrl+C
+            raise (KeyboardInterrupt() if error is e else error) from e
+        finally:
+            self._local.token = previous
+            token.release()
+
+    def _check_cancelled(self):
+        """Dừng các bước không chạy SQL (snapshot, xử lý kết quả) nếu token đã bị hủy"""
+        token = getattr(self._local, 'token', None)
+        if token is not None:
+            token.check()
+
     def check_database(self):
         """Kiểm tra xem database có tồn tại không"""
         if not os.path.exists(self.db_name):
@@ -27,21 +131,30 @@ class SubtitleSearchPlayer:
             print("Hãy chạy công cụ download subtitle trước để tạo database.")
             sys.exit(1)
 
-        # Kiểm tra có dữ liệu không
-        conn = sqlite3.connect(self.db_name)
+        # Kiểm tra có dữ liệu không (chỉ đọc một dòng, không đếm cả bảng)
+        conn = self._connect()
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM subtitles")
-        count = cursor.fetchone()[0]
-        conn.close()
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM subtitles)")
+        has_data = cursor.fetchone()[0]
 
-        if count == 0:
+        if not has_data:
+            conn.close()
             print("❌ Database trống! Hãy tải subtitle trước.")
             sys.exit(1)
 
-        print(f"✅ Database sẵn sàng với {count} subtitle entries")
+        # Database tạo bởi phiên bản cũ: chỉ báo, migrate (ALTER, CREATE INDEX, ANALYZE)
+        # thuộc về --build-index và ingest, không chạy trên đường đọc
+        missing = missing_schema(conn)
+        conn.close()
+        if missing:
+            print(f"⚠ Database thiếu {', '.join(missing)} (phiên bản cũ): "
+                  "chạy 'python main.py play --build-index' để cập nhật")
+
+        print("✅ Database sẵn sàng")
 
     def search_word_in_subtitles(self, search_word: str, exact_match: bool = False,
-                                 limit: int = 20) -> List[Dict]:
+                                 limit: int = 20, max_per_video: Optional[int] = None,
+                                 by_reading: bool = False, collapse_duplicates: bool = False) -> List[Dict]:
         """
         Tìm kiếm từ trong database subtitle
 
@@ -49,189 +162,905 @@ class SubtitleSearchPlayer:
             search_word: Từ cần tìm (có thể là tiếng Nhật, romaji, hoặc tiếng Việt)
             exact_match: True nếu muốn tìm chính xác, False cho tìm kiếm mờ
             limit: Giới hạn số kết quả
+            max_per_video: Số kết quả tối đa cho mỗi video (None = không giới hạn)
+            by_reading: True để tìm theo cách đọc (kana/romaji), vd. たべる hoặc taberu khớp 食べる
+            collapse_duplicates: True để gộp các dòng gần trùng giữa các video (reupload,
+                compilation) thành một kết quả, kèm 'duplicate_count'
         """
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        if by_reading:
+            return self._search_by_reading(search_word, limit, max_per_video, collapse_duplicates)
 
         if exact_match:
             # Tìm kiếm chính xác
-            query = """
-                SELECT video_id, video_url, japanese_text, start_time, end_time, 
+            return self._select_subtitles("japanese_text = ?", [search_word],
+                                          limit, max_per_video, collapse_duplicates)
+
+        # Tìm kiếm mờ - chứa từ đó (dùng snapshot memory-mapped nếu có và còn mới)
+        snapshot = self.get_snapshot() if not (max_per_video or collapse_duplicates) else None
+        if snapshot is not None:
+            return [self._build_result(snapshot.row(row))
+                    for row in snapshot.find(search_word, limit)]
+
+        return self._select_subtitles("japanese_text LIKE ?", [f'%{search_word}%'],
+                                      limit, max_per_video, collapse_duplicates)
+
+    # Batch đầu nhỏ để kết quả đầu tiên hiện ngay, các batch sau lớn dần tới batch_size
+    FIRST_STREAM_BATCH = 10
+
+    def iter_search_word(self, search_word: str, exact_match: bool = False, limit: int = 1000,
+                         by_reading: bool = False, batch_size: int = 100,
+                         collapse_duplicates: bool = False) -> Iterator[List[Dict]]:
+        """
+        Như search_word_in_subtitles nhưng trả kết quả theo từng batch ngay khi tìm thấy
+
+        Truy vấn duyệt theo index (video_id, start_time) nên SQLite trả dòng khớp trong
+        lúc quét, không phải đợi quét hết bảng. Dừng lặp giữa chừng sẽ đóng cursor.
+
+        Khi collapse_duplicates, mỗi nhóm gần trùng chỉ giữ dòng gặp đầu tiên (như
+        search_word_in_subtitles); duplicate_count được đếm cho từng batch.
+        """
+        if not exact_match and not by_reading:
+            snapshot = self.get_snapshot()
+            if snapshot is not None and collapse_duplicates:
+                yield from self._iter_snapshot_collapsed(snapshot, search_word, limit, batch_size)
+                return
+            if snapshot is not None:
+                yield from self._batched((self._build_result(snapshot.row(row))
+                                          for row in snapshot.iter_find(search_word, limit)), batch_size)
+                return
+
+        if by_reading:
+            reading = normalize_reading_query(search_word)
+            if not reading:
+                return
+            self.update_reading_index()
+            where, params = self._reading_filter(reading)
+        elif exact_match:
+            where, params = "japanese_text = ?", [search_word]
+        else:
+            where, params = "japanese_text LIKE ?", [f'%{search_word}%']
+
+        if collapse_duplicates:
+            # Không LIMIT trong SQL: limit tính trên kết quả sau khi gộp
+            query = f"""
+                SELECT video_id, video_url, japanese_text, start_time, end_time,
+                       duration, sequence_number, COALESCE(duplicate_group, id)
+                FROM subtitles
+                WHERE {where}
+                ORDER BY video_id, start_time
+            """
+            query_params = params
+        else:
+            query, query_params = self._select_query(where, params, limit)
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        seen_groups = set()
+        emitted = 0
+        try:
+            cursor.execute(query, query_params)
+            size = self.FIRST_STREAM_BATCH
+            while emitted < limit:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                size = min(size * 2, batch_size)
+                if not collapse_duplicates:
+                    emitted += len(rows)
+                    yield [self._build_result(row) for row in rows]
+                    continue
+
+                kept = []
+                for row in rows:
+                    if row[7] not in seen_groups and emitted + len(kept) < limit:
+                        seen_groups.add(row[7])
+                        kept.append(row)
+                if not kept:
+                    continue
+                counts = self._duplicate_counts(conn, [row[7] for row in kept], where, params)
+                emitted += len(kept)
+                yield [dict(self._build_result(row[:7]), duplicate_count=counts.get(row[7], 1))
+                       for row in kept]
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _iter_snapshot_collapsed(self, snapshot: CorpusSnapshot, search_word: str, limit: int,
+                                 batch_size: int) -> Iterator[List[Dict]]:
+        """Tìm trên snapshot, giữ dòng đầu tiên của mỗi nhóm gần trùng (nhóm lưu trong snapshot)"""
+        def first_of_each_group():
+            seen = set()
+            for row in snapshot.iter_find(search_word, len(snapshot)):
+                group = int(snapshot.groups[row])
+                if group not in seen:
+                    seen.add(group)
+                    yield row, group
+                    if len(seen) >= limit:
+                        return
+
+        where, params = "japanese_text LIKE ?", [f'%{search_word}%']
+        conn = self._connect()
+        try:
+            for batch in self._batched(first_of_each_group(), batch_size):
+                counts = self._duplicate_counts(conn, [group for _, group in batch], where, params)
+                yield [dict(self._build_result(snapshot.row(row)), duplicate_count=counts.get(group, 1))
+                       for row, group in batch]
+        finally:
+            conn.close()
+
+    def _duplicate_counts(self, conn: sqlite3.Connection, groups: List[int], where: str,
+                          params: List) -> Dict[int, int]:
+        """Số dòng khớp where của mỗi nhóm gần trùng (nhóm = duplicate_group, hoặc id của dòng gốc)"""
+        placeholders = ','.join('?' for _ in groups)
+        rows = conn.execute(f"""
+            SELECT COALESCE(duplicate_group, id), COUNT(*)
+            FROM subtitles
+            WHERE (duplicate_group IN ({placeholders}) OR id IN ({placeholders})) AND {where}
+            GROUP BY 1
+        """, groups + groups + list(params)).fetchall()
+        return dict(rows)
+
+    def _batched(self, results, batch_size: int) -> Iterator[List[Dict]]:
+        """Gom một iterator kết quả thành các batch (batch đầu FIRST_STREAM_BATCH)"""
+        batch, size = [], self.FIRST_STREAM_BATCH
+        for result in results:
+            batch.append(result)
+            if len(batch) >= size:
+                self._check_cancelled()
+                yield batch
+                batch, size = [], min(size * 2, batch_size)
+        if batch:
+            yield batch
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Tuple[str, int]]:
+        """
+        Gợi ý từ bắt đầu bằng prefix khi đang gõ: [(term, số dòng chứa term), ...]
+
+        Chỉ đọc bảng term_frequencies (xây lúc ingest) nên trả lời trong vài ms.
+        Lần gọi đầu cập nhật bảng cho các subtitle chưa được đếm (database cũ).
+        """
+        if not self._terms_updated:
+            self.term_index.update()
+            self._terms_updated = True
+
+        conn = self._connect()
+        suggestions = self.term_index.suggest(prefix, limit, conn=conn)
+        conn.close()
+        return suggestions
+
+    def get_snapshot(self) -> Optional[CorpusSnapshot]:
+        """Snapshot memory-mapped của corpus nếu có và còn khớp với database"""
+        # Snapshot được export lại (phiên bản mới trong CURRENT) từ lần mở trước
+        version = current_snapshot_version(self.snapshot_dir)
+        if self._snapshot is not None and self._snapshot.version != version:
+            self._snapshot.close()
+            self._snapshot = None
+        if self._snapshot is None and version is not None:
+            self._snapshot = CorpusSnapshot.open(self.snapshot_dir)
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        conn = self._connect()
+        fresh = snapshot.is_fresh(conn)
+        conn.close()
+        return snapshot if fresh else None
+
+    def get_regex_searcher(self):
+        """RegexSearcher (process worker có timeout), tạo khi tìm regex lần đầu"""
+        if self._regex_searcher is None:
+            from regex_search import RegexSearcher
+            self._regex_searcher = RegexSearcher(self.db_name)
+        return self._regex_searcher
+
+    def close(self):
+        """Dừng process regex và đóng snapshot / suffix index đã mở"""
+        if self._regex_searcher is not None:
+            self._regex_searcher.close()
+            self._regex_searcher = None
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+        if self._suffix_index is not None:
+            self._suffix_index.close()
+            self._suffix_index = None
+
+    def get_suffix_index(self) -> Optional[SuffixArrayIndex]:
+        """
+        Suffix array index đã build (khi ingest hoặc bằng build_suffix_index); None nếu không có NumPy
+
+        Không build gì ở đây: các dòng mới hơn index được tìm bằng SQL (xem count_occurrences).
+        """
+        if not NUMPY_AVAILABLE:
+            return None
+        if self._suffix_index is None:
+            self._suffix_index = SuffixArrayIndex(self.suffix_index_dir)
+        else:
+            self._suffix_index.reload()
+        return self._suffix_index
+
+    def build_search_indexes(self):
+        """
+        Build / cập nhật các index tìm kiếm cho các subtitle chưa được index (lệnh --build-index)
+
+        Downloader làm việc này sau mỗi lần ingest; lệnh này dành cho database cũ hoặc
+        lần ingest bị dừng giữa chừng. Các hàm tìm kiếm không tự build index.
+        """
+        # Cột, trigger và index tìm kiếm của database tạo bởi phiên bản cũ
+        conn = sqlite3.connect(self.db_name)
+        ensure_schema(conn)
+        conn.close()
+
+        start = time.time()
+        indexed = self.ngram_index.update()
+        print(f"✅ N-gram index (regex / gần đúng): thêm {indexed:,} dòng ({time.time() - start:.1f}s)")
+        self.build_suffix_index()
+        self.build_similarity_index()
+
+    def build_suffix_index(self):
+        """Build / cập nhật suffix array index cho các subtitle chưa được index"""
+        if not NUMPY_AVAILABLE:
+            print("❌ Suffix index cần NumPy: pip install numpy")
+            return
+        start = time.time()
+        index = self.get_suffix_index()
+        added = index.update(self.db_name)
+        print(f"✅ Suffix index: thêm {added:,} dòng, {len(index.segments)} segment "
+              f"({time.time() - start:.1f}s)")
+
+    def get_similarity_index(self):
+        """
+        Index TF-IDF cho tìm câu tương tự, chỉ đọc lại từ đĩa khi max_id trong meta.json thay đổi
+
+        Index được cập nhật lúc ingest hoặc bằng --build-index, không bao giờ trong lúc tìm kiếm.
+
+        Raises:
+            RuntimeError: chưa cài NumPy / SciPy, hoặc index chưa được build
+        """
+        if not SCIPY_AVAILABLE:
+            raise RuntimeError("Tìm câu tương tự cần NumPy và SciPy: pip install numpy scipy")
+
+        from similar_search import SimilarityIndex, stored_max_id
+
+        # Daemon gọi từ nhiều thread: chỉ một thread load index
+        with self._similarity_lock:
+            max_id = stored_max_id(self.similarity_dir)
+            current = self._similarity_index
+            if max_id is not None and (current is None or current.meta['max_id'] != max_id):
+                try:
+                    self._similarity_index = SimilarityIndex(self.similarity_dir)
+                except (OSError, ValueError):
+                    pass  # Đang được ghi lại: dùng bản đã mở, lần sau đọc lại
+            if self._similarity_index is None:
+                raise RuntimeError("Chưa có index tìm câu tương tự: "
+                                   "chạy 'python main.py play --build-index'")
+            return self._similarity_index
+
+    def build_similarity_index(self):
+        """Build / cập nhật index TF-IDF tìm câu tương tự cho các subtitle chưa được index"""
+        if not SCIPY_AVAILABLE:
+            print("❌ Index câu tương tự cần NumPy và SciPy: pip install numpy scipy")
+            return
+
+        from similar_search import SimilarityIndex
+
+        start = time.time()
+        with self._similarity_lock:
+            index = SimilarityIndex(self.similarity_dir)
+            added = index.update(self.db_name)
+            self._similarity_index = index
+        print(f"✅ Index câu tương tự: thêm {added:,} dòng ({time.time() - start:.1f}s)")
+
+    def more_like_this(self, text: str, limit: int = 10,
+                       subtitle_id: Optional[int] = None) -> List[Dict]:
+        """
+        Các dòng có nội dung giống text nhất (cosine trên TF-IDF n-gram ký tự)
+
+        Khi tìm từ một kết quả có sẵn, truyền subtitle_id để bỏ chính dòng đó.
+        Kết quả có thêm 'id' và 'similarity' (0..1).
+        """
+        index = self.get_similarity_index()
+        matches = index.most_similar(text, limit=limit,
+                                     exclude_ids=[subtitle_id] if subtitle_id is not None else None)
+        rows = self._rows_by_id(subtitle_id for subtitle_id, _ in matches)
+
+        results = []
+        for match_id, similarity in matches:
+            if match_id in rows:
+                result = self._build_result(rows[match_id])
+                result['id'] = match_id
+                result['similarity'] = similarity
+                results.append(result)
+        return results
+
+    def count_occurrences(self, word: str) -> int:
+        """
+        Số lần word xuất hiện trong toàn bộ corpus, tính cả các lần chồng lên nhau
+
+        Các dòng đã có trong suffix array được đếm trong O(m log n); các dòng mới hơn
+        index (hoặc tất cả nếu không có NumPy / chưa build) được đếm bằng SQL với cùng
+        cách so khớp (count_overlapping).
+        """
+        if not word:
+            return 0
+        index = self.get_suffix_index()
+        indexed_count = index.count(word) if index is not None else 0
+        last_id = index.last_id if index is not None else 0
+
+        conn = self._connect()
+        conn.create_function("count_overlapping", 2, count_overlapping, deterministic=True)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT SUM(count_overlapping(japanese_text, ?))
+            FROM subtitles
+            WHERE id > ? AND japanese_text LIKE ?
+        """, (word, last_id, f'%{word}%'))
+        count = cursor.fetchone()[0] or 0
+        conn.close()
+        return indexed_count + count
+
+    def locate_occurrences(self, word: str, limit: int = 100) -> List[Tuple[int, int]]:
+        """
+        Vị trí xuất hiện của word: [(subtitle id, vị trí ký tự trong dòng), ...]
+
+        Dùng suffix array cho các dòng đã index, SQL cho các dòng mới hơn index
+        (mọi lần xuất hiện trong dòng, như suffix array).
+        """
+        if not word:
+            return []
+        index = self.get_suffix_index()
+        byte_positions = index.locate(word, limit) if index is not None else []
+        last_id = index.last_id if index is not None else 0
+
+        # Đổi byte offset UTF-8 thành vị trí ký tự
+        rows = self._rows_by_id({subtitle_id for subtitle_id, _ in byte_positions})
+        positions = [(subtitle_id, len(rows[subtitle_id][2].encode('utf-8')[:offset].decode('utf-8')))
+                     for subtitle_id, offset in byte_positions if subtitle_id in rows]
+        if len(positions) >= limit:
+            return positions
+
+        needle = word.encode('utf-8').lower()
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, japanese_text
+            FROM subtitles
+            WHERE id > ? AND japanese_text LIKE ?
+            ORDER BY id
+        """, (last_id, f'%{word}%'))
+        for subtitle_id, text in cursor:
+            data = text.encode('utf-8')
+            haystack = data.lower()
+            offset = haystack.find(needle)
+            while offset != -1 and len(positions) < limit:
+                positions.append((subtitle_id, len(data[:offset].decode('utf-8'))))
+                offset = haystack.find(needle, offset + 1)
+            if len(positions) >= limit:
+                break
+        cursor.close()
+        conn.close()
+        return positions
+
+    def _rows_by_id(self, ids) -> Dict[int, Tuple]:
+        """Dòng (video_id, video_url, japanese_text, start_time, end_time, duration,
+        sequence_number) theo subtitle id"""
+        ids = list(ids)
+        rows = {}
+        conn = self._connect()
+        cursor = conn.cursor()
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            placeholders = ','.join('?' for _ in chunk)
+            cursor.execute(f"""
+                SELECT id, video_id, video_url, japanese_text, start_time, end_time,
                        duration, sequence_number
-                FROM subtitles 
-                WHERE japanese_text = ?
+                FROM subtitles
+                WHERE id IN ({placeholders})
+            """, chunk)
+            for row in cursor.fetchall():
+                rows[row[0]] = row[1:]
+        conn.close()
+        return rows
+
+    def kwic(self, word: str, limit: int = 1000, width: int = 15) -> List[Dict]:
+        """
+        Concordance keyword-in-context: mỗi lần xuất hiện thành (left, keyword, right)
+
+        Vị trí khớp lấy sẵn từ suffix array (và SQL cho các dòng chưa index), nên ngữ cảnh chỉ
+        là các phép cắt chuỗi, không chạy regex cho từng dòng. Với suffix array,
+        kết quả được sắp theo ngữ cảnh bên phải như concordance truyền thống.
+
+        Returns:
+            Danh sách kết quả như search_word_in_subtitles, thêm 'left', 'keyword',
+            'right', 'offset'
+        """
+        positions = self.locate_occurrences(word, limit)
+        rows = self._rows_by_id({subtitle_id for subtitle_id, _ in positions})
+
+        entries = []
+        for subtitle_id, offset in positions:
+            if subtitle_id not in rows:
+                continue
+            entry = self._build_result(rows[subtitle_id])
+            text, end = entry['japanese_text'], offset + len(word)
+            entry.update({
+                'id': subtitle_id,
+                'offset': offset,
+                'left': text[max(0, offset - width):offset],
+                'keyword': text[offset:end],
+                'right': text[end:end + width],
+            })
+            entries.append(entry)
+        return entries
+
+    def export_snapshot(self):
+        """Export snapshot memory-mapped cho tìm kiếm substring nhanh"""
+        print(f"🔄 Đang export snapshot vào {self.snapshot_dir}...")
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+        meta = export_snapshot(self.db_name, self.snapshot_dir)
+        print(f"✅ Snapshot: {meta['row_count']:,} subtitle entries")
+
+    def update_reading_index(self):
+        """
+        Index các dòng mới cho tìm theo cách đọc
+
+        Reading của dữ liệu cũ (phiên bản bộ phân tích cũ hơn) chỉ được tính lại một lần
+        cho mỗi player; downloader tính lại sau mỗi batch ingest.
+        """
+        warn_missing_analyzer()
+        if not self._readings_refreshed:
+            conn = self._connect()
+            refreshed = refresh_readings(conn, self.reading_index)
+            conn.close()
+            self._readings_refreshed = True
+            if refreshed:
+                print(f"🔤 Đã tính lại cách đọc cho {refreshed:,} dòng")
+        self.reading_index.update()
+
+    def _search_by_reading(self, search_word: str, limit: int,
+                           max_per_video: Optional[int] = None,
+                           collapse_duplicates: bool = False) -> List[Dict]:
+        """Tìm trên cột reading; ứng viên lấy từ reading_ngrams, corpus không phải chuyển đổi lại"""
+        reading = normalize_reading_query(search_word)
+        if not reading:
+            return []
+
+        self.update_reading_index()
+        where, params = self._reading_filter(reading)
+        return self._select_subtitles(where, params, limit, max_per_video, collapse_duplicates)
+
+    def _reading_filter(self, reading: str) -> Tuple[str, List]:
+        """Điều kiện WHERE cho tìm theo cách đọc (đã chuẩn hóa sang hiragana)"""
+        where, params = "reading LIKE ?", [f'%{reading}%']
+        indexed = self.reading_index.literal_filter(reading)
+        if indexed is not None:
+            where += " AND " + indexed[0]
+            params.extend(indexed[1])
+        return where, params
+
+    def _select_subtitles(self, where: str, params: List, limit: int,
+                          max_per_video: Optional[int] = None,
+                          collapse_duplicates: bool = False) -> List[Dict]:
+        """Chạy truy vấn subtitle với điều kiện where, sắp xếp theo video_id, start_time"""
+        query, params = self._select_query(where, params, limit, max_per_video, collapse_duplicates)
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        results = []
+        for row in cursor.fetchall():
+            result = self._build_result(row[:7])
+            if collapse_duplicates:
+                result['duplicate_count'] = row[7]
+            results.append(result)
+        conn.close()
+        return results
+
+    def _select_query(self, where: str, params: List, limit: int,
+                      max_per_video: Optional[int] = None,
+                      collapse_duplicates: bool = False) -> Tuple[str, List]:
+        """
+        SQL và tham số cho _select_subtitles
+
+        Khi có max_per_video, giới hạn mỗi video được áp dụng ngay trong SQL bằng
+        ROW_NUMBER() OVER (PARTITION BY video_id ORDER BY start_time). Thứ tự
+        phân vùng trùng với index UNIQUE(video_id, start_time, ...) nên SQLite
+        duyệt theo index mà không phải sắp xếp lại, và LIMIT áp dụng sau khi
+        đã cắt bớt - không phải lấy hàng nghìn dòng về Python rồi bỏ đi.
+
+        Khi collapse_duplicates, các dòng cùng duplicate_group chỉ giữ dòng đầu tiên
+        (theo video_id, start_time), thêm cột duplicate_count = số dòng của nhóm.
+        """
+        columns = """video_id, video_url, japanese_text, start_time, end_time,
+                     duration, sequence_number"""
+        source = "subtitles"
+
+        if collapse_duplicates:
+            source = f"""(
+                SELECT * FROM (
+                    SELECT {columns}, COUNT(*) OVER duplicates AS duplicate_count,
+                           ROW_NUMBER() OVER (duplicates ORDER BY video_id, start_time) AS duplicate_rank
+                    FROM subtitles
+                    WHERE {where}
+                    WINDOW duplicates AS (PARTITION BY COALESCE(duplicate_group, id))
+                )
+                WHERE duplicate_rank = 1
+            )"""
+            where = "1"
+            columns += ", duplicate_count"
+
+        if max_per_video:
+            query = f"""
+                WITH candidates AS (
+                    SELECT {columns},
+                           ROW_NUMBER() OVER (PARTITION BY video_id ORDER BY start_time) AS video_rank
+                    FROM {source}
+                    WHERE {where}
+                )
+                SELECT {columns}
+                FROM candidates
+                WHERE video_rank <= ?
                 ORDER BY video_id, start_time
                 LIMIT ?
             """
-            cursor.execute(query, (search_word, limit))
+            params = list(params) + [max_per_video, limit]
         else:
-            # Tìm kiếm mờ - chứa từ đó
-            query = """
-                SELECT video_id, video_url, japanese_text, start_time, end_time, 
-                       duration, sequence_number
-                FROM subtitles 
-                WHERE japanese_text LIKE ?
+            query = f"""
+                SELECT {columns}
+                FROM {source}
+                WHERE {where}
                 ORDER BY video_id, start_time
                 LIMIT ?
             """
-            cursor.execute(query, (f'%{search_word}%', limit))
+            params = list(params) + [limit]
+
+        return query, params
+
+    def get_average_text_length(self) -> float:
+        """Độ dài trung bình của subtitle (cache lại, dùng cho chuẩn hóa BM25)"""
+        if self._avg_text_length is None:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute("SELECT AVG(char_length) FROM subtitles")
+            self._avg_text_length = cursor.fetchone()[0] or 1.0
+            conn.close()
+        return self._avg_text_length
+
+    def search_ranked(self, search_word: str, limit: int = 20,
+                      after: Optional[Tuple[float, int]] = None,
+                      collapse_duplicates: bool = False) -> Tuple[List[Dict], Optional[Tuple[float, int]]]:
+        """
+        Tìm kiếm xếp hạng theo BM25 với phân trang keyset
+
+        Điểm được tính trong SQL từ số lần xuất hiện của từ trong dòng (tf)
+        và độ dài dòng so với độ dài trung bình. Toàn bộ (score, id) của truy vấn
+        được tính và sắp xếp một lần (xem get_ranked_set); mỗi trang chỉ là
+        tìm nhị phân con trỏ trong danh sách đã sắp rồi đọc các dòng của trang theo id.
+
+        Args:
+            search_word: Từ cần tìm
+            limit: Số kết quả mỗi trang
+            after: Con trỏ (score, id) trả về từ trang trước, None cho trang đầu
+            collapse_duplicates: True để gộp các dòng gần trùng giữa các video thành
+                kết quả điểm cao nhất của nhóm, kèm 'duplicate_count'
+
+        Returns:
+            (kết quả, con trỏ trang tiếp theo hoặc None nếu đã hết)
+        """
+        if not search_word:
+            return [], None
+
+        keys, duplicate_counts = self.get_ranked_set(search_word, collapse_duplicates)
+
+        # keys được sắp theo (-score, id): trang tiếp theo bắt đầu ngay sau con trỏ
+        start = bisect.bisect_right(keys, (-after[0], after[1])) if after is not None else 0
+        page = range(start, min(start + limit, len(keys)))
+        rows = self._rows_by_id(keys[i][1] for i in page)
 
         results = []
-        for row in cursor.fetchall():
-            video_id, video_url, japanese_text, start_time, end_time, duration, seq_num = row
-
-            results.append({
-                'video_id': video_id,
-                'video_url': video_url,
-                'japanese_text': japanese_text,
-                'start_time': start_time,
-                'end_time': end_time,
-                'duration': duration,
-                'sequence_number': seq_num,
-                'timestamp_url': self.create_timestamp_url(video_url, start_time)
-            })
+        for i in page:
+            negative_score, subtitle_id = keys[i]
+            if subtitle_id not in rows:
+                continue
+            result = self._build_result(rows[subtitle_id])
+            result['id'] = subtitle_id
+            result['score'] = -negative_score
+            if collapse_duplicates:
+                result['duplicate_count'] = duplicate_counts[i]
+            results.append(result)
+
+        next_cursor = None
+        if start + limit < len(keys):
+            negative_score, subtitle_id = keys[start + limit - 1]
+            next_cursor = (-negative_score, subtitle_id)
+
+        return results, next_cursor
+
+    def get_ranked_set(self, search_word: str,
+                       collapse_duplicates: bool = False) -> Tuple[List[Tuple[float, int]], Optional[List[int]]]:
+        """
+        Tập kết quả xếp hạng đã sắp của search_word: ([(-score, id), ...], duplicate_count
+        theo từng vị trí hoặc None)
 
+        Chỉ giữ (score, id) chứ không giữ nội dung dòng, và được cache theo truy vấn
+        (RANKED_CACHE_SIZE truy vấn gần nhất) tới khi database có subtitle mới.
+        """
+        key = (search_word, collapse_duplicates)
+        conn = self._connect()
+        max_id = conn.execute("SELECT MAX(id) FROM subtitles").fetchone()[0]
         conn.close()
-        return results
 
-    def create_timestamp_url(self, video_url: str, start_time: float) -> str:
-        """Tạo URL YouTube với timestamp"""
-        # Chuyển đổi thời gian từ giây sang định dạng YouTube
-        start_seconds = int(start_time)
-
-        # Nếu URL đã có timestamp, thay thế nó
-        if 't=' in video_url or '#t=' in video_url:
-            # Loại bỏ timestamp cũ
-            video_url = re.sub(r'[&#]t=\d+', '', video_url)
-            video_url = re.sub(r'[&#]start=\d+', '', video_url)
-
-        # Thêm timestamp mới
-        separator = '&' if '?' in video_url else '?'
-        return f"{video_url}{separator}t={start_seconds}s"
-
-    def format_time(self, seconds: float) -> str:
-        """Chuyển đổi giây thành định dạng mm:ss hoặc hh:mm:ss"""
-        total_seconds = int(seconds)
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        secs = total_seconds % 60
-
-        if hours > 0:
-            return f"{hours:02d}:{minutes:02d}:{secs:02d}"
-        else:
-            return f"{minutes:02d}:{secs:02d}"
-
-    def highlight_search_term(self, text: str, search_term: str) -> str:
-        """Highlight từ tìm kiếm trong text (cho terminal)"""
-        if not search_term:
-            return text
-
-        # Sử dụng ANSI color codes để highlight
-        highlighted = re.sub(
-            f'({re.escape(search_term)})',
-            r'\033[93m\1\033[0m',  # Yellow highlight
-            text,
-            flags=re.IGNORECASE
-        )
-        return highlighted
-
-    def display_search_results(self, results: List[Dict], search_term: str = ""):
-        """Hiển thị kết quả tìm kiếm"""
-        if not results:
-            print(f"❌ Không tìm thấy kết quả cho '{search_term}'")
-            return
+        with self._ranked_lock:
+            cached = self._ranked_cache.get(key)
+            if cached is not None and cached[0] == max_id:
+                self._ranked_cache.move_to_end(key)
+                return cached[1], cached[2]
 
-        print(f"\n🔍 Tìm thấy {len(results)} kết quả cho '{search_term}':")
-        print("=" * 80)
+        query, params = self._ranked_query(search_word, collapse_duplicates)
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
 
-        for i, result in enumerate(results, 1):
-            # Highlight search term
-            highlighted_text = self.highlight_search_term(result['japanese_text'], search_term)
+        keys = [(-row[1], row[0]) for row in rows]
+        duplicate_counts = [row[2] for row in rows] if collapse_duplicates else None
 
-            print(f"{i:2d}. {highlighted_text}")
-            print(f"    ⏰ Thời gian: {self.format_time(result['start_time'])} - {self.format_time(result['end_time'])}")
-            print(f"    🎥 Video ID: {result['video_id']}")
-            print(f"    🔗 URL: {result['timestamp_url']}")
-            print()
+        with self._ranked_lock:
+            self._ranked_cache[key] = (max_id, keys, duplicate_counts)
+            self._ranked_cache.move_to_end(key)
+            while len(self._ranked_cache) > self.RANKED_CACHE_SIZE:
+                self._ranked_cache.popitem(last=False)
+        return keys, duplicate_counts
 
-    def get_video_context(self, video_id: str, target_time: float,
-                          context_seconds: int = 10) -> List[Dict]:
+    def _ranked_query(self, search_word: str, collapse_duplicates: bool = False) -> Tuple[str, List]:
         """
-        Lấy ngữ cảnh xung quanh thời điểm tìm thấy (subtitle trước và sau)
+        SQL và tham số tính (id, score[, duplicate_count]) của mọi dòng khớp, sắp theo
+        score giảm dần rồi id (độ dài dòng lấy từ cột char_length)
 
-        Args:
-            video_id: ID của video
-            target_time: Thời gian của subtitle tìm thấy
-            context_seconds: Số giây trước và sau để lấy ngữ cảnh
+        Khi gộp bản trùng, mỗi nhóm duplicate_group chỉ giữ dòng có (score, id) tốt nhất.
         """
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        k1, b = self.BM25_K1, self.BM25_B
+        avg_length = self.get_average_text_length()
+
+        # Chỉ đọc duplicate_group khi cần gộp
+        group_column = ", duplicate_group" if collapse_duplicates else ""
+        scored = f"""
+            SELECT id{group_column}, (tf * ?) / (tf + ? * (1 - ? + ? * char_length / ?)) AS score
+            FROM (
+                SELECT id, char_length{group_column},
+                       (char_length
+                        - LENGTH(REPLACE(LOWER(japanese_text), LOWER(?), ''))) / LENGTH(?) AS tf
+                FROM subtitles
+                WHERE japanese_text LIKE ?
+            )
+        """
+        params = [k1 + 1, k1, b, b, avg_length, search_word, search_word, f'%{search_word}%']
+
+        if collapse_duplicates:
+            query = f"""
+                SELECT id, score, duplicate_count
+                FROM (
+                    SELECT *, COUNT(*) OVER duplicates AS duplicate_count,
+                           ROW_NUMBER() OVER (duplicates ORDER BY score DESC, id) AS duplicate_rank
+                    FROM ({scored})
+                    WINDOW duplicates AS (PARTITION BY COALESCE(duplicate_group, id))
+                )
+                WHERE duplicate_rank = 1
+            """
+        else:
+            query = f"SELECT id, score FROM ({scored})"
 
-        query = """
-            SELECT japanese_text, start_time, end_time, sequence_number
-            FROM subtitles 
-            WHERE video_id = ? 
-              AND start_time BETWEEN ? AND ?
-            ORDER BY start_time
+        query += " ORDER BY score DESC, id"
+        return query, params
+
+    def search_regex(self, pattern: str, limit: int = 20,
+                     timeout: Optional[float] = None) -> List[Dict]:
         """
+        Tìm theo regex (vd. 'ても(いい|良い)', 'ながら')
 
-        start_range = target_time - context_seconds
-        end_range = target_time + context_seconds
+        Literal bắt buộc trong pattern được dùng để lấy ứng viên từ n-gram index,
+        regex chỉ chạy trên các ứng viên đó, trong process riêng có timeout. Trong khối
+        cancellable(), hủy token sẽ dừng process đó.
 
-        cursor.execute(query, (video_id, start_range, end_range))
+        Raises:
+            re.error: pattern không hợp lệ
+            TimeoutError: regex chạy quá thời gian cho phép
+            RuntimeError: n-gram index chưa build hoặc thiếu dòng mới (xem build_search_indexes)
+        """
+        self._require_ngram_index()
+        rows = self.get_regex_searcher().search(pattern, limit=limit, timeout=timeout,
+                                                token=getattr(self._local, 'token', None))
+        return [self._build_result(row) for row in rows]
 
-        context = []
-        for row in cursor.fetchall():
-            text, start_time, end_time, seq_num = row
-            context.append({
-                'text': text,
-                'start_time': start_time,
-                'end_time': end_time,
-                'sequence_number': seq_num,
-                'is_target': abs(start_time - target_time) < 1.0  # Đánh dấu subtitle target
-            })
+    def _require_ngram_index(self):
+        """
+        Báo lỗi nếu n-gram index không phủ hết các subtitle
 
+        Index được build lúc ingest hoặc bằng --build-index, không bao giờ trên đường truy vấn.
+        """
+        conn = self._connect()
+        last_id = self.ngram_index.last_indexed_id(conn)
+        max_id = conn.execute("SELECT MAX(id) FROM subtitles").fetchone()[0] or 0
         conn.close()
-        return context
+        if last_id is None:
+            raise RuntimeError("Chưa có n-gram index cho tìm regex / gần đúng: "
+                               "chạy 'python main.py play --build-index'")
+        if last_id < max_id:
+            raise RuntimeError(f"N-gram index chưa có {max_id - last_id:,}+ subtitle mới: "
+                               "chạy 'python main.py play --build-index'")
+
+    def search_fuzzy(self, search_word: str, max_distance: int = 1,
+                     limit: int = 20) -> List[Dict]:
+        """
+        Tìm gần đúng: dòng chứa một đoạn cách từ cần tìm không quá max_distance phép sửa
+        (vd. lỗi nhận dạng của phụ đề tự động)
 
-    def show_context(self, video_id: str, target_time: float, search_term: str = ""):
-        """Hiển thị ngữ cảnh xung quanh subtitle tìm thấy"""
-        context = self.get_video_context(video_id, target_time, context_seconds=15)
+        Ứng viên lấy từ n-gram index theo số bigram chung, edit distance chỉ được
+        tính trên danh sách ứng viên. Kết quả có thêm 'distance'.
 
-        if not context:
-            return
+        Raises:
+            RuntimeError: n-gram index chưa build hoặc thiếu dòng mới (xem build_search_indexes)
+        """
+        from fuzzy_search import fuzzy_search
 
-        print(f"\n📖 Ngữ cảnh xung quanh (Video: {video_id}):")
-        print("-" * 60)
+        self._require_ngram_index()
+        results = []
+        for distance, row in fuzzy_search(self.db_name, search_word, max_distance,
+                                          self.ngram_index)[:limit]:
+            result = self._build_result(row)
+            result['distance'] = distance
+            results.append(result)
+        return results
 
-        for item in context:
-            time_str = self.format_time(item['start_time'])
+    def batch_search(self, terms: List[str], top_k: int = 5,
+                     workers: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Tìm cả danh sách từ trong một lần quét database (Aho-Corasick, nhiều process)
 
-            if item['is_target']:
-                # Highlight subtitle chính
-                text = self.highlight_search_term(item['text'], search_term)
-                print(f"👉 [{time_str}] {text}")
-            else:
-                print(f"   [{time_str}] {item['text']}")
+        Returns:
+            {term: {'count': số dòng khớp, 'hits': [kết quả tốt nhất, ...]}}
+        """
+        from batch_search import BatchSearcher
+
+        searcher = BatchSearcher(self.db_name, workers=workers)
+        results = searcher.search(terms, top_k=top_k)
+
+        for result in results.values():
+            hits = []
+            for row in result['hits']:
+                hit = self._build_result(row[1:8])
+                hit['id'] = row[0]
+                hits.append(hit)
+            result['hits'] = hits
+
+        return results
+
+    def batch_search_to_file(self, terms_file: str, output_file: str, top_k: int = 5,
+                             workers: Optional[int] = None):
+        """Tìm danh sách từ trong file và ghi kết quả ra JSONL"""
+        from batch_search import load_terms, write_jsonl
 
-        print("-" * 60)
+        terms = load_terms(terms_file)
+        print(f"🔄 Đang tìm {len(terms)} từ trong một lần quét...")
 
-    def open_youtube_video(self, url: str, show_confirmation: bool = True):
-        """Mở video YouTube trong browser"""
+        start = time.time()
+        results = self.batch_search(terms, top_k=top_k, workers=workers)
+        write_jsonl(results, output_file)
+
+        found = sum(1 for result in results.values() if result['hits'])
+        print(f"✅ {found}/{len(results)} từ có kết quả ({time.time() - start:.1f}s)")
+        print(f"📄 Đã ghi kết quả vào {output_file}")
+
+    def export_clips(self, results: List[Dict], output_dir: str = "clips", anki: bool = False,
+                     media_dir: Optional[str] = None, workers: Optional[int] = None) -> Optional[str]:
+        """
+        Cắt audio clip cho các kết quả tìm kiếm và ghi manifest vào output_dir
+
+        Media lấy từ YouTube qua yt-dlp, hoặc từ media_dir (file <video_id>.*) nếu có.
+        Trả về đường dẫn manifest (manifest.csv, hoặc anki.txt nếu anki=True).
+        """
+        from clip_export import (ClipExporter, LocalMediaSource, YtDlpMediaSource,
+                                 write_anki_manifest, write_csv_manifest)
+
+        source = LocalMediaSource(media_dir) if media_dir else YtDlpMediaSource()
         try:
-            if show_confirmation:
-                confirm = input(f"\n🎬 Mở video YouTube? (y/n): ").strip().lower()
-                if confirm not in ['y', 'yes', 'có', 'c']:
-                    print("❌ Đã hủy.")
-                    return False
+            exporter = ClipExporter(source, output_dir=output_dir, workers=workers)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return None
+
+        videos = len({result['video_id'] for result in results})
+        print(f"🎧 Đang cắt {len(results)} clip từ {videos} video ({exporter.workers} ffmpeg song song)...")
+        start = time.time()
+        records = exporter.export(results, progress=lambda done, total: print(
+            f"\r   {done}/{total}", end="", flush=True))
+        print()
+
+        manifest = os.path.join(output_dir, "anki.txt" if anki else "manifest.csv")
+        (write_anki_manifest if anki else write_csv_manifest)(records, manifest)
+
+        failed = [record for record in records if record['error']]
+        print(f"✅ {len(records) - len(failed)}/{len(records)} clip ({time.time() - start:.1f}s)")
+        for record in failed[:5]:
+            print(f"   ❌ {record['video_id']} {self.format_time(record['start_time'])}: {record['error']}")
+        print(f"📄 Manifest: {manifest}")
+        return manifest
+
+    def _build_result(self, row: Tuple) -> Dict:
+        """Chuyển một dòng (video_id, video_url, japanese_text, start_time, end_time,
+        duration, sequence_number) thành dict kết quả"""
+        video_id, video_url, japanese_text, start_time, end_time, duration, seq_num = row
+        return {
+            'video_id': video_id,
+            'video_url': video_url,
+            'japanese_text': japanese_text,
+            'start_time': start_time,
+            'end_time': end_time,
+            'duration': duration,
+            'sequence_number': seq_num,
+            'timestamp_url': self.create_timestamp_url(video_url, start_time)
+        }
+
+    def get_contexts(self, targets: List[Tuple[str, float]],
+                     context_seconds: int = 10) -> List[List[Dict]]:
+        """
+        Lấy ngữ cảnh cho nhiều kết quả trong một truy vấn
 
-            print(f"🚀 Đang mở: {url}")
-            webbrowser.open(url)
-            return True
+        Các mục tiêu (video_id, target_time) được đưa vào một CTE VALUES và JOIN
+        với subtitles theo khoảng start_time; mỗi mục tiêu được trả lời bằng một
+        range scan trên index idx_video_start_filter.
 
-        except Exception as e:
-            print(f"❌ Lỗi khi mở browser: {e}")
-            return False
+        Returns:
+            Danh sách ngữ cảnh, cùng thứ tự với targets
+        """
+        contexts: List[List[Dict]] = [[] for _ in targets]
+        if not targets:
+            return contexts
+
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # Chia nhỏ để không vượt quá giới hạn số tham số của SQLite
+        chunk_size = 300
+        for chunk_start in range(0, len(targets), chunk_size):
+            chunk = targets[chunk_start:chunk_start + chunk_size]
+            cursor.execute(*self._contexts_query(chunk_start, chunk, context_seconds))
+
+            for idx, target_time, text, start_time, end_time, seq_num in cursor.fetchall():
+                contexts[idx].append({
+                    'text': text,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'sequence_number': seq_num,
+                    'is_target': abs(start_time - target_time) < 1.0  # Đánh dấu subtitle target
+                })
+
+        conn.close()
+        return contexts
+
+    def _contexts_query(self, chunk_start: int, chunk: List[Tuple[str, float]],
+                        context_seconds: int) -> Tuple[str, List]:
+        """SQL và tham số lấy ngữ cảnh cho một nhóm mục tiêu (idx bắt đầu từ chunk_start)"""
+        values = ','.join('(?, ?, ?)' for _ in chunk)
+        params = []
+        for offset, (video_id, target_time) in enumerate(chunk):
+            params.extend([chunk_start + offset, video_id, target_time])
+        params.extend([context_seconds, context_seconds])
+
+        query = f"""
+            WITH targets(idx, video_id, target_time) AS (VALUES {values})
+            SELECT t.idx, t.target_time, s.japanese_text, s.start_time, s.end_time,
+                   s.sequence_number
+            FROM targets t
+            JOIN subtitles s
+              ON s.video_id = t.video_id
+             AND s.start_time BETWEEN t.target_time - ? AND t.target_time + ?
+            ORDER BY t.idx, s.start_time
+        """
+        return query, params
 
     def advanced_search(self, search_term: str, filters: Dict = None) -> List[Dict]:
         """
@@ -242,19 +1071,21 @@ class SubtitleSearchPlayer:
         - max_duration: Thời lượng tối đa (giây)
         - video_ids: Danh sách video ID cụ thể
         - exclude_short: Loại bỏ subtitle quá ngắn
+        - max_per_video: Số kết quả tối đa cho mỗi video
         """
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        where, params, max_per_video = self._advanced_filter(search_term, filters)
+        return self._select_subtitles(where, params, 50, max_per_video)
 
-        base_query = """
-            SELECT video_id, video_url, japanese_text, start_time, end_time, 
-                   duration, sequence_number
-            FROM subtitles 
-            WHERE japanese_text LIKE ?
+    def _advanced_filter(self, search_term: str, filters: Dict = None) -> Tuple[str, List, Optional[int]]:
         """
+        Điều kiện WHERE cho advanced_search: (where, params, max_per_video)
 
+        Các cột duration, char_length, video_id nằm trong idx_video_start_filter, nên
+        các điều kiện này được kiểm tra trên index trước khi đọc japanese_text từ bảng.
+        """
         params = [f'%{search_term}%']
-        conditions = []
+        conditions = ["japanese_text LIKE ?"]
+        max_per_video = None
 
         if filters:
             if filters.get('min_duration'):
@@ -271,131 +1102,73 @@ class SubtitleSearchPlayer:
                 params.extend(filters['video_ids'])
 
             if filters.get('exclude_short'):
-                conditions.append("LENGTH(japanese_text) > 5")
+                conditions.append("char_length > 5")
 
-        if conditions:
-            base_query += " AND " + " AND ".join(conditions)
+            max_per_video = filters.get('max_per_video')
 
-        base_query += " ORDER BY video_id, start_time LIMIT 50"
+        return " AND ".join(conditions), params, max_per_video
 
-        cursor.execute(base_query, params)
-
-        results = []
-        for row in cursor.fetchall():
-            video_id, video_url, japanese_text, start_time, end_time, duration, seq_num = row
-
-            results.append({
-                'video_id': video_id,
-                'video_url': video_url,
-                'japanese_text': japanese_text,
-                'start_time': start_time,
-                'end_time': end_time,
-                'duration': duration,
-                'sequence_number': seq_num,
-                'timestamp_url': self.create_timestamp_url(video_url, start_time)
-            })
+    def explain_query_plans(self, search_word: str) -> Dict[str, List[str]]:
+        """
+        EXPLAIN QUERY PLAN của truy vấn SQL mà mỗi chế độ tìm kiếm sẽ chạy với search_word
 
+        Với regex / fuzzy là truy vấn lấy ứng viên từ n-gram index. Không chạy truy vấn thật.
+        """
+        from fuzzy_search import MAX_CANDIDATES
+        from regex_search import build_candidate_filter, extract_required_literals
+
+        word = search_word
+        like = ("japanese_text LIKE ?", [f'%{word}%'])
+        reading = normalize_reading_query(word)
+        advanced = self._advanced_filter(word, {'min_duration': 1, 'max_duration': 5,
+                                                'exclude_short': True})
+        needle = word.lower()
+        fuzzy = self.ngram_index.overlap_filter(
+            needle, len(self.ngram_index.ngrams(needle)) - self.ngram_index.n, MAX_CANDIDATES) or like
+        regex = build_candidate_filter(extract_required_literals(re.escape(word)), self.ngram_index)
+
+        queries = {
+            'contains': self._select_query(*like, 20),
+            'exact': self._select_query("japanese_text = ?", [word], 20),
+            'contains (max_per_video)': self._select_query(*like, 20, 3),
+            'ranked (scored set)': self._ranked_query(word),
+            'ranked (collapse duplicates)': self._ranked_query(word, True),
+            'contains (collapse duplicates)': self._select_query(*like, 20, None, True),
+            'reading': self._select_query(*self._reading_filter(reading), 20),
+            'advanced (duration, exclude_short)': self._select_query(*advanced[:2], 50),
+            'advanced (video_ids)': self._select_query(
+                *self._advanced_filter(word, {'video_ids': ['a', 'b']})[:2], 50),
+            'regex candidates': self._select_query(*regex, 20),
+            'fuzzy candidates': self._select_query(*fuzzy, MAX_CANDIDATES),
+            'context': self._contexts_query(0, [('a', 10.0), ('b', 20.0)], 10),
+        }
+
+        conn = self._connect()
+        self.ngram_index.ensure_tables(conn)
+        self.reading_index.ensure_tables(conn)
+        plans = {}
+        for mode, (query, params) in queries.items():
+            rows = conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+            # (id, parent, notused, detail): thụt lề theo độ sâu trong cây
+            depth = {0: -1}
+            lines = []
+            for node_id, parent, _, detail in rows:
+                depth[node_id] = depth.get(parent, -1) + 1
+                lines.append("  " * depth[node_id] + detail)
+            plans[mode] = lines
         conn.close()
-        return results
-
-    def interactive_search(self):
-        """Giao diện tìm kiếm tương tác"""
-        print("🎌 Japanese Subtitle Search & Player")
-        print("=" * 40)
-        print("Tìm kiếm từ trong database subtitle và tự động mở YouTube")
-        print("Gõ 'quit' để thoát\n")
-
-        while True:
-            search_term = input("🔍 Nhập từ cần tìm: ").strip()
-
-            if search_term.lower() in ['quit', 'exit', 'q', 'thoát']:
-                print("👋 Tạm biệt!")
-                break
-
-            if not search_term:
-                print("❌ Vui lòng nhập từ cần tìm.")
-                continue
-
-            # Tìm kiếm
-            print(f"\n🔄 Đang tìm kiếm '{search_term}'...")
-            results = self.search_word_in_subtitles(search_term, limit=15)
-
-            if not results:
-                print(f"❌ Không tìm thấy '{search_term}' trong database.")
-                continue
-
-            # Hiển thị kết quả
-            self.display_search_results(results, search_term)
-
-            while True:
-                try:
-                    action = input(
-                        "\n🎯 Chọn hành động: (số) mở video, (c)ontext, (n)ew search, (q)uit: ").strip().lower()
-
-                    if action in ['q', 'quit', 'thoát']:
-                        return
-                    elif action in ['n', 'new', 'mới']:
-                        break
-                    elif action in ['c', 'context', 'ngữ cảnh']:
-                        # Hiển thị ngữ cảnh cho kết quả đầu tiên
-                        if results:
-                            self.show_context(results[0]['video_id'],
-                                              results[0]['start_time'],
-                                              search_term)
-                    elif action.isdigit():
-                        choice = int(action)
-                        if 1 <= choice <= len(results):
-                            selected = results[choice - 1]
-
-                            # Hiển thị ngữ cảnh
-                            self.show_context(selected['video_id'],
-                                              selected['start_time'],
-                                              search_term)
-
-                            # Mở video
-                            self.open_youtube_video(selected['timestamp_url'])
-                            break
-                        else:
-                            print(f"❌ Vui lòng chọn số từ 1 đến {len(results)}")
-                    else:
-                        print("❌ Lựa chọn không hợp lệ.")
-
-                except ValueError:
-                    print("❌ Vui lòng nhập số hoặc lệnh hợp lệ.")
-                except KeyboardInterrupt:
-                    print("\n👋 Đã dừng.")
-                    return
-
-    def quick_search_and_play(self, search_term: str, auto_play: bool = False):
-        """Tìm kiếm nhanh và mở video đầu tiên"""
-        print(f"🔍 Tìm kiếm: '{search_term}'")
-
-        results = self.search_word_in_subtitles(search_term, limit=5)
-
-        if not results:
-            print(f"❌ Không tìm thấy '{search_term}'")
-            return
-
-        # Hiển thị kết quả ngắn gọn
-        print(f"✅ Tìm thấy {len(results)} kết quả:")
-        for i, result in enumerate(results[:3], 1):
-            print(f"{i}. {result['japanese_text'][:50]}... [{self.format_time(result['start_time'])}]")
-
-        # Lấy kết quả đầu tiên
-        first_result = results[0]
-
-        # Hiển thị ngữ cảnh
-        self.show_context(first_result['video_id'],
-                          first_result['start_time'],
-                          search_term)
-
-        # Mở video
-        self.open_youtube_video(first_result['timestamp_url'],
-                                show_confirmation=not auto_play)
-
-    def get_database_stats(self):
-        """Hiển thị thống kê database"""
-        conn = sqlite3.connect(self.db_name)
+        return plans
+
+    def display_query_plans(self, search_word: str):
+        """In EXPLAIN QUERY PLAN của từng chế độ tìm kiếm"""
+        for mode, lines in self.explain_query_plans(search_word).items():
+            print(f"\n🧭 {mode}:")
+            for line in lines:
+                print(f"   {line}")
+
+    def database_stats(self) -> Dict:
+        """Thống kê database: tổng số entries, số video, top 5 video nhiều subtitle nhất"""
+        conn = self._connect()
         cursor = conn.cursor()
 
         # Tổng số subtitle entries
@@ -416,19 +1189,46 @@ class SubtitleSearchPlayer:
         """)
         top_videos = cursor.fetchall()
 
+        # Dòng nằm trong đoạn gần trùng với video khác (gán lúc ingest)
+        cursor.execute("SELECT COUNT(*) FROM subtitles WHERE duplicate_group IS NOT NULL")
+        duplicate_lines = cursor.fetchone()[0]
+
         conn.close()
 
-        print(f"\n📊 Thống kê Database:")
-        print(f"📝 Tổng subtitle entries: {total_entries:,}")
-        print(f"🎥 Số video: {unique_videos}")
-        print(f"📈 Top 5 video nhiều subtitle nhất:")
-        for video_id, count in top_videos:
-            print(f"   {video_id}: {count} entries")
+        return {
+            'total_entries': total_entries,
+            'unique_videos': unique_videos,
+            'top_videos': [[video_id, count] for video_id, count in top_videos],
+            'duplicate_lines': duplicate_lines,
+            'near_duplicate_videos': len(DuplicateIndex(self.db_name).near_duplicate_videos()),
+        }
+
+    def display_near_duplicates(self):
+        """Cập nhật và hiển thị các video gần trùng (reupload, compilation)"""
+        index = DuplicateIndex(self.db_name)
+        index.update()
+        videos = index.near_duplicate_videos()
+        if not videos:
+            print("✅ Không có video gần trùng")
+            return
+
+        print(f"🧬 {len(videos)} video gần trùng:")
+        for video_id, original, score, skipped in videos:
+            note = " (bỏ qua khi ingest)" if skipped else ""
+            print(f"   {video_id} ≈ {original}: {score:.0%}{note}")
 
 
 def main():
     """Sử dụng chính"""
-    player = SubtitleSearchPlayer()
+    if len(sys.argv) > 1 and sys.argv[1] in ('--batch', '--export-snapshot', '--explain', '--duplicates',
+                                             '--export-clips', '--build-index'):
+        # Các lệnh ghi file chạy trên database local
+        player = SubtitleSearchPlayer()
+    else:
+        # Dùng daemon (main.py serve) nếu đang chạy, trả lời nhanh hơn nhiều
+        from search_client import connect_client
+        player = connect_client() or SubtitleSearchPlayer()
+    startup.report("search backend ready")
 
     if len(sys.argv) > 1:
         # Command line mode
@@ -436,6 +1236,62 @@ def main():
 
         if search_term == '--stats':
             player.get_database_stats()
+        elif search_term == '--export-snapshot':
+            player.export_snapshot()
+        elif search_term == '--build-index':
+            player.build_search_indexes()
+        elif search_term == '--duplicates':
+            player.display_near_duplicates()
+        elif sys.argv[1] == '--kwic' and len(sys.argv) > 2:
+            # --kwic word [--width N] [--limit N] [--output kwic.jsonl]
+            args = sys.argv[3:]
+            width = int(args[args.index('--width') + 1]) if '--width' in args else 15
+            limit = int(args[args.index('--limit') + 1]) if '--limit' in args else 1000
+            entries = player.kwic(sys.argv[2], limit=limit, width=width)
+            if '--output' in args:
+                player.export_kwic_jsonl(entries, args[args.index('--output') + 1])
+            else:
+                player.display_kwic(entries, sys.argv[2], width=width)
+        elif sys.argv[1] == '--suggest' and len(sys.argv) > 2:
+            for term, frequency in player.suggest(' '.join(sys.argv[2:]), limit=15):
+                print(f"   {term}  ({frequency:,} dòng)")
+        elif sys.argv[1] == '--explain' and len(sys.argv) > 2:
+            player.display_query_plans(' '.join(sys.argv[2:]))
+        elif sys.argv[1] == '--similar' and len(sys.argv) > 2:
+            text = ' '.join(sys.argv[2:])
+            try:
+                results = player.more_like_this(text, limit=10)
+            except RuntimeError as e:
+                print(f"❌ {e}")
+                return
+            print(f"🧩 Câu tương tự '{text}':")
+            for i, result in enumerate(results, 1):
+                print(f"{i:2d}. [{result['similarity']:.2f}] {result['japanese_text']} "
+                      f"({result['video_id']} {player.format_time(result['start_time'])})")
+        elif sys.argv[1] == '--count' and len(sys.argv) > 2:
+            word = ' '.join(sys.argv[2:])
+            print(f"📈 '{word}' xuất hiện {player.count_occurrences(word):,} lần trong corpus")
+        elif sys.argv[1] == '--export-clips' and len(sys.argv) > 2:
+            # --export-clips word [--limit N] [--output clips/] [--anki] [--media-dir DIR] [--workers N]
+            args = sys.argv[3:]
+            limit = int(args[args.index('--limit') + 1]) if '--limit' in args else 50
+            workers = int(args[args.index('--workers') + 1]) if '--workers' in args else None
+            results = player.search_word_in_subtitles(sys.argv[2], limit=limit)
+            if not results:
+                print(f"❌ Không tìm thấy '{sys.argv[2]}'")
+                return
+            player.export_clips(results,
+                                output_dir=args[args.index('--output') + 1] if '--output' in args else "clips",
+                                anki='--anki' in args,
+                                media_dir=args[args.index('--media-dir') + 1] if '--media-dir' in args else None,
+                                workers=workers)
+        elif sys.argv[1] == '--batch' and len(sys.argv) > 2:
+            # --batch words.txt [--top-k N] [--output results.jsonl]
+            args = sys.argv[3:]
+            top_k = int(args[args.index('--top-k') + 1]) if '--top-k' in args else 5
+            output_file = args[args.index('--output') + 1] if '--output' in args else \
+                os.path.splitext(sys.argv[2])[0] + '_results.jsonl'
+            player.batch_search_to_file(sys.argv[2], output_file, top_k=top_k)
         else:
             player.quick_search_and_play(search_term)
     else:
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suffix Array Index
+Suffix array trên toàn bộ japanese_text để đếm và định vị substring trong O(m log n)
+
+Index gồm nhiều segment; mỗi batch ingest tạo một segment mới cho các subtitle mới.
+Khi số segment vượt ngưỡng, hai segment liền nhau nhỏ nhất được gộp: suffix array mới là
+phép trộn hai suffix array đã sắp (không sắp lại từ đầu, không đọc lại database).
+Index chỉ được cập nhật khi ingest hoặc bằng lệnh build, không bao giờ trong lúc tìm kiếm.
+
+Tên segment (seg<số thứ tự>) không bao giờ được dùng lại. Segment đã gộp chỉ bị đưa vào
+danh sách 'retired' của manifest và được xóa ở lần cập nhật sau, khi các player / daemon
+đang mở chúng đã chuyển sang manifest mới (Windows không cho xóa file đang mmap).
+
+Thứ tự trong suffix array là thứ tự byte của suffix tính tới hết dòng (byte \\0): pattern
+không chứa \\0 nên phần sau đó không ảnh hưởng tới count / locate.
+Mỗi segment trong thư mục index:
+    <name>.text.bin     - text UTF-8 (chữ ASCII viết thường), mỗi dòng kết thúc bằng \\0
+    <name>.sa.npy       - suffix array (byte offset), sắp xếp theo thứ tự byte tới hết dòng
+    <name>.offsets.npy  - byte offset bắt đầu của từng dòng (n + 1 phần tử)
+    <name>.ids.npy      - subtitles.id của từng dòng
+"""
+
+import json
+import importlib.util
+import mmap
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# NumPy chỉ được import lần đầu cần đến (chiếm phần lớn thời gian khởi động)
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_DIR = "suffix_index"
+# Gộp segment khi vượt quá số này
+MAX_SEGMENTS = 8
+# Số suffix được tính khóa mỗi lần khi trộn (giới hạn bộ nhớ tạm)
+MERGE_CHUNK = 1 << 20
+# Các file của một segment (.lcp.npy: chỉ có ở segment tạo bởi bản cũ, chỉ cần xóa khi gộp)
+SEGMENT_FILES = (".text.bin", ".sa.npy", ".lcp.npy", ".offsets.npy", ".ids.npy")
+
+# Khóa theo thư mục index: downloader và search player trong cùng process (GUI)
+# có thể cùng cập nhật một index
+_directory_locks: Dict[str, threading.Lock] = {}
+_directory_locks_guard = threading.Lock()
+
+
+def _directory_lock(directory: str) -> threading.Lock:
+    with _directory_locks_guard:
+        return _directory_locks.setdefault(os.path.abspath(directory), threading.Lock())
+
+
+def build_suffix_array(data: bytes) -> 'np.ndarray':
+    """Suffix array bằng prefix doubling (mỗi vòng một lexsort NumPy)"""
+    _load_numpy()
+    n = len(data)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    rank = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    sa = np.argsort(rank, kind='stable')
+    k = 1
+    while True:
+        # Khóa phụ: rank của suffix bắt đầu sau k byte (-1 nếu vượt cuối buffer)
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - k] = rank[k:]
+        sa = np.lexsort((second, rank))
+
+        sorted_rank, sorted_second = rank[sa], second[sa]
+        boundary = np.empty(n, dtype=bool)
+        boundary[0] = True
+        boundary[1:] = (sorted_rank[1:] != sorted_rank[:-1]) | (sorted_second[1:] != sorted_second[:-1])
+
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = np.cumsum(boundary) - 1
+        if rank[sa[-1]] == n - 1 or k >= n:
+            return sa
+        k *= 2
+
+
+def _suffix_keys(buffer: 'np.ndarray', positions: 'np.ndarray') -> 'np.ndarray':
+    """
+    8 byte đầu của mỗi suffix dưới dạng uint64 big-endian (so sánh số = so sánh byte)
+
+    Byte sau \\0 kết thúc dòng được coi là 0, nên khóa khác nhau thì thứ tự khóa là thứ tự
+    suffix tính tới hết dòng. buffer phải có 8 byte 0 ở cuối.
+    """
+    # Cửa sổ 8 byte tại mọi vị trí (view, không copy)
+    windows = np.lib.stride_tricks.as_strided(buffer, shape=(len(buffer) - 7, 8),
+                                              strides=(buffer.strides[0],) * 2)
+    keys = np.empty(len(positions), dtype=np.uint64)
+    for start in range(0, len(positions), MERGE_CHUNK):
+        rows = windows[positions[start:start + MERGE_CHUNK]]
+        rows[np.logical_or.accumulate(rows == 0, axis=1)] = 0
+        keys[start:start + MERGE_CHUNK] = rows.view('>u8').ravel()
+    return keys
+
+
+def _refine_ties(buffer: 'np.ndarray', first_sa: 'np.ndarray', lo: 'np.ndarray', hi: 'np.ndarray',
+                 keys: 'np.ndarray', depth: int) -> Tuple['np.ndarray', 'np.ndarray']:
+    """
+    Thu hẹp khoảng first_sa[lo:hi] của từng suffix theo khóa 8 byte tại depth
+
+    Mỗi khoảng là các suffix có chung depth byte đầu với suffix cần chèn, nên hai khoảng hoặc
+    trùng nhau hoặc rời nhau, và trong một khoảng các suffix đã sắp theo khóa tại depth.
+    Khóa được đổi thành hạng rồi ghép với số thứ tự khoảng để tìm tất cả trong một searchsorted.
+    """
+    starts, group = np.unique(lo, return_inverse=True)
+    ends = np.zeros(len(starts), dtype=np.int64)
+    ends[group] = hi
+    lengths = ends - starts
+    base = np.cumsum(lengths) - lengths
+    members = np.repeat(starts - base, lengths) + np.arange(int(lengths.sum()))
+    member_keys = _suffix_keys(buffer, first_sa[members] + depth)
+
+    _, ranks = np.unique(np.concatenate([member_keys, keys]), return_inverse=True)
+    ranks = ranks.astype(np.uint64).ravel()
+    member_ranks = (np.repeat(np.arange(len(starts), dtype=np.uint64), lengths) << np.uint64(32)) \
+        | ranks[:len(member_keys)]
+    target = (group.astype(np.uint64).ravel() << np.uint64(32)) | ranks[len(member_keys):]
+
+    offset = (starts - base)[group]
+    return (np.searchsorted(member_ranks, target, side='left') + offset,
+            np.searchsorted(member_ranks, target, side='right') + offset)
+
+
+def merge_suffix_arrays(data: bytes, first_sa: 'np.ndarray', second_sa: 'np.ndarray',
+                        shift: int) -> 'np.ndarray':
+    """
+    Trộn hai suffix array đã sắp thành suffix array của data = text thứ nhất + text thứ hai
+
+    Suffix của phần thứ hai nằm ở vị trí cũ + shift. Vị trí chèn của mỗi suffix thứ hai được
+    tìm bằng searchsorted trên khóa 8 byte; các suffix trùng khóa mà dòng còn tiếp được thu hẹp
+    khoảng bằng khóa của 8 byte tiếp theo (_refine_ties), cho tới khi khoảng rỗng hoặc hết dòng.
+    """
+    _load_numpy()
+    buffer = np.frombuffer(data + b'\0' * 8, dtype=np.uint8)
+    first_sa = np.asarray(first_sa, dtype=np.int64)
+    second_sa = np.asarray(second_sa, dtype=np.int64) + shift
+
+    first_keys = _suffix_keys(buffer, first_sa)
+    keys = _suffix_keys(buffer, second_sa)
+    lo = np.searchsorted(first_keys, keys, side='left')
+    hi = np.searchsorted(first_keys, keys, side='right')
+    del first_keys
+
+    # Khóa trùng và byte cuối khác 0: hai dòng còn tiếp sau 8 byte, phải so sánh tiếp
+    pending = np.nonzero((hi > lo) & ((keys & np.uint64(0xFF)) != 0))[0]
+    depth = 0
+    while len(pending):
+        depth += 8
+        keys = _suffix_keys(buffer, second_sa[pending] + depth)
+        new_lo, new_hi = _refine_ties(buffer, first_sa, lo[pending], hi[pending], keys, depth)
+        lo[pending], hi[pending] = new_lo, new_hi
+        pending = pending[(new_hi > new_lo) & ((keys & np.uint64(0xFF)) != 0)]
+
+    # lo[i] = số suffix thứ nhất nhỏ hơn suffix thứ hai i: không giảm, nên insert cho mảng đã sắp
+    return np.insert(first_sa, lo, second_sa)
+
+
+def count_overlapping(text: str, word: str) -> int:
+    """
+    Số lần word xuất hiện trong text, tính cả các lần chồng lên nhau ('ああ' trong 'あああ' là 2)
+
+    Cùng cách so khớp với suffix array (byte UTF-8, chỉ chữ ASCII không phân biệt hoa
+    thường), dùng cho các dòng chưa có trong index.
+    """
+    haystack = (text or '').encode('utf-8').lower()
+    needle = word.encode('utf-8').lower()
+    if not needle:
+        return 0
+    count, position = 0, haystack.find(needle)
+    while position != -1:
+        count += 1
+        position = haystack.find(needle, position + 1)
+    return count
+
+
+class SuffixArraySegment:
+    """Một segment đã mở, các mảng được memory-map"""
+
+    def __init__(self, directory: str, name: str):
+        _load_numpy()
+        self.name = name
+        path = os.path.join(directory, name)
+
+        self._file = open(path + ".text.bin", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.text = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        self.sa = np.load(path + ".sa.npy", mmap_mode='r')
+        self.offsets = np.load(path + ".offsets.npy", mmap_mode='r')
+        self.ids = np.load(path + ".ids.npy", mmap_mode='r')
+
+    @staticmethod
+    def write(directory: str, name: str, rows: List[Tuple[int, str]]):
+        """Build và ghi segment cho các dòng (id, text)"""
+        _load_numpy()
+        chunks = [(text or '').encode('utf-8').lower() + b'\0' for _, text in rows]
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(chunk) for chunk in chunks])
+        SuffixArraySegment.write_data(directory, name, b''.join(chunks), offsets,
+                                      np.array([subtitle_id for subtitle_id, _ in rows], dtype=np.int64))
+
+    @staticmethod
+    def write_data(directory: str, name: str, data: bytes, offsets: 'np.ndarray', ids: 'np.ndarray',
+                   sa: Optional['np.ndarray'] = None):
+        """Ghi segment cho text đã chuẩn hóa (build suffix array nếu chưa có)"""
+        if sa is None:
+            sa = build_suffix_array(data)
+        sa_dtype = np.int32 if len(data) < 2 ** 31 else np.int64
+
+        path = os.path.join(directory, name)
+        with open(path + ".text.bin", "wb") as f:
+            f.write(data)
+        np.save(path + ".sa.npy", sa.astype(sa_dtype))
+        np.save(path + ".offsets.npy", offsets)
+        np.save(path + ".ids.npy", ids)
+
+    @staticmethod
+    def merge(directory: str, name: str, first: 'SuffixArraySegment', second: 'SuffixArraySegment'):
+        """Ghi segment mới chứa các dòng của hai segment liền nhau (first có id nhỏ hơn)"""
+        data = bytes(first.text) + bytes(second.text)
+        shift = len(first.text)
+        offsets = np.concatenate([first.offsets[:-1], second.offsets + shift])
+        ids = np.concatenate([first.ids, second.ids])
+        sa = merge_suffix_arrays(data, first.sa, second.sa, shift)
+        SuffixArraySegment.write_data(directory, name, data, offsets, ids, sa)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.ids)
+
+    def _prefix(self, i: int, m: int) -> bytes:
+        start = int(self.sa[i])
+        return self.text[start:start + m]
+
+    def _lower_bound(self, pattern: bytes) -> int:
+        """Vị trí đầu tiên có suffix >= pattern (so sánh m byte đầu)"""
+        lo, hi, m = 0, len(self.sa), len(pattern)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._prefix(mid, m) < pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _upper_bound(self, pattern: bytes, lo: int) -> int:
+        """Vị trí đầu tiên sau lo có m byte đầu > pattern"""
+        hi, m = len(self.sa), len(pattern)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._prefix(mid, m) <= pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def count(self, pattern: bytes) -> int:
+        lo = self._lower_bound(pattern)
+        return self._upper_bound(pattern, lo) - lo
+
+    def locate(self, pattern: bytes, limit: int) -> List[Tuple[int, int]]:
+        """
+        Tối đa limit vị trí khớp: [(subtitle_id, byte offset trong dòng), ...]
+
+        Các suffix khớp nằm liền nhau trong suffix array, giữa cận dưới và cận trên.
+        """
+        lo = self._lower_bound(pattern)
+        hi = self._upper_bound(pattern, lo)
+        positions = self.sa[lo:min(hi, lo + limit)].tolist()
+        if not positions:
+            return []
+
+        rows = np.searchsorted(self.offsets, positions, side='right') - 1
+        return [(int(self.ids[row]), position - int(self.offsets[row]))
+                for row, position in zip(rows.tolist(), positions)]
+
+    def close(self):
+        if isinstance(self.text, mmap.mmap):
+            self.text.close()
+        self._file.close()
+
+
+class SuffixArrayIndex:
+    """Suffix array index nhiều segment, cập nhật tăng dần theo subtitles.id"""
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR):
+        self.directory = directory
+        self.manifest = {'version': INDEX_VERSION, 'last_id': 0, 'segments': [], 'next_segment': 0,
+                         'retired': []}
+        self.segments: List[SuffixArraySegment] = []
+        self._lock = _directory_lock(directory)
+        self._load()
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, "manifest.json")
+
+    def _load(self):
+        """Đọc manifest; mở lại segment nếu một instance khác đã cập nhật index"""
+        if not os.path.exists(self._manifest_path()):
+            return
+        with open(self._manifest_path(), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get('version') != INDEX_VERSION:
+            print(f"⚠ Suffix index version {manifest.get('version')} không được hỗ trợ, sẽ build lại")
+            return
+        manifest.setdefault('retired', [])
+        if manifest == self.manifest:
+            return
+
+        segments = []
+        try:
+            for name in manifest['segments']:
+                segments.append(SuffixArraySegment(self.directory, name))
+        except OSError:
+            # Manifest đã đọc cũ hơn file trên đĩa (đã gộp và xóa): giữ segment đang mở
+            for segment in segments:
+                segment.close()
+            return
+
+        self.close()
+        self.manifest = manifest
+        self.segments = segments
+
+    def _save_manifest(self):
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _new_segment_name(self) -> str:
+        name = f"seg{self.manifest['next_segment']:06d}"
+        self.manifest['next_segment'] += 1
+        return name
+
+    @property
+    def last_id(self) -> int:
+        """subtitles.id lớn nhất đã có trong index (các dòng sau đó phải tìm bằng SQL)"""
+        return self.manifest['last_id']
+
+    def reload(self):
+        """Mở lại các segment nếu index đã được cập nhật (vd. bởi downloader), không build gì"""
+        with self._lock:
+            self._load()
+
+    def update(self, db_name: str) -> int:
+        """Thêm segment cho các subtitle mới; gộp segment nếu quá nhiều. Trả về số dòng mới."""
+        with self._lock:
+            self._load()
+            return self._update(db_name)
+
+    def _update(self, db_name: str) -> int:
+        self._remove_retired()
+
+        conn = sqlite3.connect(db_name)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, japanese_text FROM subtitles WHERE id > ? ORDER BY id",
+                       (self.manifest['last_id'],))
+        rows = cursor.fetchall()
+        conn.close()
+
+        if not rows:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = self._new_segment_name()
+        SuffixArraySegment.write(self.directory, name, rows)
+        self.segments.append(SuffixArraySegment(self.directory, name))
+        self.manifest['segments'].append(name)
+        self.manifest['last_id'] = rows[-1][0]
+        self._save_manifest()
+
+        while len(self.segments) > MAX_SEGMENTS:
+            self._merge_smallest_pair()
+        return len(rows)
+
+    def _merge_smallest_pair(self):
+        """Gộp hai segment liền nhau có tổng số dòng nhỏ nhất (giữ thứ tự theo id)"""
+        sizes = [segment.row_count for segment in self.segments]
+        i = min(range(len(sizes) - 1), key=lambda k: sizes[k] + sizes[k + 1])
+        first, second = self.segments[i], self.segments[i + 1]
+
+        name = self._new_segment_name()
+        SuffixArraySegment.merge(self.directory, name, first, second)
+        self.segments[i:i + 2] = [SuffixArraySegment(self.directory, name)]
+        self.manifest['segments'][i:i + 2] = [name]
+        # File của hai segment cũ được xóa ở lần cập nhật sau (process khác có thể đang đọc)
+        self.manifest['retired'].extend([first.name, second.name])
+        self._save_manifest()
+        first.close()
+        second.close()
+
+    def _remove_retired(self):
+        """Xóa file của các segment đã gộp; segment còn bị process khác mở được thử lại lần sau"""
+        remaining = []
+        for name in self.manifest['retired']:
+            for suffix in SEGMENT_FILES:
+                path = os.path.join(self.directory, name + suffix)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    remaining.append(name)
+                    break
+        if remaining != self.manifest['retired']:
+            self.manifest['retired'] = remaining
+            self._save_manifest()
+
+    def count(self, word: str) -> int:
+        """Số lần xuất hiện của word trong các dòng đã index (tính cả các lần chồng lên nhau)"""
+        pattern = word.encode('utf-8').lower()
+        if not pattern:
+            return 0
+        with self._lock:
+            return sum(segment.count(pattern) for segment in self.segments)
+
+    def locate(self, word: str, limit: int = 100) -> List[Tuple[int, int]]:
+        """Vị trí xuất hiện của word: [(subtitle_id, byte offset trong dòng UTF-8), ...]"""
+        pattern = word.encode('utf-8').lower()
+        if not pattern:
+            return []
+
+        positions = []
+        with self._lock:
+            for segment in self.segments:
+                positions.extend(segment.locate(pattern, limit - len(positions)))
+                if len(positions) >= limit:
+                    break
+        return positions
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
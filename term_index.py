@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Term Frequency Index
+Bảng tần suất từ (term -> số dòng chứa term) xây lúc ingest, cho gợi ý theo tiền tố khi gõ
+
+Tiếng Nhật không có khoảng trắng nên term được tách theo loại chữ: cụm kanji
+(kèm tối đa OKURIGANA_LENGTH ký tự hiragana đi sau, vd. 食べる), cụm katakana,
+cụm hiragana ngắn, từ Latin / số. Gợi ý chỉ đọc bảng term_frequencies qua
+PRIMARY KEY (term), không chạm tới bảng subtitles.
+"""
+
+import sqlite3
+import unicodedata
+from collections import Counter
+from typing import List, Set, Tuple
+
+# Số ký tự hiragana tối đa ghép sau cụm kanji (okurigana)
+OKURIGANA_LENGTH = 2
+# Cụm hiragana dài hơn thường là cả câu (trợ từ dính liền), không dùng làm term
+MAX_HIRAGANA_TERM = 10
+# Ký tự lớn nhất của Unicode: cận trên cho truy vấn tiền tố (term < prefix + MAX_CHAR)
+_MAX_CHAR = '\U0010ffff'
+
+
+def _script(ch: str) -> str:
+    """Loại chữ của một ký tự: kanji, hiragana, katakana, latin (chữ / số), other"""
+    if ch == '々' or '一' <= ch <= '鿿' or '㐀' <= ch <= '䶿':
+        return 'kanji'
+    if 'ぁ' <= ch <= 'ゟ':
+        return 'hiragana'
+    if 'ァ' <= ch <= 'ヿ':  # Gồm cả ー
+        return 'katakana'
+    if ch.isalnum():
+        return 'latin'
+    return 'other'
+
+
+def _runs(text: str) -> List[Tuple[str, str]]:
+    """Tách text thành các cụm liên tiếp cùng loại chữ: [(loại, cụm), ...]"""
+    runs: List[Tuple[str, str]] = []
+    for ch in text:
+        script = _script(ch)
+        if runs and runs[-1][0] == script:
+            runs[-1] = (script, runs[-1][1] + ch)
+        else:
+            runs.append((script, ch))
+    return runs
+
+
+def extract_terms(text: str) -> Set[str]:
+    """Tập term của một dòng subtitle (NFKC, chữ Latin viết thường)"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    runs = _runs(text)
+    terms: Set[str] = set()
+
+    for i, (script, run) in enumerate(runs):
+        if script == 'kanji':
+            terms.add(run)
+            if i + 1 < len(runs) and runs[i + 1][0] == 'hiragana':
+                okurigana = runs[i + 1][1]
+                for length in range(1, min(OKURIGANA_LENGTH, len(okurigana)) + 1):
+                    terms.add(run + okurigana[:length])
+        elif script == 'katakana' and run != 'ー':
+            terms.add(run)
+        elif script == 'hiragana':
+            # Hiragana ngay sau kanji là okurigana, đã được ghép ở trên
+            if (i == 0 or runs[i - 1][0] != 'kanji') and 2 <= len(run) <= MAX_HIRAGANA_TERM:
+                terms.add(run)
+        elif script == 'latin' and len(run) >= 2:
+            terms.add(run)
+    return terms
+
+
+class TermFrequencyIndex:
+    """Bảng term_frequencies của database, cập nhật tăng dần theo subtitles.id"""
+
+    STATE_NAME = "term_frequencies"
+
+    def __init__(self, db_name: str = "japanese_subtitles.db"):
+        self.db_name = db_name
+
+    def ensure_tables(self, conn: sqlite3.Connection):
+        """Tạo bảng tần suất và bảng trạng thái nếu chưa có"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS term_frequencies (
+                term TEXT PRIMARY KEY,
+                frequency INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_index_state (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL
+            )
+        ''')
+
+    def update(self, batch_size: int = 5000) -> int:
+        """Cộng tần suất term của các subtitle mới (id lớn hơn lần trước). Trả về số dòng đã xử lý."""
+        conn = sqlite3.connect(self.db_name)
+        self.ensure_tables(conn)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT last_id FROM search_index_state WHERE name = ?", (self.STATE_NAME,))
+        row = cursor.fetchone()
+        last_id = row[0] if row else 0
+        processed = 0
+
+        while True:
+            cursor.execute('''
+                SELECT id, japanese_text FROM subtitles
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            # Đếm số dòng chứa term (mỗi dòng tính một lần)
+            counts = Counter(term for _, text in rows for term in extract_terms(text))
+            conn.executemany('''
+                INSERT INTO term_frequencies (term, frequency) VALUES (?, ?)
+                ON CONFLICT (term) DO UPDATE SET frequency = frequency + excluded.frequency
+            ''', counts.items())
+            last_id = rows[-1][0]
+            conn.execute("INSERT OR REPLACE INTO search_index_state (name, last_id) VALUES (?, ?)",
+                         (self.STATE_NAME, last_id))
+            conn.commit()
+            processed += len(rows)
+
+        conn.close()
+        return processed
+
+    def suggest(self, prefix: str, limit: int = 8,
+                conn: sqlite3.Connection = None) -> List[Tuple[str, int]]:
+        """
+        Các term bắt đầu bằng prefix, nhiều dòng chứa nhất trước: [(term, số dòng), ...]
+
+        Khoảng [prefix, prefix + MAX_CHAR) được tìm trên PRIMARY KEY (term), chỉ các
+        term trong khoảng đó được sắp xếp theo tần suất.
+        """
+        prefix = unicodedata.normalize('NFKC', prefix or '').strip().lower()
+        if not prefix:
+            return []
+
+        own_connection = conn is None
+        if own_connection:
+            conn = sqlite3.connect(self.db_name)
+        try:
+            rows = conn.execute('''
+                SELECT term, frequency FROM term_frequencies
+                WHERE term >= ? AND term < ?
+                ORDER BY frequency DESC, term
+                LIMIT ?
+            ''', (prefix, prefix + _MAX_CHAR, limit)).fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # Bảng chưa được tạo (database chưa ingest từ phiên bản này)
+        if own_connection:
+            conn.close()
+        return rows
@@ -0,0 +1,49 @@
+import os
+import random
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from get_subtitle import YouTubeSubtitleDownloader  # noqa: E402
+from subtitle_search_player import SubtitleSearchPlayer  # noqa: E402
+
+WORDS = ['ありがとう', '食べる', '気持ち', '先生', '学校', '今日は', 'いい天気', 'ですね',
+         '行きます', 'ても', 'いい', 'ながら', '勉強', '日本語', 'カタカナ', 'Hello', 'ああ']
+
+
+def insert_subtitles(db_name, videos=12, lines=40, seed=1, first_video=0):
+    """Fill the subtitles table with random lines built from WORDS"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_name)
+    for v in range(first_video, first_video + videos):
+        video_id = f"video{v:06d}"
+        for i in range(lines):
+            text = ''.join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+            conn.execute("""
+                INSERT OR IGNORE INTO subtitles
+                (video_id, video_url, japanese_text, start_time, end_time, duration, sequence_number)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (video_id, f"https://www.youtube.com/watch?v={video_id}", text, i * 2.5, i * 2.5 + 2, 2.0, i))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def db_name(tmp_path):
+    path = str(tmp_path / "subtitles.db")
+    YouTubeSubtitleDownloader(path)
+    insert_subtitles(path)
+    return path
+
+
+@pytest.fixture
+def player(db_name, tmp_path):
+    player = SubtitleSearchPlayer(db_name,
+                                  snapshot_dir=str(tmp_path / "corpus_snapshot"),
+                                  suffix_index_dir=str(tmp_path / "suffix_index"),
+                                  similarity_dir=str(tmp_path / "similarity_index"))
+    yield player
+    player.close()
@@ -0,0 +1,36 @@
+import json
+import os
+
+from audio_cache import INDEX_FILE, SegmentCache, segment_key
+
+
+def make_cache(directory, keys):
+    """Cache directory holding one small segment file per key, oldest first"""
+    os.makedirs(directory, exist_ok=True)
+    for key in keys:
+        with open(os.path.join(directory, f"{key}.mp3"), "wb") as f:
+            f.write(b"x" * 10)
+    with open(os.path.join(directory, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump([[key, 10] for key in keys], f)
+    return SegmentCache(directory)
+
+
+def saved_keys(directory):
+    with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as f:
+        return [key for key, size in json.load(f)]
+
+
+def test_hits_reorder_in_memory_and_persist_on_close(tmp_path):
+    directory = str(tmp_path / "audio_cache")
+    first, second = segment_key('video000000', 0, 2), segment_key('video000001', 0, 2)
+    cache = make_cache(directory, [first, second])
+    mtime = os.stat(os.path.join(directory, INDEX_FILE)).st_mtime_ns
+
+    assert cache.get('video000000', 0, 2)
+    assert list(cache.entries) == [second, first]
+    assert os.stat(os.path.join(directory, INDEX_FILE)).st_mtime_ns == mtime
+    assert saved_keys(directory) == [first, second]
+
+    cache.close()
+    assert saved_keys(directory) == [second, first]
+    assert list(SegmentCache(directory).entries) == [second, first]
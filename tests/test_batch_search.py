@@ -0,0 +1,23 @@
+import sqlite3
+
+from batch_search import AhoCorasick, BatchSearcher
+
+
+def test_automaton_reports_overlapping_terms():
+    automaton = AhoCorasick(['いい', 'いい天気', '天気'])
+    matches = sorted(automaton.terms[i] for i in automaton.iter_matches('今日はいい天気'))
+    assert matches == ['いい', 'いい天気', '天気']
+
+
+def test_batch_counts_match_like(db_name):
+    terms = ['いい', '先生', 'ても', 'hello', 'ありがとう', '存在しない']
+    results = BatchSearcher(db_name, workers=2).search(terms, top_k=3)
+
+    conn = sqlite3.connect(db_name)
+    for term in terms:
+        expected = conn.execute("SELECT COUNT(*) FROM subtitles WHERE japanese_text LIKE ?",
+                                (f'%{term}%',)).fetchone()[0]
+        assert results[term]['count'] == expected, term
+        assert len(results[term]['hits']) == min(3, expected)
+        assert all(term.lower() in hit[3].lower() for hit in results[term]['hits'])
+    conn.close()
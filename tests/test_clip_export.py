@@ -0,0 +1,127 @@
+import csv
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+from clip_export import ClipExporter, LocalMediaSource, clip_filename, write_anki_manifest, write_csv_manifest
+
+FAKE_FFMPEG = """#!{python}
+import sys
+args = sys.argv[1:]
+media = args[args.index('-i') + 1]
+with open(media, encoding='utf-8') as f:
+    content = f.read()
+if 'broken' in content:
+    sys.stderr.write('Invalid data found when processing input')
+    sys.exit(1)
+with open(args[-1], 'w', encoding='utf-8') as f:
+    f.write(' '.join([content, args[args.index('-ss') + 1], args[args.index('-t') + 1]]))
+"""
+
+
+@pytest.fixture
+def ffmpeg(tmp_path):
+    """Stand-in for ffmpeg: writes the media content and the requested range into the clip"""
+    if os.name == 'nt':
+        pytest.skip("the fake ffmpeg is a script with a shebang line")
+    path = tmp_path / "ffmpeg"
+    path.write_text(FAKE_FFMPEG.format(python=sys.executable), encoding='utf-8')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+@pytest.fixture
+def media_dir(tmp_path):
+    directory = tmp_path / "media"
+    directory.mkdir()
+    (directory / "video000000.m4a").write_text("audio0", encoding='utf-8')
+    (directory / "video000001.webm").write_text("audio1", encoding='utf-8')
+    (directory / "video000002.m4a").write_text("broken", encoding='utf-8')
+    return str(directory)
+
+
+def results_for(player, videos):
+    return [result for result in player.search_word_in_subtitles('いい', limit=1000)
+            if result['video_id'] in videos]
+
+
+def test_export_writes_clips_and_manifest(player, ffmpeg, media_dir, tmp_path):
+    results = results_for(player, ('video000000', 'video000001', 'video000002', 'video000003'))
+    output = tmp_path / "clips"
+    records = ClipExporter(LocalMediaSource(media_dir), output_dir=str(output), workers=3,
+                           padding=0.5, ffmpeg=ffmpeg).export(results)
+
+    assert [(r['video_id'], r['start_time']) for r in records] == [(r['video_id'], r['start_time']) for r in results]
+    for record in records:
+        if record['video_id'] in ('video000000', 'video000001'):
+            assert record['error'] is None
+            assert record['clip'] == clip_filename(record, 'mp3')
+            content, start, duration = (output / record['clip']).read_text(encoding='utf-8').split()
+            assert content == 'audio' + record['video_id'][-1]
+            assert float(start) == pytest.approx(max(0.0, record['start_time'] - 0.5), abs=1e-3)
+            assert float(duration) == pytest.approx(record['end_time'] + 0.5 - float(start), abs=1e-3)
+        else:
+            # video000002: ffmpeg fails, video000003: no media file
+            assert record['clip'] is None and record['error']
+    assert not list(output.glob("*.part"))
+
+    manifest = output / "manifest.csv"
+    write_csv_manifest(records, str(manifest))
+    with open(manifest, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == 'clip'
+    assert [row[0] for row in rows[1:]] == [r['clip'] for r in records if r['clip']]
+
+    anki = output / "anki.txt"
+    write_anki_manifest(records, str(anki))
+    lines = anki.read_text(encoding='utf-8').splitlines()
+    assert len([line for line in lines if not line.startswith('#')]) == len(rows) - 1
+
+
+def test_existing_clips_are_skipped(player, ffmpeg, media_dir, tmp_path):
+    results = results_for(player, ('video000000',))
+    output = tmp_path / "clips"
+    exporter = ClipExporter(LocalMediaSource(media_dir), output_dir=str(output), ffmpeg=ffmpeg)
+    exporter.export(results)
+
+    class CountingSource(LocalMediaSource):
+        calls = 0
+
+        def resolve(self, video_id, video_url):
+            CountingSource.calls += 1
+            return super().resolve(video_id, video_url)
+
+    records = ClipExporter(CountingSource(media_dir), output_dir=str(output), ffmpeg=ffmpeg).export(results)
+    assert CountingSource.calls == 0
+    assert all(record['clip'] for record in records)
+
+
+def test_videos_are_resolved_concurrently(player, ffmpeg, media_dir, tmp_path):
+    results = results_for(player, ('video000000', 'video000001'))
+    # Both resolves must be running at the same time to pass the barrier
+    barrier = threading.Barrier(2)
+
+    class SlowSource(LocalMediaSource):
+        def resolve(self, video_id, video_url):
+            barrier.wait(timeout=5)
+            return super().resolve(video_id, video_url)
+
+    records = ClipExporter(SlowSource(media_dir), output_dir=str(tmp_path / "clips"),
+                           ffmpeg=ffmpeg).export(results)
+    assert all(record['clip'] for record in records)
+
+
+@pytest.mark.parametrize('anki', [False, True])
+def test_player_export_uses_the_media_dir(player, ffmpeg, media_dir, tmp_path, monkeypatch, anki):
+    monkeypatch.setenv('PATH', os.path.dirname(ffmpeg) + os.pathsep + os.environ.get('PATH', ''))
+    results = results_for(player, ('video000000', 'video000001'))
+
+    manifest = player.export_clips(results, output_dir=str(tmp_path / "out"), anki=anki, media_dir=media_dir)
+
+    assert os.path.basename(manifest) == ("anki.txt" if anki else "manifest.csv")
+    text = open(manifest, encoding='utf-8').read()
+    for result in results:
+        assert clip_filename(result, 'mp3') in text
@@ -0,0 +1,37 @@
+import sqlite3
+
+
+def window(db_name, video_id, target_time, seconds):
+    conn = sqlite3.connect(db_name)
+    rows = conn.execute("""
+        SELECT japanese_text, start_time FROM subtitles
+        WHERE video_id = ? AND start_time BETWEEN ? AND ?
+        ORDER BY start_time
+    """, (video_id, target_time - seconds, target_time + seconds)).fetchall()
+    conn.close()
+    return rows
+
+
+def test_contexts_follow_target_order_and_window(player, db_name):
+    targets = [('video000003', 20.0), ('video000000', 0.0), ('video000003', 20.0), ('video000011', 97.5)]
+    contexts = player.get_contexts(targets, context_seconds=5)
+
+    assert len(contexts) == len(targets)
+    for (video_id, target_time), context in zip(targets, contexts):
+        assert [(item['text'], item['start_time']) for item in context] == window(db_name, video_id, target_time, 5)
+        assert [item['start_time'] for item in context if item['is_target']] == [target_time]
+
+
+def test_contexts_across_chunks_match_single_lookups(player):
+    targets = [(f"video{v:06d}", i * 2.5) for v in range(12) for i in range(40)]
+    assert len(targets) > 300
+
+    contexts = player.get_contexts(targets, context_seconds=3)
+    assert contexts[0] == player.get_video_context(*targets[0], context_seconds=3)
+    assert contexts[-1] == player.get_video_context(*targets[-1], context_seconds=3)
+    assert contexts[301] == player.get_video_context(*targets[301], context_seconds=3)
+
+
+def test_unknown_video_has_empty_context(player):
+    assert player.get_contexts([('missing', 1.0)]) == [[]]
+    assert player.get_contexts([]) == []
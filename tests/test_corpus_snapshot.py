@@ -0,0 +1,85 @@
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from corpus_snapshot import CURRENT_FILE, CorpusSnapshot, current_version, export_snapshot  # noqa: E402
+
+
+def like_rows(db_name, word):
+    conn = sqlite3.connect(db_name)
+    rows = conn.execute("""
+        SELECT video_id, start_time FROM subtitles
+        WHERE japanese_text LIKE ? ORDER BY video_id, start_time
+    """, (f'%{word}%',)).fetchall()
+    conn.close()
+    return rows
+
+
+def test_export_switches_versions_without_touching_the_open_one(player, db_name, tmp_path):
+    directory = player.snapshot_dir
+    export_snapshot(db_name, directory)
+    first = current_version(directory)
+    opened = player.get_snapshot()
+    assert opened is not None and opened.version == first
+
+    conn = sqlite3.connect(db_name)
+    conn.execute("""
+        INSERT INTO subtitles (video_id, video_url, japanese_text, start_time, end_time, duration, sequence_number)
+        VALUES ('video999999', 'https://www.youtube.com/watch?v=video999999', '先生です', 0, 1, 1, 0)
+    """)
+    conn.commit()
+    conn.close()
+    assert player.get_snapshot() is None  # Stale: the SQL path is used
+
+    export_snapshot(db_name, directory)
+    second = current_version(directory)
+    assert second != first
+    with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+        assert f.read() == second
+    assert sorted(os.listdir(directory)) == sorted([CURRENT_FILE, second])
+
+    snapshot = player.get_snapshot()
+    assert snapshot is not None and snapshot.version == second
+    results = player.search_word_in_subtitles('先生', limit=10000)
+    assert [(r['video_id'], r['start_time']) for r in results] == like_rows(db_name, '先生')
+
+
+def test_edits_and_deletes_make_the_snapshot_stale(player, db_name):
+    export_snapshot(db_name, player.snapshot_dir)
+    assert player.get_snapshot() is not None
+
+    conn = sqlite3.connect(db_name)
+    conn.execute("UPDATE subtitles SET japanese_text = '書き換え' WHERE id = 5")
+    conn.commit()
+    assert player.get_snapshot() is None
+
+    export_snapshot(db_name, player.snapshot_dir)
+    assert player.get_snapshot() is not None
+    conn.execute("DELETE FROM subtitles WHERE id = 7")
+    conn.commit()
+    conn.close()
+    assert player.get_snapshot() is None
+
+    # Readings are not part of the snapshot
+    export_snapshot(db_name, player.snapshot_dir)
+    conn = sqlite3.connect(db_name)
+    conn.execute("UPDATE subtitles SET reading = 'よみ', reading_version = 0")
+    conn.commit()
+    conn.close()
+    assert player.get_snapshot() is not None
+
+
+def test_reexport_at_the_same_max_id_uses_a_new_directory(db_name, tmp_path):
+    directory = str(tmp_path / "snapshot")
+    export_snapshot(db_name, directory)
+    first = current_version(directory)
+    snapshot = CorpusSnapshot.open(directory)
+
+    export_snapshot(db_name, directory)
+    second = current_version(directory)
+    assert second != first
+    assert snapshot.text_at(0) == CorpusSnapshot.open(directory).text_at(0)
+    snapshot.close()
@@ -0,0 +1,32 @@
+import sqlite3
+
+import pytest
+
+from conftest import insert_subtitles
+
+
+def test_fuzzy_needs_a_built_index(player, db_name):
+    with pytest.raises(RuntimeError, match='--build-index'):
+        player.search_fuzzy('ありがとお')
+
+    # The query path must not have built the index
+    conn = sqlite3.connect(db_name)
+    assert player.ngram_index.last_indexed_id(conn) is None
+    conn.close()
+
+
+def test_fuzzy_reports_a_stale_index(player, db_name):
+    player.build_search_indexes()
+    insert_subtitles(db_name, videos=1, seed=9, first_video=90)
+    with pytest.raises(RuntimeError, match='--build-index'):
+        player.search_fuzzy('ありがとお')
+
+    player.build_search_indexes()
+    assert player.search_fuzzy('ありがとお', limit=5)
+
+
+def test_fuzzy_finds_one_edit_matches(player):
+    player.build_search_indexes()
+    results = player.search_fuzzy('ありがとお', max_distance=1, limit=20)
+    assert results
+    assert all(result['distance'] == 1 and 'ありがと' in result['japanese_text'] for result in results)
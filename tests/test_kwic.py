@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+
+def check_entries(entries, word, width):
+    for entry in entries:
+        text, offset = entry['japanese_text'], entry['offset']
+        assert entry['keyword'].lower() == word.lower()
+        assert entry['left'] == text[max(0, offset - width):offset]
+        assert entry['right'] == text[offset + len(word):offset + len(word) + width]
+
+
+@pytest.mark.parametrize('word', ['いい', '先生', 'hello'])
+def test_kwic_slices_every_occurrence(player, word):
+    entries = player.kwic(word, limit=100000, width=4)
+    assert len(entries) == player.count_occurrences(word) > 0
+    check_entries(entries, word, 4)
+
+
+def test_kwic_from_suffix_index_is_sorted_by_right_context(player):
+    pytest.importorskip("numpy")
+    expected = sorted((e['id'], e['offset']) for e in player.kwic('いい', limit=100000))
+    player.build_suffix_index()
+
+    entries = player.kwic('いい', limit=100000, width=6)
+    assert sorted((e['id'], e['offset']) for e in entries) == expected
+    check_entries(entries, 'いい', 6)
+    rights = [e['right'] for e in entries if len(e['right']) == 6]
+    assert rights == sorted(rights)
+
+
+def test_kwic_lines_align_the_keyword(player):
+    entries = player.kwic('先生', limit=50, width=5)
+    columns = set()
+    for entry in entries:
+        line = player.format_kwic_line(entry, width=5, highlight=False)
+        assert f"【{entry['keyword']}】" in line
+        columns.add(player._display_width(line[:line.index('【')]))
+    assert len(columns) == 1
+
+
+def test_kwic_jsonl_export(player, tmp_path):
+    entries = player.kwic('いい', limit=10)
+    output = tmp_path / "kwic.jsonl"
+    player.export_kwic_jsonl(entries, str(output))
+
+    lines = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert [(line['id'], line['offset'], line['left'], line['right']) for line in lines] == \
+        [(e['id'], e['offset'], e['left'], e['right']) for e in entries]
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from near_duplicates import DuplicateIndex
+
+
+def table_names(db_name):
+    conn = sqlite3.connect(db_name)
+    names = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    return names
+
+
+def test_tables_are_created_with_the_database(db_name):
+    assert {'video_signatures', 'video_lsh', 'window_signatures', 'window_lsh'} <= table_names(db_name)
+
+
+def test_stats_do_not_create_tables(player, db_name):
+    conn = sqlite3.connect(db_name)
+    for table in ('video_signatures', 'video_lsh', 'window_signatures', 'window_lsh'):
+        conn.execute(f"DROP TABLE {table}")
+    conn.commit()
+    conn.close()
+
+    stats = player.database_stats()
+    index = DuplicateIndex(db_name)
+
+    assert stats['near_duplicate_videos'] == 0
+    assert index.skipped_as_duplicate('video000001') is None
+    assert index.find_duplicate_video('video000001', [0] * 64) is None
+    assert 'video_signatures' not in table_names(db_name)
+
+
+def mark_copies(db_name):
+    """Make every line of video000001 a near-duplicate copy of the same line in video000000"""
+    conn = sqlite3.connect(db_name)
+    conn.execute("""
+        UPDATE subtitles SET duplicate_group = (
+            SELECT original.id FROM subtitles AS original
+            WHERE original.video_id = 'video000000'
+              AND original.sequence_number = subtitles.sequence_number)
+        WHERE video_id = 'video000001'
+    """)
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize('use_snapshot', [False, True])
+def test_streamed_collapse_matches_search(player, db_name, use_snapshot):
+    mark_copies(db_name)
+    if use_snapshot:
+        pytest.importorskip("numpy")
+        from corpus_snapshot import export_snapshot
+        export_snapshot(db_name, player.snapshot_dir)
+        assert player.get_snapshot() is not None
+
+    for word, limit in (('いい', 1000), ('先生', 1000), ('いい', 25)):
+        expected = player.search_word_in_subtitles(word, limit=limit, collapse_duplicates=True)
+        streamed = [result for batch in player.iter_search_word(word, limit=limit, collapse_duplicates=True)
+                    for result in batch]
+
+        key = lambda r: (r['video_id'], r['start_time'], r['duplicate_count'])
+        assert [key(r) for r in streamed] == [key(r) for r in expected]
+        assert any(r['duplicate_count'] > 1 for r in streamed)
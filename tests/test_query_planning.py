@@ -0,0 +1,35 @@
+import sqlite3
+
+
+def test_char_length_is_filled_for_every_insert(db_name):
+    conn = sqlite3.connect(db_name)
+    # Written without char_length, as an older tool would
+    conn.execute("""
+        INSERT INTO subtitles (video_id, video_url, japanese_text, start_time, end_time, duration, sequence_number)
+        VALUES ('other', 'https://www.youtube.com/watch?v=other', 'ありがとう先生', 0, 1, 1, 0)
+    """)
+    conn.commit()
+    mismatched = conn.execute(
+        "SELECT COUNT(*) FROM subtitles WHERE char_length IS NOT LENGTH(japanese_text)").fetchone()[0]
+    conn.close()
+    assert mismatched == 0
+
+
+def test_advanced_search_matches_length_filter(player, db_name):
+    filters = {'min_duration': 1, 'max_duration': 5, 'exclude_short': True}
+    results = player.advanced_search('いい', filters)
+
+    conn = sqlite3.connect(db_name)
+    expected = conn.execute("""
+        SELECT COUNT(*) FROM subtitles
+        WHERE japanese_text LIKE '%いい%' AND duration BETWEEN 1 AND 5 AND LENGTH(japanese_text) > 5
+    """).fetchone()[0]
+    conn.close()
+    assert len(results) == min(expected, 50) > 0
+    assert all(len(result['japanese_text']) > 5 for result in results)
+
+
+def test_advanced_plan_uses_a_filter_index(player):
+    plans = player.explain_query_plans('いい')
+    advanced = ' '.join(next(lines for mode, lines in plans.items() if 'advanced' in mode))
+    assert 'idx_video_start_filter' in advanced or 'idx_duration_length' in advanced
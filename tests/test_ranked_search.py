@@ -0,0 +1,57 @@
+import sqlite3
+
+from conftest import insert_subtitles
+
+
+def collect_pages(player, word, limit, collapse_duplicates=False):
+    pages, cursor = [], None
+    while True:
+        results, cursor = player.search_ranked(word, limit=limit, after=cursor,
+                                               collapse_duplicates=collapse_duplicates)
+        pages.append(results)
+        if cursor is None:
+            return pages
+
+
+def test_pages_have_no_duplicates_or_gaps(player, db_name):
+    conn = sqlite3.connect(db_name)
+    expected = {row[0] for row in conn.execute(
+        "SELECT id FROM subtitles WHERE japanese_text LIKE '%いい%'")}
+    conn.close()
+
+    pages = collect_pages(player, 'いい', limit=7)
+    ids = [result['id'] for page in pages for result in page]
+
+    assert len(pages) > 2
+    assert all(len(page) == 7 for page in pages[:-1])
+    assert len(ids) == len(set(ids))
+    assert set(ids) == expected
+
+
+def test_pages_follow_score_order(player):
+    results = [result for page in collect_pages(player, 'いい', limit=5) for result in page]
+    keys = [(-result['score'], result['id']) for result in results]
+    assert keys == sorted(keys)
+
+
+def test_single_query_matches_paging(player):
+    everything, cursor = player.search_ranked('先生', limit=10000)
+    paged = [result['id'] for page in collect_pages(player, '先生', limit=3) for result in page]
+    assert cursor is None
+    assert [result['id'] for result in everything] == paged
+
+
+def test_collapsed_pages_have_no_duplicates(player):
+    pages = collect_pages(player, 'いい', limit=4, collapse_duplicates=True)
+    ids = [result['id'] for page in pages for result in page]
+    assert len(ids) == len(set(ids))
+    assert all(result['duplicate_count'] >= 1 for page in pages for result in page)
+
+
+def test_new_subtitles_invalidate_ranked_set(player, db_name):
+    before, _ = player.search_ranked('先生', limit=10000)
+    insert_subtitles(db_name, videos=1, lines=40, seed=7, first_video=100)
+
+    after, _ = player.search_ranked('先生', limit=10000)
+    assert len(after) > len(before)
+    assert {result['id'] for result in before} < {result['id'] for result in after}
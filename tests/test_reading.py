@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+import japanese_reading
+import subtitle_db
+from japanese_reading import katakana_to_hiragana, normalize_reading_query, romaji_to_hiragana
+
+
+@pytest.mark.parametrize('romaji, hiragana', [
+    ('taberu', 'たべる'),
+    ('TABERU', 'たべる'),
+    ('kitte', 'きって'),
+    ('chotto', 'ちょっと'),
+    ('matcha', 'まっちゃ'),
+    ('shinbun', 'しんぶん'),
+    ("kon'ya", 'こんや'),
+    ('konnichiha', 'こんにちは'),
+    ('sensei', 'せんせい'),
+    ('ryokou', 'りょこう'),
+    ('ra-men', 'らーめん'),
+    ('tsukue', 'つくえ'),
+    ('tomodachi', 'ともだち'),
+    ('n', 'ん'),
+])
+def test_romaji_to_hiragana(romaji, hiragana):
+    assert romaji_to_hiragana(romaji) == hiragana
+
+
+def test_kana_is_left_alone():
+    assert romaji_to_hiragana('オオカミ') == 'オオカミ'
+    assert katakana_to_hiragana('カタカナ') == 'かたかな'
+
+
+def test_normalize_reading_query():
+    assert normalize_reading_query(' taberu ') == 'たべる'
+    assert normalize_reading_query('タベル') == 'たべる'
+    assert normalize_reading_query('たべる') == 'たべる'
+
+
+def fake_analyzer(text):
+    """Stands in for pykakasi: knows how to read two kanji words"""
+    return katakana_to_hiragana(text.replace('食べる', 'たべる').replace('先生', 'せんせい')).lower()
+
+
+def test_outdated_readings_are_recomputed(player, db_name, monkeypatch):
+    # Rows were stored by an analyzer that keeps kanji unchanged
+    assert player.search_word_in_subtitles('taberu', by_reading=True) == []
+
+    monkeypatch.setattr(subtitle_db, 'READING_VERSION', 99)
+    monkeypatch.setattr(subtitle_db, 'to_reading', fake_analyzer)
+    player._readings_refreshed = False
+
+    results = player.search_word_in_subtitles('taberu', by_reading=True, limit=1000)
+    conn = sqlite3.connect(db_name)
+    expected = conn.execute("SELECT COUNT(*) FROM subtitles WHERE japanese_text LIKE '%食べる%'").fetchone()[0]
+    outdated = conn.execute("SELECT COUNT(*) FROM subtitles WHERE reading_version < 99").fetchone()[0]
+    conn.close()
+
+    assert expected > 0
+    assert len(results) == expected
+    assert all('食べる' in result['japanese_text'] for result in results)
+    assert outdated == 0
+
+
+def test_readings_are_checked_once_per_player(player, monkeypatch):
+    calls = []
+    monkeypatch.setattr('subtitle_search_player.refresh_readings',
+                        lambda conn, index: calls.append(index) or 0)
+    player._readings_refreshed = False
+    for word in ('せんせい', 'taberu', 'がっこう'):
+        player.search_word_in_subtitles(word, by_reading=True)
+    assert len(calls) == 1
+
+
+def test_refresh_uses_the_version_index(db_name):
+    conn = sqlite3.connect(db_name)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM subtitles WHERE reading_version < ? LIMIT 10",
+                        (1,)).fetchall()
+    conn.close()
+    assert 'idx_reading_version' in plan[0][3]
+
+
+def test_missing_analyzer_is_reported_once(player, monkeypatch, capsys):
+    monkeypatch.setattr(japanese_reading, 'PYKAKASI_AVAILABLE', False)
+    monkeypatch.setattr(japanese_reading, '_missing_analyzer_warned', False)
+    for word in ('たべる', 'sensei'):
+        player.search_word_in_subtitles(word, by_reading=True)
+    list(player.iter_search_word('たべる', by_reading=True))
+
+    assert capsys.readouterr().out.count('Chưa cài pykakasi') == 1
+
+
+def test_kanji_lines_match_their_kana_reading(player):
+    pytest.importorskip("pykakasi")
+    results = player.search_word_in_subtitles('たべる', by_reading=True, limit=1000)
+    assert results
+    assert any('食べる' in result['japanese_text'] for result in results)
+    assert player.search_word_in_subtitles('taberu', by_reading=True, limit=1000) == results
@@ -0,0 +1,87 @@
+import re
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from ngram_index import NgramIndex
+from query_control import CancelToken, SearchCancelled
+from regex_search import extract_required_literals, run_regex_search
+
+PATTERNS = ['ても(いい|良い)', '先生', '食べ.*ます', '(?:歩き)+ながら', 'ながら?', '(a|b)(c|d)',
+            '^日本語', 'x*', '[ぁ-ん]+', '(先生|[a-z]+)', 'い{2}']
+TEXTS = ['てもいいですか', 'ても良い', '先生が食べてます', '歩き歩きながら', 'なが', 'ac', 'bd',
+         '日本語の勉強', 'いい天気', 'ありがとう', 'hello', 'Hello']
+
+
+def test_plain_literal():
+    assert extract_required_literals('先生') == [{'先生'}]
+
+
+def test_alternation_is_expanded():
+    assert {'てもいい', 'ても良い'} in extract_required_literals('ても(いい|良い)')
+
+
+def test_wildcards_split_literals():
+    clauses = extract_required_literals('食べ.*ます')
+    assert {'食べ'} in clauses and {'ます'} in clauses
+    assert not any('食べます' in clause for clause in clauses)
+
+
+def test_optional_parts_are_not_required():
+    assert extract_required_literals('ながら?') == [{'なが'}]
+    assert extract_required_literals('x*') == []
+    assert extract_required_literals('[ぁ-ん]+') == []
+    # One branch has no literal, so neither branch can be required
+    assert extract_required_literals('(先生|[a-z]+)') == []
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_every_match_contains_each_clause(pattern):
+    clauses = extract_required_literals(pattern)
+    for text in TEXTS:
+        if re.search(pattern, text):
+            assert all(any(literal in text for literal in clause) for clause in clauses), text
+
+
+@pytest.mark.parametrize('pattern', ['ても(いい|良い)', '先生.*ですね', '(ありがとう|Hello)', 'いい天気$'])
+def test_candidate_filter_keeps_every_match(db_name, pattern):
+    NgramIndex(db_name).update()
+    conn = sqlite3.connect(db_name)
+    rows = conn.execute("SELECT japanese_text FROM subtitles").fetchall()
+    conn.close()
+
+    expected = sorted(text for text, in rows if re.search(pattern, text))
+    found = sorted(row[2] for row in run_regex_search(db_name, pattern, 0, len(rows)))
+    assert found == expected
+
+
+def test_search_needs_a_built_index(player):
+    with pytest.raises(RuntimeError, match='--build-index'):
+        player.search_regex('先生')
+
+    player.build_search_indexes()
+    assert player.search_regex('先生', limit=5)
+
+
+def test_cancel_stops_a_running_regex(player, db_name):
+    conn = sqlite3.connect(db_name)
+    conn.execute("""
+        INSERT INTO subtitles (video_id, video_url, japanese_text, start_time, end_time, duration, sequence_number)
+        VALUES ('slow', 'https://www.youtube.com/watch?v=slow', ?, 0, 1, 1, 0)
+    """, ('a' * 40 + '!b',))
+    conn.commit()
+    conn.close()
+    player.build_search_indexes()
+
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel).start()
+    started = time.monotonic()
+    with pytest.raises(SearchCancelled):
+        with player.cancellable(token):
+            player.search_regex('(a+)+b', timeout=30)
+    assert time.monotonic() - started < 5
+
+    # The worker was replaced, so the next search runs at once
+    assert player.search_regex('先生', limit=5)
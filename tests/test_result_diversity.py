@@ -0,0 +1,32 @@
+import sqlite3
+from collections import Counter
+
+
+def test_max_per_video_caps_each_video(player):
+    results = player.search_word_in_subtitles('いい', limit=1000, max_per_video=2)
+    per_video = Counter(result['video_id'] for result in results)
+
+    assert per_video and max(per_video.values()) == 2
+    keys = [(result['video_id'], result['start_time']) for result in results]
+    assert keys == sorted(keys)
+
+
+def test_max_per_video_keeps_earliest_lines(player, db_name):
+    conn = sqlite3.connect(db_name)
+    expected = []
+    for video_id, in conn.execute("SELECT DISTINCT video_id FROM subtitles ORDER BY video_id"):
+        expected += [(video_id, start_time) for start_time, in conn.execute("""
+            SELECT start_time FROM subtitles
+            WHERE video_id = ? AND japanese_text LIKE '%先生%'
+            ORDER BY start_time LIMIT 3
+        """, (video_id,))]
+    conn.close()
+
+    results = player.search_word_in_subtitles('先生', limit=1000, max_per_video=3)
+    assert [(result['video_id'], result['start_time']) for result in results] == expected
+
+
+def test_limit_applies_after_the_cap(player):
+    results = player.search_word_in_subtitles('いい', limit=5, max_per_video=1)
+    assert len(results) == 5
+    assert len({result['video_id'] for result in results}) == 5
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from subtitle_db import missing_schema
+from subtitle_search_player import SubtitleSearchPlayer
+
+
+def downgrade(db_name):
+    """Drop what a database created by an older version would not have"""
+    conn = sqlite3.connect(db_name)
+    conn.execute("DROP INDEX idx_duration_length")
+    conn.execute("DROP TRIGGER trg_subtitles_update_changes")
+    conn.commit()
+    conn.close()
+
+
+def schema_entries(db_name):
+    conn = sqlite3.connect(db_name)
+    entries = sorted(conn.execute("SELECT type, name, sql FROM sqlite_master"))
+    conn.close()
+    return entries
+
+
+def test_opening_a_player_does_not_migrate(db_name, capsys):
+    downgrade(db_name)
+    before = schema_entries(db_name)
+
+    SubtitleSearchPlayer(db_name).close()
+
+    assert schema_entries(db_name) == before
+    output = capsys.readouterr().out
+    assert 'idx_duration_length' in output and '--build-index' in output
+
+
+def test_build_index_migrates(player, db_name):
+    downgrade(db_name)
+    conn = sqlite3.connect(db_name)
+    assert missing_schema(conn) == ['trg_subtitles_update_changes', 'idx_duration_length']
+    conn.close()
+
+    player.build_search_indexes()
+
+    conn = sqlite3.connect(db_name)
+    assert missing_schema(conn) == []
+    conn.close()
+
+
+def test_downloader_import_skips_index_modules():
+    code = ("import sys, get_subtitle; print(sorted(m for m in ('ngram_index', 'suffix_index', "
+            "'similar_search', 'corpus_snapshot', 'term_index') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from query_control import CancelToken, SearchCancelled
+from search_client import RemoteSearchPlayer
+from search_server import SearchServer
+
+
+async def cancel_tasks():
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.fixture
+def server(db_name):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    server = SearchServer(db_name, port=port, workers=2)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.serve(), loop)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.02)
+    yield server
+    asyncio.run_coroutine_threadsafe(cancel_tasks(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    server.executor.shutdown(wait=False)
+    server.player.close()
+
+
+@pytest.fixture
+def client(server):
+    return RemoteSearchPlayer(f"http://127.0.0.1:{server.port}")
+
+
+def block_until_stopped(server, seen):
+    """Replace /count with a handler that only returns once its request is stopped"""
+    def count_occurrences(word):
+        while True:
+            try:
+                server.player._check_cancelled()
+            except (SearchCancelled, TimeoutError) as e:
+                seen.append(type(e))
+                raise
+            time.sleep(0.01)
+    server.player.count_occurrences = count_occurrences
+
+
+def test_client_matches_local_player(client, player):
+    assert client.count_occurrences('いい') == player.count_occurrences('いい')
+    assert sorted(client.locate_occurrences('先生', limit=50)) == sorted(player.locate_occurrences('先生', limit=50))
+    assert [r['id'] for r in client.kwic('先生', limit=5)] == [r['id'] for r in player.kwic('先生', limit=5)]
+    client.close()
+
+
+def test_cancel_stops_the_daemon_query(client, server):
+    seen = []
+    block_until_stopped(server, seen)
+    token = CancelToken(timeout=30)
+    errors = []
+
+    def search():
+        try:
+            with client.cancellable(token):
+                client.count_occurrences('いい')
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=search)
+    thread.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    token.cancel()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 2
+    assert [type(e) for e in errors] == [SearchCancelled]
+    for _ in range(100):
+        if seen:
+            break
+        time.sleep(0.02)
+    assert seen == [SearchCancelled]
+
+
+def test_token_deadline_is_sent_to_daemon(client, server):
+    seen = []
+    block_until_stopped(server, seen)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        with client.cancellable(CancelToken(timeout=0.3)):
+            client.count_occurrences('いい')
+    assert time.monotonic() - started < 2
+    assert seen == [TimeoutError]
+
+
+def test_client_import_stays_light():
+    code = ("import sys, search_client; "
+            "print(sorted(m for m in ('subtitle_search_player', 'numpy', 'corpus_snapshot') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
+
+
+def test_client_formats_results_like_the_player(client, player):
+    result = client.search_ranked('先生', limit=1)[0][0]
+    assert client.format_time(result['start_time']) == player.format_time(result['start_time'])
+    assert client.get_video_context(result['video_id'], result['start_time']) == \
+        player.get_video_context(result['video_id'], result['start_time'])
+
+
+def test_cache_is_dropped_when_rows_change(client, server, db_name):
+    before = client.count_occurrences('先生')
+    conn = sqlite3.connect(db_name)
+    conn.execute("DELETE FROM subtitles WHERE japanese_text LIKE '%先生%'")
+    conn.commit()
+    conn.close()
+    assert before > 0
+    assert client.count_occurrences('先生') == 0
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("scipy")
+
+from conftest import insert_subtitles  # noqa: E402
+from similar_search import SimilarityIndex, stored_max_id  # noqa: E402
+
+
+def test_similar_needs_a_built_index(player, tmp_path):
+    with pytest.raises(RuntimeError, match='--build-index'):
+        player.more_like_this('ありがとう先生')
+    assert not (tmp_path / "similarity_index").exists()
+
+
+def test_line_ranks_itself_first(player):
+    player.build_search_indexes()
+    for result in player.search_word_in_subtitles('気持ち', limit=5):
+        best = player.more_like_this(result['japanese_text'], limit=5)[0]
+        assert best['japanese_text'] == result['japanese_text']
+        assert best['similarity'] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_exclude_skips_the_source_line(player):
+    player.build_search_indexes()
+    source = player.more_like_this('ありがとう先生', limit=1)[0]
+    others = player.more_like_this(source['japanese_text'], limit=20, subtitle_id=source['id'])
+    assert source['id'] not in [result['id'] for result in others]
+
+
+def test_queries_reload_only_after_a_rebuild(player, db_name, monkeypatch):
+    player.build_search_indexes()
+    index = player.get_similarity_index()
+    monkeypatch.setattr(type(index), 'update', lambda *args: pytest.fail("update on the query path"))
+    player.more_like_this('先生')
+    assert player.get_similarity_index() is index
+
+    insert_subtitles(db_name, videos=1, seed=4, first_video=60)
+    monkeypatch.undo()
+    SimilarityIndex(player.similarity_dir).update(db_name)
+
+    reloaded = player.get_similarity_index()
+    assert reloaded is not index
+    assert reloaded.meta['max_id'] == stored_max_id(player.similarity_dir) > index.meta['max_id']
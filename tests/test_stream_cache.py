@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from stream_cache import StreamUrlCache, stream_expiry, video_id_from_url
+
+FORMAT = 'best[height<=720]'
+
+
+class CountingCache(StreamUrlCache):
+    """Resolves to a new URL on every call instead of running yt-dlp"""
+
+    def __init__(self, expire=None, delay=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.expire = expire
+        self.delay = delay
+
+    def resolve(self, video_url, stream_format):
+        self.resolves += 1
+        time.sleep(self.delay)
+        query = f"&expire={self.expire}" if self.expire else ""
+        return f"https://host.googlevideo.com/videoplayback?n={self.resolves}{query}"
+
+
+@pytest.mark.parametrize('url, expected', [
+    ("https://r1.googlevideo.com/videoplayback?expire=1760000000&ei=abc", 1760000000.0),
+    ("https://manifest.googlevideo.com/api/manifest/hls/expire/1760000123/ei/abc/file.m3u8",
+     1760000123.0),
+    ("https://example.com/video.mp4", None),
+    ("https://example.com/video.mp4?expire=soon", None),
+])
+def test_stream_expiry(url, expected):
+    assert stream_expiry(url) == expected
+
+
+@pytest.mark.parametrize('url, expected', [
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s", "dQw4w9WgXcQ"),
+    ("https://youtu.be/dQw4w9WgXcQ?t=10", "dQw4w9WgXcQ"),
+    ("https://www.youtube.com/shorts/dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://example.com/video.mp4", None),
+])
+def test_video_id_from_url(url, expected):
+    assert video_id_from_url(url) == expected
+
+
+def test_cached_until_expire_margin():
+    fresh = CountingCache(expire=int(time.time()) + 3600)
+    first = fresh.get('video1', 'url', FORMAT)
+    assert fresh.get('video1', 'url', FORMAT) == first
+    assert fresh.peek('video1', FORMAT) == first
+    assert fresh.resolves == 1
+
+    # Expires inside the margin: never reused
+    stale = CountingCache(expire=int(time.time()) + 60)
+    stale.get('video1', 'url', FORMAT)
+    assert stale.peek('video1', FORMAT) is None
+    stale.get('video1', 'url', FORMAT)
+    assert stale.resolves == 2
+
+
+def test_invalidate_resolves_again():
+    cache = CountingCache()
+    first = cache.get('video1', 'url', FORMAT)
+    cache.invalidate('video1', FORMAT)
+
+    assert cache.peek('video1', FORMAT) is None
+    second = cache.get('video1', 'url', FORMAT)
+    assert second != first
+    assert cache.resolves == 2
+    assert cache.get('video1', 'url', FORMAT) == second
+
+
+def test_concurrent_gets_share_one_resolve():
+    cache = CountingCache(delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('video1', 'url', FORMAT)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.resolves == 1
+    assert len(set(results)) == 1 and len(results) == 5
@@ -0,0 +1,131 @@
+import random
+import sqlite3
+
+import pytest
+
+import suffix_index
+from conftest import insert_subtitles
+from suffix_index import SuffixArrayIndex, count_overlapping
+
+pytest.importorskip("numpy")
+
+WORDS = ['いい', 'ああ', '先生', 'hello', 'HELLO', 'ても良い', 'ありがとう先生', 'ん', 'zzz']
+
+
+def brute_force_count(db_name, word):
+    conn = sqlite3.connect(db_name)
+    texts = [text for text, in conn.execute("SELECT japanese_text FROM subtitles")]
+    conn.close()
+    return sum(count_overlapping(text, word) for text in texts)
+
+
+def test_count_overlapping():
+    assert count_overlapping('あああ', 'ああ') == 2
+    assert count_overlapping('Hello hello', 'HELLO') == 2
+    assert count_overlapping('先生', '') == 0
+
+
+@pytest.mark.parametrize('word', WORDS)
+def test_index_count_matches_sql_fallback(player, db_name, word, monkeypatch):
+    monkeypatch.setattr('subtitle_search_player.NUMPY_AVAILABLE', False)
+    sql_count = player.count_occurrences(word)
+    monkeypatch.undo()
+
+    player.build_suffix_index()
+    assert player.count_occurrences(word) == sql_count == brute_force_count(db_name, word)
+
+
+def test_count_includes_rows_newer_than_index(player, db_name):
+    player.build_suffix_index()
+    insert_subtitles(db_name, videos=2, seed=5, first_video=50)
+
+    conn = sqlite3.connect(db_name)
+    max_id = conn.execute("SELECT MAX(id) FROM subtitles").fetchone()[0]
+    conn.close()
+    assert player.get_suffix_index().last_id < max_id
+    for word in WORDS:
+        assert player.count_occurrences(word) == brute_force_count(db_name, word)
+
+
+def test_queries_never_build_the_index(player, tmp_path):
+    player.count_occurrences('いい')
+    player.locate_occurrences('いい')
+    assert not (tmp_path / "suffix_index").exists()
+
+
+def test_locate_matches_sql_tail(player, db_name):
+    expected = sorted(player.locate_occurrences('ああ', limit=100000))
+    player.build_suffix_index()
+    assert sorted(player.locate_occurrences('ああ', limit=100000)) == expected
+    assert len(expected) == brute_force_count(db_name, 'ああ')
+
+
+def test_merged_segments_keep_counts(db_name, tmp_path, monkeypatch):
+    monkeypatch.setattr(suffix_index, 'MAX_SEGMENTS', 2)
+    index = SuffixArrayIndex(str(tmp_path / "merged"))
+    index.update(db_name)
+    for batch in range(4):
+        insert_subtitles(db_name, videos=1, seed=batch, first_video=200 + batch)
+        index.update(db_name)
+
+    assert len(index.segments) == 2
+    assert sum(segment.row_count for segment in index.segments) == index.last_id
+    for word in WORDS:
+        assert index.count(word) == brute_force_count(db_name, word)
+    index.close()
+
+
+def line_suffix(data, position):
+    return data[position:data.index(b'\0', position) + 1]
+
+
+def random_lines(rng, count):
+    return ''.join(''.join(rng.choice(WORDS) for _ in range(rng.randint(1, 12))) + '\0'
+                   for _ in range(count)).encode('utf-8').lower()
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_merge_keeps_suffixes_in_line_order(seed):
+    rng = random.Random(seed)
+    first, second = random_lines(rng, 200), random_lines(rng, 150)
+    merged = suffix_index.merge_suffix_arrays(first + second, suffix_index.build_suffix_array(first),
+                                              suffix_index.build_suffix_array(second), len(first))
+
+    data = first + second
+    assert sorted(merged.tolist()) == list(range(len(data)))
+    suffixes = [line_suffix(data, position) for position in merged.tolist()]
+    assert suffixes == sorted(suffixes)
+
+
+def count_new_rows(db_name, word):
+    conn = sqlite3.connect(db_name)
+    texts = [text for text, in conn.execute(
+        "SELECT japanese_text FROM subtitles WHERE video_id = 'video000300'")]
+    conn.close()
+    return sum(count_overlapping(text, word) for text in texts)
+
+
+def test_merged_segments_are_removed_on_next_update(db_name, tmp_path, monkeypatch):
+    monkeypatch.setattr(suffix_index, 'MAX_SEGMENTS', 1)
+    directory = tmp_path / "retired"
+    index = SuffixArrayIndex(str(directory))
+    index.update(db_name)
+    reader = SuffixArrayIndex(str(directory))
+    reader.reload()
+    old_names = [segment.name for segment in reader.segments]
+
+    insert_subtitles(db_name, videos=1, seed=1, first_video=300)
+    index.update(db_name)
+    # Segment cũ vẫn còn trên đĩa cho reader đang mở
+    assert index.manifest['retired']
+    assert all((directory / (name + ".sa.npy")).exists() for name in old_names)
+    assert reader.count('いい') == brute_force_count(db_name, 'いい') - count_new_rows(db_name, 'いい')
+
+    reader.reload()
+    insert_subtitles(db_name, videos=1, seed=2, first_video=301)
+    index.update(db_name)
+    assert not any((directory / (name + ".sa.npy")).exists() for name in old_names)
+    assert index.count('いい') == brute_force_count(db_name, 'いい')
+    index.close()
+    reader.close()
+
@@ -0,0 +1,46 @@
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from conftest import insert_subtitles
+from term_index import extract_terms
+
+
+def term_counts(db_name):
+    conn = sqlite3.connect(db_name)
+    counts = Counter(term for text, in conn.execute("SELECT japanese_text FROM subtitles")
+                     for term in extract_terms(text))
+    conn.close()
+    return counts
+
+
+def test_extract_terms():
+    assert extract_terms('先生が食べる') == {'先生', '先生が', '食', '食べ', '食べる'}
+    assert extract_terms('カタカナとHello') == {'カタカナ', 'hello'}
+
+
+@pytest.mark.parametrize('prefix', ['先', '食べ', 'カ', 'he', 'HE'])
+def test_suggestions_match_the_corpus(player, db_name, prefix):
+    counts = term_counts(db_name)
+    expected = sorted(((term, count) for term, count in counts.items() if term.startswith(prefix.lower())),
+                      key=lambda item: (-item[1], item[0]))
+
+    suggestions = player.suggest(prefix, limit=5)
+    assert suggestions == expected[:5]
+    assert suggestions
+
+
+def test_suggestions_follow_new_rows(player, db_name):
+    player.suggest('先')
+    insert_subtitles(db_name, videos=2, seed=3, first_video=70)
+    player.term_index.update()
+
+    counts = term_counts(db_name)
+    assert dict(player.suggest('先', limit=1000)) == {term: count for term, count in counts.items()
+                                                     if term.startswith('先')}
+
+
+def test_unknown_prefix(player):
+    assert player.suggest('zzz') == []
+    assert player.suggest('  ') == []
@@ -7,6 +7,7 @@ Optional upgrade - chỉ cài khi cần built-in player
 
 import tkinter as tk
 from tkinter import ttk
+import json
 import re
 
 try:
@@ -16,6 +17,75 @@ try:
 except ImportError:
     WEBVIEW_AVAILABLE = False
 
+# One page for the lifetime of the window: the IFrame Player API is bootstrapped once,
+# later hits are driven through evaluate_js (loadHit / togglePlay / seekBy)
+PLAYER_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        html, body { margin: 0; padding: 0; height: 100%; background: black; overflow: hidden; }
+        #player { width: 100%; height: 100vh; }
+    </style>
+</head>
+<body>
+    <div id="player"></div>
+    <script>
+        var player = null;
+        var ready = false;
+        var currentVideo = null;
+        var pendingHit = __FIRST_HIT__;
+
+        function loadHit(videoId, start) {
+            if (!ready) {
+                pendingHit = [videoId, start];  // Played by onPlayerReady
+                return;
+            }
+            if (videoId === currentVideo) {
+                player.seekTo(start, true);
+                player.playVideo();
+            } else {
+                currentVideo = videoId;
+                player.loadVideoById({videoId: videoId, startSeconds: start});
+            }
+        }
+
+        function togglePlay() {
+            if (!ready) return;
+            if (player.getPlayerState() === YT.PlayerState.PLAYING) {
+                player.pauseVideo();
+            } else {
+                player.playVideo();
+            }
+        }
+
+        function seekBy(seconds) {
+            if (!ready) return;
+            player.seekTo(Math.max(0, player.getCurrentTime() + seconds), true);
+        }
+
+        function onPlayerReady() {
+            ready = true;
+            if (pendingHit) {
+                loadHit(pendingHit[0], pendingHit[1]);
+                pendingHit = null;
+            }
+        }
+
+        function onYouTubeIframeAPIReady() {
+            player = new YT.Player('player', {
+                width: '100%',
+                height: '100%',
+                playerVars: {autoplay: 1, playsinline: 1, rel: 0},
+                events: {onReady: onPlayerReady}
+            });
+        }
+    </script>
+    <script src="https://www.youtube.com/iframe_api"></script>
+</body>
+</html>
+"""
+
 
 class YouTubePlayer:
     """Built-in YouTube Player using webview"""
@@ -85,51 +155,14 @@ class YouTubePlayer:
             return
 
         # Extract timestamp if present
-        timestamp = self.extract_timestamp(youtube_url)
-
-        # Create embedded YouTube URL
-        embed_url = f"https://www.youtube.com/embed/{video_id}"
-        if timestamp:
-            embed_url += f"?start={timestamp}&autoplay=1"
-        else:
-            embed_url += "?autoplay=1"
-
-        # Create HTML for webview
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ margin: 0; padding: 0; background: black; }}
-                iframe {{ width: 100%; height: 100vh; border: none; }}
-            </style>
-        </head>
-        <body>
-            <iframe src="{embed_url}" 
-                    allowfullscreen 
-                    allow="autoplay; encrypted-media">
-            </iframe>
-        </body>
-        </html>
-        """
+        start = int(self.extract_timestamp(youtube_url) or 0)
 
         try:
-            # Close existing webview if any
             if self.webview_window:
-                self.webview_window.destroy()
-
-            # Create new webview window
-            self.webview_window = webview.create_window(
-                title="YouTube Player",
-                html=html_content,
-                width=800,
-                height=600,
-                resizable=True,
-                on_top=False
-            )
-
-            # Start webview (non-blocking)
-            webview.start(debug=False, block=False)
+                # Player already bootstrapped: same video seeks, another video is swapped in place
+                self.webview_window.evaluate_js(f"loadHit({json.dumps(video_id)}, {start})")
+            else:
+                self.create_window(video_id, start)
 
             self.status_label.config(text=f"Playing: {video_id}")
 
@@ -137,6 +170,41 @@ class YouTubePlayer:
             self.status_label.config(text=f"Player error: {e}")
             self.open_in_browser()
 
+    def create_window(self, video_id, start):
+        """Create the single player window; the IFrame API is loaded once and reused"""
+        html_content = PLAYER_HTML.replace("__FIRST_HIT__", json.dumps([video_id, start]))
+
+        self.webview_window = webview.create_window(
+            title="YouTube Player",
+            html=html_content,
+            width=800,
+            height=600,
+            resizable=True,
+            on_top=False
+        )
+        try:
+            self.webview_window.events.closed += self.on_window_closed
+        except AttributeError:
+            pass  # pywebview < 4 has no window events
+
+        # Start webview (non-blocking)
+        webview.start(debug=False, block=False)
+
+    def on_window_closed(self):
+        """User closed the player window: the next video opens a new one"""
+        self.webview_window = None
+
+    def run_js(self, script):
+        """Run a player command in the page; False if there is no window"""
+        if not self.webview_window:
+            return False
+        try:
+            self.webview_window.evaluate_js(script)
+            return True
+        except Exception:
+            self.status_label.config(text="Player control not available")
+            return False
+
     def extract_video_id(self, url):
         """Extract video ID from YouTube URL"""
         patterns = [
@@ -160,22 +228,13 @@ class YouTubePlayer:
         return None
 
     def toggle_play(self):
-        """Toggle play/pause (requires JavaScript injection)"""
-        if self.webview_window:
-            try:
-                # This requires pywebview with JS support
-                self.webview_window.evaluate_js("""
-                    var iframe = document.querySelector('iframe');
-                    if (iframe) {
-                        iframe.contentWindow.postMessage('{"event":"command","func":"pauseVideo","args":""}', '*');
-                    }
-                """)
-            except:
-                self.status_label.config(text="Player control not available")
+        """Toggle play/pause"""
+        self.run_js("togglePlay()")
 
     def seek(self, seconds):
-        """Seek forward/backward (limited support)"""
-        self.status_label.config(text=f"Seek {seconds}s (limited support)")
+        """Seek forward/backward from the current position"""
+        if self.run_js(f"seekBy({int(seconds)})"):
+            self.status_label.config(text=f"Seek {seconds:+d}s")
 
     def open_in_browser(self):
         """Fallback: open in external browser"""